@@ -0,0 +1,141 @@
+"""
+멀티 워커(--workers N) 확장성 벤치마크
+
+워커 수(기본 1, 2, 4, 8)마다 서버를 띄우고 DURATION초 동안
+- 전송 프로세스 여러 개가 keep-alive 연결로 POST /message를 보내고 (messages/s)
+- poller P명이 채널별 /events long-poll을 계속 걸어 두어 받은 이벤트 수를 셉니다 (deliveries/s)
+poller는 SO_REUSEPORT로 여러 워커에 흩어지므로, 다른 워커에서 보낸 메시지도 받아야 합니다.
+
+    python benchmarks/bench_cluster.py
+    python benchmarks/bench_cluster.py --workers 1 4 --pollers 2000 --duration 10
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHANNELS = [f"# bench-{i}" for i in range(8)]
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def post(conn, path, payload):
+    conn.request("POST", path, json.dumps(payload), {"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    return json.loads(resp.read())
+
+
+def sender(port, index, deadline, result):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    nick = f"sender{index}"
+    for ch in CHANNELS:
+        post(conn, "/join", {"nick": nick, "channel": ch})
+    sent = 0
+    while time.time() < deadline:
+        post(conn, "/message", {"nick": nick, "channel": CHANNELS[sent % len(CHANNELS)], "text": f"msg {sent}"})
+        sent += 1
+    result.put(sent)
+
+
+async def poll_loop(port, channel, since, deadline, counter):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    path = f"/events?channel={channel.replace('#', '%23').replace(' ', '%20')}"
+    try:
+        while time.time() < deadline:
+            writer.write(f"GET {path}&since={since} HTTP/1.1\r\nHost: x\r\n\r\n".encode("ascii"))
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            body = json.loads(await reader.readexactly(length))
+            if body["events"]:
+                since = body["events"][-1]["id"]
+                counter[0] += len(body["events"])
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+def pollers(port, count, since, deadline, result):
+    raise_fd_limit()
+    counter = [0]
+
+    async def run():
+        await asyncio.gather(*(poll_loop(port, CHANNELS[i % len(CHANNELS)], since, deadline, counter)
+                               for i in range(count)), return_exceptions=True)
+
+    asyncio.run(run())
+    result.put(counter[0])
+
+
+def bench(workers, args):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.server", "--port", str(args.port), "--workers", str(workers),
+         "--mode", args.mode, "--max-connections-per-client", "0", "--max-long-polls", "0",
+         "--max-workers", str(args.pollers + args.senders + 64)],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(1.0 + 0.2 * workers)
+        conn = http.client.HTTPConnection("127.0.0.1", args.port)
+        latest = post(conn, "/join", {"nick": "bench", "channel": CHANNELS[0]})["event_id"]
+        conn.close()
+
+        ctx = multiprocessing.get_context("fork")
+        result_sent, result_recv = ctx.Queue(), ctx.Queue()
+        deadline = time.time() + args.duration + 1.0
+        poll_procs = [ctx.Process(target=pollers, args=(args.port, n, latest, deadline, result_recv))
+                      for n in _split(args.pollers, args.client_procs)]
+        for p in poll_procs:
+            p.start()
+        time.sleep(1.0)
+        started = time.time()
+        send_procs = [ctx.Process(target=sender, args=(args.port, i, started + args.duration, result_sent))
+                      for i in range(args.senders)]
+        for p in send_procs:
+            p.start()
+        sent = sum(result_sent.get() for _ in send_procs)
+        elapsed = time.time() - started
+        received = sum(result_recv.get() for _ in poll_procs)
+        for p in send_procs + poll_procs:
+            p.join()
+        print(f"workers={workers:<2} messages/s {sent / elapsed:>9.0f} | pollers {args.pollers:>5}"
+              f" | deliveries/s {received / elapsed:>10.0f}")
+    finally:
+        server.terminate()
+        server.wait()
+        time.sleep(0.5)
+
+
+def _split(total, parts):
+    return [total // parts + (1 if i < total % parts else 0) for i in range(min(parts, total))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="multi-worker cluster benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--mode", choices=["thread", "asyncio"], default="asyncio")
+    parser.add_argument("--pollers", type=int, default=1000)
+    parser.add_argument("--senders", type=int, default=8)
+    parser.add_argument("--client-procs", type=int, default=4, help="poller를 나눠 돌릴 클라이언트 프로세스 수")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=18110)
+    args = parser.parse_args()
+    raise_fd_limit()
+    print(f"## {os.cpu_count()} CPUs, mode={args.mode}, {args.senders} senders, {args.duration:.0f}s per run")
+    for workers in args.workers:
+        bench(workers, args)
+
+
+if __name__ == "__main__":
+    main()
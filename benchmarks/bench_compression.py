@@ -0,0 +1,96 @@
+"""
+응답 압축 비용/이득 벤치마크
+
+대표 응답 바디를 zlib 레벨별(gzip)로 압축해 줄어든 바이트와 CPU 시간을 비교합니다.
+- events : 재접속 후 /events 따라잡기 응답 (메시지 --events개)
+- users  : 접속자 --users명의 /users 응답
+- text   : 텍스트 업로드 파일 (로그 형태, --text-kb)
+마지막 줄은 캐시된 /users 바디를 다시 보낼 때 compress_body(shared=True) 캐시 적중 비용입니다.
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --levels 1 6 --users 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.channel_manager import ChannelManager  # noqa: E402
+from src.http_utils import COMPRESS_LEVEL, compress_body, events_json  # noqa: E402
+
+
+def per_call(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def payloads(args):
+    rng = random.Random(1)
+    words = ["안녕하세요", "회의", "내일", "자료", "확인", "부탁드립니다", "hello", "deploy", "build", "ok", "ㅋㅋㅋ"]
+
+    manager = ChannelManager()
+    for u in range(50):
+        manager.join_channel("# 일반", f"user{u}")
+    for i in range(args.events):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(3, 20)))
+        manager.post_message("# 일반", f"user{i % 50}", text)
+    events, latest, expired = manager.poll_events("# 일반", 0)
+    events_body = events_json(events, latest, expired)
+
+    manager = ChannelManager()
+    for u in range(args.users):
+        manager.join_channel(f"# ch{u % 100}", f"user{u}")
+        manager.set_focus(f"user{u}", u % 3 == 0)
+    users_body = manager.users_json()
+
+    lines = []
+    size = 0
+    while size < args.text_kb * 1024:
+        line = f"2026-10-17 12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} INFO worker-{rng.randint(0, 7)} " \
+               f"request id={rng.getrandbits(32):08x} took {rng.random() * 100:.2f}ms\n"
+        lines.append(line)
+        size += len(line)
+    text_body = "".join(lines).encode("utf-8")
+
+    return [("events", events_body), ("users", users_body), ("text", text_body)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="response compression benchmark")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 3, 6, 9])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--text-kb", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'payload':<8} {'level':>5} {'bytes':>10} {'gzip':>10} {'saved':>7} {'time(ms)':>9} {'MB/s':>8}")
+    bodies = payloads(args)
+    for name, body in bodies:
+        for level in args.levels:
+            def compress():
+                c = zlib.compressobj(level, zlib.DEFLATED, 31)
+                return c.compress(body) + c.flush()
+            out = compress()
+            t = per_call(compress, args.repeat)
+            mark = " *" if level == COMPRESS_LEVEL else ""
+            print(f"{name:<8} {level:>5} {len(body):>10} {len(out):>10} {(1 - len(out) / len(body)) * 100:>6.1f}%"
+                  f" {t * 1e3:>9.3f} {len(body) / t / 1e6:>8.1f}{mark}")
+
+    # 캐시 적중: users_json이 돌려준 같은 bytes 객체를 여러 요청에 보낼 때
+    name, body = bodies[1]
+    compress_body(body, "gzip", shared=True)
+    hit = per_call(lambda: compress_body(body, "gzip", shared=True), args.repeat * 50)
+    miss = per_call(lambda: zlib.compress(body, COMPRESS_LEVEL), args.repeat)
+    print(f"## compress_body cache hit for {name} ({len(body)} bytes): {hit * 1e6:.1f} us"
+          f" vs {miss * 1e6:.1f} us compressing at level {COMPRESS_LEVEL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+이벤트 보관 메모리 벤치마크
+
+채널 --channels개에 메시지 이벤트 --events개(기본 100만)를 만들어 보관할 때 이벤트 한 건당 바이트를 잽니다.
+- dict    : 이전 방식. dict 이벤트 + float 시각 + 생성 시 인코딩한 JSON 바이트를 계속 보관 (이 파일에 재현)
+- slots   : 현재 Event. 슬롯 객체 + intern한 채널/닉/종류 문자열 + 정수 밀리초,
+            인코딩 바이트는 채널마다 최근 ENCODED_RECENT_EVENTS개만 보관
+채널/닉/msg_type 문자열은 요청 바디를 파싱할 때처럼 이벤트마다 새로 만든 객체를 넘깁니다.
+메시지 본문 문자열은 두 방식이 똑같이 들고 있으므로 미리 만들어 두고 측정에서 뺍니다.
+마지막 줄은 ChannelManager.post_message로 기록했을 때(2-gram 검색 색인 포함) 매니저 전체의 증가량입니다.
+
+    python benchmarks/bench_event_memory.py
+    python benchmarks/bench_event_memory.py --events 200000 --channels 10
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.channel_manager import ChannelManager  # noqa: E402
+from src.event_log import ENCODED_RECENT_EVENTS, Event  # noqa: E402
+
+WORDS = ["안녕하세요", "회의는", "내일", "자료", "확인", "부탁드립니다", "배포", "완료했습니다", "점심", "뭐먹지",
+         "ㅋㅋㅋ", "네", "hello", "deploy", "build", "failed", "ok", "thanks", "review", "merge", "pr"]
+
+
+class DictEvent(dict):
+    """이전 구현: dict 이벤트 + 인코딩 결과 캐시"""
+
+    __slots__ = ("_encoded",)
+
+    def encoded(self):
+        try:
+            return self._encoded
+        except AttributeError:
+            self._encoded = json.dumps(self).encode("utf-8")
+            return self._encoded
+
+
+def fresh(value):
+    """요청마다 새로 파싱된 문자열 흉내 (같은 내용, 다른 객체)"""
+    return (value + ".")[:-1]
+
+
+def make_dict(event_id, channel, nick, now, text):
+    event = DictEvent(id=event_id, type="message", channel=fresh(channel), nick=fresh(nick),
+                      timestamp=now, msg_type=fresh("text"))
+    event["text"] = text
+    event.encoded()
+    return event
+
+
+def make_slots(event_id, channel, nick, now, text):
+    event = Event(event_id, "message", fresh(channel), fresh(nick), int(now * 1000), fresh("text"), text)
+    event.keep_encoded()
+    return event
+
+
+def measure(make, inputs, channels):
+    """채널별 목록에 이벤트를 보관했을 때 늘어난 메모리(바이트)"""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    logs = {channel: [] for channel in channels}
+    now = time.time()
+    for event_id, (channel, nick, text) in enumerate(inputs, 1):
+        log = logs[channel]
+        log.append(make(event_id, channel, nick, now, text))
+        if make is make_slots and len(log) > ENCODED_RECENT_EVENTS:
+            log[-1 - ENCODED_RECENT_EVENTS]._encoded = None  # EventLog.append와 같은 처리
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used, logs
+
+
+def measure_manager(inputs, channels):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    manager = ChannelManager(max_events=len(inputs) + 1, max_age=None)
+    for channel in channels:
+        manager.join_channel(channel, "bench")  # 채널 멤버만 메시지를 보낼 수 있음
+    for channel, _, text in inputs:
+        manager.post_message(fresh(channel), "bench", text, fresh("text"))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used, manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="retained event memory benchmark")
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--channels", type=int, default=100)
+    parser.add_argument("--nicks", type=int, default=1000)
+    parser.add_argument("--skip-manager", action="store_true", help="ChannelManager 전체 측정 생략")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    channels = [f"# ch{c}" for c in range(args.channels)]
+    nicks = [f"user{u}" for u in range(args.nicks)]
+    inputs = [(rng.choice(channels), rng.choice(nicks),
+               " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12))))
+              for _ in range(args.events)]
+    text_bytes = sum(sys.getsizeof(text) for _, _, text in inputs)
+
+    print(f"## {args.events} message events in {args.channels} channels from {args.nicks} nicks "
+          f"(python {sys.version.split()[0]})")
+    print(f"   message text objects: {text_bytes / args.events:.0f} B/event (held by both, not counted below)")
+    results = {}
+    for name, make in (("dict", make_dict), ("slots", make_slots)):
+        used, logs = measure(make, inputs, channels)
+        results[name] = used
+        print(f"{name:<6}: {used / 2**20:8.1f} MiB  {used / args.events:6.0f} B/event")
+        del logs
+    print(f"slots / dict: {results['slots'] / results['dict']:.2f}")
+
+    if not args.skip_manager:
+        used, manager = measure_manager(inputs, channels)
+        print(f"ChannelManager.post_message (log + search index): {used / 2**20:.1f} MiB, "
+              f"{used / args.events:.0f} B/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+이벤트 저널 벤치마크
+
+1) post_message 처리량(messages/s): 저널 off / on
+2) 재시작 재생 시간: 세그먼트만 있을 때 vs 스냅샷이 있을 때 (기본 1M 이벤트)
+
+    python benchmarks/bench_journal.py
+    python benchmarks/bench_journal.py --messages 50000 --replay-events 200000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.channel_manager import ChannelManager  # noqa: E402
+from src.event_log import Event  # noqa: E402
+from src.journal import EventJournal  # noqa: E402
+
+CHANNELS = [f"# bench-{i}" for i in range(16)]
+
+
+def make_manager(journal=None):
+    manager = ChannelManager()
+    for ch in CHANNELS:
+        manager.join_channel(ch, "bench")
+    if journal is not None:
+        journal.start(snapshot_source=manager.snapshot_events)
+        manager.journal = journal
+    return manager
+
+
+def post_rate(manager, count):
+    started = time.perf_counter()
+    for i in range(count):
+        manager.post_message(CHANNELS[i % len(CHANNELS)], "bench", f"message {i} 안녕하세요")
+    return count / (time.perf_counter() - started)
+
+
+def bench_throughput(count, workdir):
+    print(f"## post_message throughput ({count} messages)")
+    rate = post_rate(make_manager(), count)
+    print(f"journal off : {rate:>10.0f} msg/s")
+
+    journal = EventJournal(os.path.join(workdir, "throughput"))
+    manager = make_manager(journal)
+    started = time.perf_counter()
+    rate = post_rate(manager, count)
+    journal.flush()
+    durable_rate = count / (time.perf_counter() - started)
+    journal.close()
+    print(f"journal on  : {rate:>10.0f} msg/s (request path), {durable_rate:.0f} msg/s until fsync'd")
+
+
+def bench_replay(count, workdir):
+    print(f"## replay ({count} events)")
+    directory = os.path.join(workdir, "replay")
+    journal = EventJournal(directory, snapshot_every=count * 2)  # 스냅샷 없이 세그먼트만 생성
+    journal.start()
+    now = int(time.time() * 1000)
+    for i in range(1, count + 1):
+        journal.append(Event(i, "message", CHANNELS[i % len(CHANNELS)], "bench", now, "text", f"message {i}"))
+    journal.close()
+    size = sum(os.path.getsize(os.path.join(directory, n)) for n in os.listdir(directory))
+    print(f"journal size: {size / 1024 / 1024:.1f} MB")
+
+    manager = ChannelManager()
+    started = time.perf_counter()
+    replayed = manager.restore_events(EventJournal(directory).replay())
+    print(f"segments only : {time.perf_counter() - started:>6.2f}s ({replayed} events, last id {manager.last_event_id})")
+
+    EventJournal(directory).write_snapshot(*manager.snapshot_events())
+    manager = ChannelManager()
+    started = time.perf_counter()
+    replayed = manager.restore_events(EventJournal(directory).replay())
+    print(f"with snapshot : {time.perf_counter() - started:>6.2f}s ({replayed} retained events, last id {manager.last_event_id})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="event journal benchmark")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--replay-events", type=int, default=1000000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="journal-bench-")
+    try:
+        bench_throughput(args.messages, workdir)
+        bench_replay(args.replay_events, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+ChannelManager 락 경합 벤치마크
+
+스레드 수를 늘려 가며 읽기 위주 요청과 메시지 기록을 섞어 돌리고, 초당 처리량과 읽기 지연을 비교합니다.
+- split  : 현재 ChannelManager (채널별 로그 락 + 락 없이 읽는 채널/접속자 목록 스냅샷)
+- global : 모든 공개 메서드가 매니저 락 하나를 잡던 이전 방식 (비교용으로 이 파일에 재현)
+스레드 4개 중 1개는 자기 채널에 post_message, 나머지는 /channels, /users, 다른 채널의 /history를 번갈아 호출하고,
+요청 사이에 --think-ms만큼 쉽니다 (소켓을 기다리는 요청 스레드 흉내).
+--think-ms 0이면 모든 스레드가 쉬지 않고 돌아 CPU 하나에서는 GIL 배분이 결과를 좌우합니다.
+락을 잡지 않는 읽기 스레드가 GIL을 더 많이 차지해 split의 쓰기 처리량이 global보다 낮게 나옵니다.
+
+    python benchmarks/bench_lock_contention.py
+    python benchmarks/bench_lock_contention.py --threads 1 4 16 64 --seconds 3 --think-ms 0
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.channel_manager import ChannelManager  # noqa: E402
+
+
+class GlobalLockManager(ChannelManager):
+    """이전 구현: 조회도 매니저 락을 잡고, 메시지 색인 준비도 락 안에서 함"""
+
+    def post_message(self, *args, **kwargs):
+        with self.cond:
+            return super().post_message(*args, **kwargs)
+
+    def list_channels(self, nick=None):
+        with self.cond:
+            return super().list_channels(nick)
+
+    def channels_json(self, nick=None):
+        with self.cond:
+            return super().channels_json(nick)
+
+    def users_json(self):
+        with self.cond:
+            return super().users_json()
+
+    def history(self, *args, **kwargs):
+        with self.cond:
+            return super().history(*args, **kwargs)
+
+
+def populate(manager, channels, users):
+    for u in range(users):
+        nick = f"user{u}"
+        manager.join_channel(f"# ch{u % channels}", nick)
+        manager.set_focus(nick, True)
+    for i in range(channels * 50):
+        manager.post_message(f"# ch{i % channels}", f"user{i % channels}", f"warmup message {i} 안녕하세요")
+
+
+def p99(samples):
+    samples = sorted(samples)
+    return samples[int(len(samples) * 0.99)] if samples else 0
+
+
+def run(manager, threads, seconds, channels, think=0):
+    go = threading.Event()
+    stop = threading.Event()
+    counts = [0] * threads
+    latencies = [[] for _ in range(threads)]
+
+    def writer(k):
+        channel = f"# ch{k % channels}"
+        nick = f"user{k % channels}"
+        samples = latencies[k]
+        n = 0
+        go.wait()
+        while not stop.is_set():
+            started = time.perf_counter()
+            manager.post_message(channel, nick, f"message {n} 회의 자료 확인 부탁드립니다")
+            samples.append(time.perf_counter() - started)
+            n += 1
+            if think:
+                time.sleep(think)
+        counts[k] = n
+
+    def reader(k):
+        channel = f"# ch{(k + 1) % channels}"
+        samples = latencies[k]
+        n = 0
+        go.wait()
+        while not stop.is_set():
+            started = time.perf_counter()
+            op = n % 3
+            if op == 0:
+                manager.channels_json(f"user{k}")
+            elif op == 1:
+                manager.users_json()
+            else:
+                manager.history(channel, None, 50)
+            samples.append(time.perf_counter() - started)
+            n += 1
+            if think:
+                time.sleep(think)
+        counts[k] = n
+
+    workers = [threading.Thread(target=writer if k % 4 == 0 else reader, args=(k,), daemon=True)
+               for k in range(threads)]
+    # 모두 시작한 뒤 동시에 출발 (먼저 돈 스레드가 GIL을 차지해 나머지의 start()가 늦어지지 않도록)
+    for t in workers:
+        t.start()
+    started = time.perf_counter()
+    go.set()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    writes = sum(counts[k] for k in range(threads) if k % 4 == 0)
+    reads = sum(counts[k] for k in range(threads) if k % 4 != 0)
+    write_p99 = p99(s for k in range(threads) if k % 4 == 0 for s in latencies[k])
+    read_p99 = p99(s for k in range(threads) if k % 4 != 0 for s in latencies[k])
+    return writes / elapsed, reads / elapsed, write_p99, read_p99, manager.lock.contended
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChannelManager lock contention benchmark")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64, 128])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--channels", type=int, default=16)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--think-ms", type=float, default=0.2,
+                        help="sleep between requests (0: every thread runs flat out)")
+    args = parser.parse_args()
+
+    print(f"## {args.channels} channels, {args.users} users, {args.seconds:g}s per run, "
+          f"1 writer per 4 threads, think {args.think_ms:g} ms (python {sys.version.split()[0]}, {os.cpu_count()} cpu)")
+    print(f"{'threads':>7} {'design':<7} {'writes/s':>10} {'reads/s':>10} {'total/s':>10} "
+          f"{'write p99':>10} {'read p99':>10} {'contended':>10}   (p99 in ms)")
+    for threads in args.threads:
+        for name, cls in (("global", GlobalLockManager), ("split", ChannelManager)):
+            manager = cls()
+            populate(manager, args.channels, args.users)
+            contended = manager.lock.contended
+            writes, reads, write_p99, read_p99, after = run(manager, threads, args.seconds, args.channels,
+                                                               args.think_ms / 1e3)
+            print(f"{threads:>7} {name:<7} {writes:>10.0f} {reads:>10.0f} {writes + reads:>10.0f} "
+                  f"{write_p99 * 1e3:>10.3f} {read_p99 * 1e3:>10.3f} {after - contended:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+접속 상태 만료 벤치마크
+
+유저 N명(기본 10k)이 여러 채널에 들어가 있을 때 post_message / poll_events 한 번의 지연을 잽니다.
+- heap  : 현재 ChannelManager (만료 기한 힙, 기한이 지난 유저만 처리)
+- scan  : 호출마다 전체 채널/유저를 훑던 이전 방식 (비교용으로 이 파일에 재현)
+
+    python benchmarks/bench_presence.py
+    python benchmarks/bench_presence.py --users 50000 --ops 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import channel_manager as cm  # noqa: E402
+
+
+class ScanChannelManager(cm.ChannelManager):
+    """이전 구현: 공개 메서드 호출마다 모든 채널/멤버/last_seen/last_read를 훑음"""
+
+    scan = False  # 준비 단계(populate)에서는 끄고 측정 구간에서만 켬
+
+    def _expire_inactive_locked(self, now=None):
+        if not self.scan:
+            return super()._expire_inactive_locked(now)
+        now = time.time()
+        for channel, members in list(self.channels.items()):
+            for m in [m for m in members if now - self.last_seen.get(m, 0) > cm.STALE_TIMEOUT]:
+                self._remove_member_locked(channel, m)
+        active_members = {m for ms in self.channels.values() for m in ms}
+        for nick in list(self.last_seen):
+            if nick not in active_members:
+                del self.last_seen[nick]
+        for channel, readers in list(self.last_read.items()):
+            for n in [n for n in readers if n not in active_members]:
+                del readers[n]
+            if not readers:
+                del self.last_read[channel]
+
+
+def populate(manager, users, channels, per_user):
+    for u in range(users):
+        nick = f"user{u}"
+        for k in range(per_user):
+            manager.join_channel(f"# ch{(u + k * 7) % channels}", nick)
+
+
+def measure(fn, ops):
+    samples = []
+    for i in range(ops):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return sum(samples) / ops, samples[int(ops * 0.99) - 1]
+
+
+def run(label, manager_cls, args):
+    manager = manager_cls(max_events=1000)
+    started = time.perf_counter()
+    populate(manager, args.users, args.channels, args.channels_per_user)
+    setup = time.perf_counter() - started
+    manager.scan = True
+
+    def post(i):
+        u = i % args.users
+        manager.post_message(f"# ch{u % args.channels}", f"user{u}", "hello")
+
+    def poll(i):
+        u = i % args.users
+        manager.poll_events(f"# ch{u % args.channels}", 0 if i % 50 == 0 else manager.last_event_id, f"user{u}")
+
+    post_avg, post_p99 = measure(post, args.ops)
+    poll_avg, poll_p99 = measure(poll, args.ops)
+    assert len(manager.last_seen) == args.users, "유저가 측정 중 만료됨"
+    print(f"{label:<5} setup {setup:6.2f}s | post_message avg {post_avg * 1e6:9.1f}us p99 {post_p99 * 1e6:9.1f}us"
+          f" | poll_events avg {poll_avg * 1e6:9.1f}us p99 {poll_p99 * 1e6:9.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="presence expiry benchmark")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--channels-per-user", type=int, default=3)
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--skip-scan", action="store_true", help="이전 방식(scan) 측정 생략")
+    args = parser.parse_args()
+
+    print(f"## {args.users} users, {args.channels} channels, {args.channels_per_user} channels/user")
+    run("heap", cm.ChannelManager, args)
+    if not args.skip_scan:
+        run("scan", ScanChannelManager, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+메시지 검색 / 스크롤백 벤치마크
+
+채널 --channels개에 메시지 --messages개(기본 100만)를 기록한 뒤
+- 색인 구축 시간(post_message 한 번당 추가 비용)과 2-gram 역색인 메모리
+- 검색어 종류별 GET /search 한 번의 지연 p50/p99: 2-gram 역색인(index) vs 보관 이벤트 전체 훑기(scan)
+- GET /history 페이지 지연 (최근 페이지, 중간 페이지)
+를 잽니다. 검색은 전체 채널 대상, 결과 최대 SEARCH_LIMIT개입니다.
+
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --messages 200000 --channels 4 --queries 200
+"""
+import argparse
+import heapq
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import channel_manager as cm  # noqa: E402
+from src.channel_manager import ChannelManager  # noqa: E402
+from src.search_index import SEARCH_LIMIT, TextIndex, matches, query_terms  # noqa: E402
+
+WORDS = ["안녕하세요", "회의는", "내일", "자료", "확인", "부탁드립니다", "배포", "완료했습니다", "점심", "뭐먹지",
+         "ㅋㅋㅋ", "네", "hello", "deploy", "build", "failed", "ok", "thanks", "review", "merge", "pr"]
+RARE = ["블루그린", "canary", "롤백했어요", "hotfix"]
+
+# (이름, 검색어): 흔한 단어 / 드문 단어 / 여러 단어 / 한 글자(색인 없이 훑기) / 어절 중간 / 결과 없음
+QUERIES = [
+    ("common", "회의"),
+    ("rare", "블루그린"),
+    ("multi", "배포 failed"),
+    ("one-char", "먹"),
+    ("substring", "ploy"),
+    ("no-hit", "쿠버네티스"),
+]
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def index_bytes(index):
+    postings = index.postings
+    return sys.getsizeof(postings) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in postings.items())
+
+
+def scan_search(manager, terms, limit=SEARCH_LIMIT):
+    """비교용: 색인 없이 모든 채널의 보관 이벤트를 최신순으로 훑기 (채널 병합 방식은 search와 같음)"""
+    found = [(e for e in log.iter_back() if matches(e, terms)) for log in manager.channel_events.values()]
+    return list(itertools.islice(heapq.merge(*found, key=lambda e: e["id"], reverse=True), limit))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="message search / history benchmark")
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50, help="repetitions per query type")
+    parser.add_argument("--scan-queries", type=int, default=5, help="repetitions of the scan baseline")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    per_channel = args.messages // args.channels + 1
+    manager = ChannelManager(max_events=per_channel + 1, max_age=None)
+    channels = [f"# ch{c}" for c in range(args.channels)]
+    for channel in channels:
+        manager.join_channel(channel, "bench")
+    texts = []
+    text_bytes = 0
+    for _ in range(args.messages):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(2, 12))]
+        if rng.random() < 0.001:
+            words.append(rng.choice(RARE))
+        text = " ".join(words)
+        texts.append(text)
+        text_bytes += len(text.encode("utf-8"))
+
+    # 같은 메시지를 색인 없이 기록해 색인 비용만 분리
+    TextIndex.add, original_add = (lambda self, event, grams=None: None), TextIndex.add
+    cm.message_grams, original_grams = (lambda *args: None), cm.message_grams
+    plain = ChannelManager(max_events=per_channel + 1, max_age=None)
+    for channel in channels:
+        plain.join_channel(channel, "bench")
+    started = time.perf_counter()
+    for i, text in enumerate(texts):
+        plain.post_message(channels[i % args.channels], "bench", text)
+    plain_time = time.perf_counter() - started
+    del plain
+    TextIndex.add = original_add
+    cm.message_grams = original_grams
+
+    started = time.perf_counter()
+    for i, text in enumerate(texts):
+        manager.post_message(channels[i % args.channels], "bench", text)
+    build_time = time.perf_counter() - started
+    del texts
+
+    indexes = list(manager.text_indexes.values())
+    size = sum(index_bytes(index) for index in indexes)
+    grams = sum(len(index.postings) for index in indexes)
+    ids = sum(len(ids) for index in indexes for ids in index.postings.values())
+    print(f"## {args.messages} messages in {args.channels} channels, text {text_bytes / 2**20:.1f} MiB")
+    print(f"   post_message: {plain_time / args.messages * 1e6:.1f} us without index, "
+          f"{build_time / args.messages * 1e6:.1f} us with index")
+    print(f"   index: {size / 2**20:.1f} MiB ({size / args.messages:.0f} B/message), "
+          f"{grams} distinct 2-grams, {ids} postings")
+
+    print(f"{'query':<10} {'hits':>5} {'index p50':>10} {'index p99':>10} {'scan p50':>10}   (ms)")
+    for name, query in QUERIES:
+        terms = query_terms(query)
+        hits = manager.search(terms)
+        assert [e["id"] for e in hits] == [e["id"] for e in scan_search(manager, terms)], name
+        index_samples = timed(lambda: manager.search(terms), args.queries)
+        scan_samples = timed(lambda: scan_search(manager, terms), args.scan_queries)
+        print(f"{name:<10} {len(hits):>5} {percentile(index_samples, 0.5) * 1e3:>10.3f}"
+              f" {percentile(index_samples, 0.99) * 1e3:>10.3f} {percentile(scan_samples, 0.5) * 1e3:>10.3f}")
+
+    log = manager.channel_events[channels[0]]
+    middle = (log.first_id() + log.last_id()) // 2
+    for name, before in (("latest", None), ("middle", middle)):
+        samples = timed(lambda: manager.history(channels[0], before, 50), args.queries * 10)
+        print(f"history {name:<7} p50 {percentile(samples, 0.5) * 1e6:.1f} us"
+              f"  p99 {percentile(samples, 0.99) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
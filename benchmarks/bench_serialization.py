@@ -0,0 +1,81 @@
+"""
+응답 직렬화 비용 마이크로 벤치마크
+
+1) 팬아웃: 메시지 하나를 채널 멤버 N명(기본 500)의 /events 응답으로 만드는 비용
+   - dumps  : 응답마다 json.dumps({"events": [...], "latest": N}) (이전 방식)
+   - cached : 이벤트 생성 시 인코딩한 바이트를 이어 붙임 (events_json)
+2) /users: 접속자 M명(기본 10k)일 때 요청 한 번의 응답 바디 생성 비용 (매번 dumps vs 버전 캐시)
+
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --members 2000 --batch 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.channel_manager import ChannelManager  # noqa: E402
+from src.http_utils import events_json  # noqa: E402
+
+
+def per_call(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def bench_fanout(args):
+    manager = ChannelManager()
+    manager.join_channel("# bench", "sender")
+    since = manager.last_event_id
+    for i in range(args.batch):
+        manager.post_message("# bench", "sender", f"메시지 {i} " + "가나다라마바사 " * 8)
+    events, latest, expired = manager.poll_events("# bench", since)
+    dicts = [event.to_dict() for event in events]
+
+    def dumps():
+        for _ in range(args.members):
+            json.dumps({"events": dicts, "latest": latest}).encode("utf-8")
+
+    def cached():
+        for _ in range(args.members):
+            events_json(events, latest, expired)
+
+    print(f"## fan-out: {len(events)} new event(s) -> {args.members} pollers")
+    base = per_call(dumps, args.repeat)
+    new = per_call(cached, args.repeat)
+    print(f"dumps  : {base * 1e3:8.3f} ms per message batch ({base / args.members * 1e6:6.2f} us per response)")
+    print(f"cached : {new * 1e3:8.3f} ms per message batch ({new / args.members * 1e6:6.2f} us per response)"
+          f"  x{base / new:.1f}")
+
+
+def bench_users(args):
+    manager = ChannelManager()
+    for u in range(args.users):
+        manager.join_channel(f"# ch{u % 100}", f"user{u}")
+        manager.set_focus(f"user{u}", True)  # 시간이 지나도 active가 바뀌지 않게 고정
+
+    print(f"## /users body with {args.users} users")
+    base = per_call(lambda: json.dumps({"users": manager.get_all_users()}).encode("utf-8"), args.repeat)
+    new = per_call(manager.users_json, args.repeat)
+    print(f"dumps  : {base * 1e3:8.3f} ms per request")
+    print(f"cached : {new * 1e3:8.3f} ms per request  x{base / new:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="response serialization benchmark")
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=1, help="응답 하나에 담기는 새 이벤트 수")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    bench_fanout(args)
+    bench_users(args)
+
+
+if __name__ == "__main__":
+    main()
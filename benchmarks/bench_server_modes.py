@@ -0,0 +1,152 @@
+"""
+스레드 모드 vs asyncio 모드 서버 비교 벤치마크
+
+N개의 /events long-poll을 동시에 걸어둔 뒤 메시지 1건을 보내고,
+각 poller가 응답을 받기까지의 지연(p50/p99)과 서버 프로세스의 peak RSS(VmHWM)를 측정합니다.
+
+    python benchmarks/bench_server_modes.py                 # 1k/5k/10k, 두 모드 모두
+    python benchmarks/bench_server_modes.py --pollers 1000 --modes asyncio
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHANNEL = "bench"
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def peak_rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+async def request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii") + payload
+    )
+    data = await reader.read()
+    writer.close()
+    head, _, resp_body = data.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), resp_body
+
+
+async def open_poller(port, since, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET /events?channel={CHANNEL}&since={since} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        f"Connection: close\r\nContent-Length: 0\r\n\r\n".encode("ascii")
+    )
+    await writer.drain()
+    ready.append(1)
+    data = await reader.read()
+    arrived = time.perf_counter()
+    writer.close()
+    return arrived, b'"events": []' not in data and data.startswith(b"HTTP/1.1 200")
+
+
+async def run_round(port, pollers, settle):
+    status, body = await request(port, "POST", "/join", {"channel": CHANNEL, "nick": "bench"})
+    since = json.loads(body)["event_id"]
+
+    ready = []
+    tasks = []
+    for i in range(pollers):
+        tasks.append(asyncio.create_task(open_poller(port, since, ready)))
+        if i % 200 == 199:
+            await asyncio.sleep(0)  # 연결 폭주로 backlog가 넘치지 않도록 양보
+    while len(ready) < pollers:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(settle)
+
+    sent_at = time.perf_counter()
+    await request(port, "POST", "/message", {"channel": CHANNEL, "nick": "bench", "text": "ping"})
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies, errors = [], 0
+    for r in results:
+        if isinstance(r, Exception) or not r[1]:
+            errors += 1
+        else:
+            latencies.append((r[0] - sent_at) * 1000.0)
+    return latencies, errors
+
+
+def bench_mode(mode, pollers, port, rounds, settle):
+    proc = subprocess.Popen(
+        # 엔진 자체를 비교하므로 과부하 제어 한도는 끄고 스레드 모드도 poller마다 워커를 줌
+        [sys.executable, "-m", "src.server", "--mode", mode, "--port", str(port),
+         "--max-connections", "0", "--max-connections-per-client", "0", "--max-long-polls", "0",
+         "--max-workers", str(pollers + 64)],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(1.0)
+        latencies, errors = [], 0
+        for _ in range(rounds):
+            lat, err = asyncio.run(run_round(port, pollers, settle))
+            latencies += lat
+            errors += err
+        rss = peak_rss_kb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "mode": mode,
+        "pollers": pollers,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "peak_rss_mb": round(rss / 1024.0, 1),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="thread vs asyncio server benchmark")
+    parser.add_argument("--modes", nargs="+", default=["thread", "asyncio"])
+    parser.add_argument("--pollers", nargs="+", type=int, default=[1000, 5000, 10000])
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--settle", type=float, default=1.0, help="모든 poller 연결 후 대기(초)")
+    args = parser.parse_args()
+
+    limit = raise_fd_limit()
+    print(f"# RLIMIT_NOFILE={limit}")
+    print(f"{'mode':<8} {'pollers':>8} {'p50(ms)':>9} {'p99(ms)':>9} {'peakRSS(MB)':>12} {'errors':>7}")
+    for n in args.pollers:
+        if n + 256 > limit:  # 클라이언트/서버 프로세스가 각각 n개의 fd를 사용
+            print(f"# skip {n} pollers: fd limit {limit} too low")
+            continue
+        for mode in args.modes:
+            r = bench_mode(mode, n, args.port, args.rounds, args.settle)
+            print(f"{r['mode']:<8} {r['pollers']:>8} {r['p50_ms']:>9} {r['p99_ms']:>9} "
+                  f"{r['peak_rss_mb']:>12} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+SSE(/stream) vs long-poll(/events) 전달 지연 벤치마크
+
+구독자 두 종류(SSE 1개, long-poll 1개)를 붙여 두고 메시지를 일정 간격으로 보낸 뒤,
+POST 직전 시각부터 각 구독자가 이벤트를 받은 시각까지의 지연을 비교합니다.
+long-poll은 App.js처럼 매 응답 후 대기(--poll-gap)를 둔 경우도 함께 측정합니다.
+
+    python benchmarks/bench_sse_latency.py --messages 200 --mode asyncio
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHANNEL = "latency"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def sse_subscriber(port, since, received, stop):
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.sendall(f"GET /stream?channel={CHANNEL}&since={since} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+    f = sock.makefile("rb")
+    while not stop.is_set():
+        try:
+            line = f.readline()
+        except OSError:
+            break
+        if not line:
+            break
+        if line.startswith(b"data: "):
+            event = json.loads(line[6:])
+            if event.get("type") == "message":
+                received[int(event["text"])] = time.perf_counter()
+    sock.close()
+
+
+def poll_subscriber(port, since, received, stop, gap):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    while not stop.is_set():
+        try:
+            conn.request("GET", f"/events?channel={CHANNEL}&since={since}")
+            data = json.loads(conn.getresponse().read())
+        except (OSError, http.client.HTTPException, ValueError):
+            break  # 측정 종료 후 서버가 내려간 경우
+        now = time.perf_counter()
+        for event in data["events"]:
+            since = max(since, event["id"])
+            if event.get("type") == "message":
+                received[int(event["text"])] = now
+        if gap:
+            time.sleep(gap)
+    conn.close()
+
+
+def run(port, messages, interval, gap):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+
+    def post(path, body):
+        conn.request("POST", path, json.dumps(body))
+        return json.loads(conn.getresponse().read())
+
+    since = post("/join", {"channel": CHANNEL, "nick": "bench"})["event_id"]
+    stop = threading.Event()
+    results = {"sse": {}, "long-poll": {}, f"long-poll+{gap}s gap": {}}
+    threads = [
+        threading.Thread(target=sse_subscriber, args=(port, since, results["sse"], stop), daemon=True),
+        threading.Thread(target=poll_subscriber, args=(port, since, results["long-poll"], stop, 0), daemon=True),
+        threading.Thread(target=poll_subscriber, args=(port, since, results[f"long-poll+{gap}s gap"], stop, gap),
+                         daemon=True),
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)
+
+    sent = {}
+    for i in range(messages):
+        sent[i] = time.perf_counter()
+        post("/message", {"channel": CHANNEL, "nick": "bench", "text": str(i)})
+        time.sleep(interval)
+    time.sleep(max(1.0, gap * 2))
+    stop.set()
+    results = {name: dict(got) for name, got in results.items()}
+
+    print(f"{'subscriber':<22} {'p50(ms)':>9} {'p99(ms)':>9} {'received':>9}")
+    for name, got in results.items():
+        lat = [(got[i] - sent[i]) * 1000.0 for i in got if i in sent]
+        print(f"{name:<22} {percentile(lat, 50):>9.2f} {percentile(lat, 99):>9.2f} {len(got):>6}/{messages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE vs long-poll latency benchmark")
+    parser.add_argument("--mode", default="thread", choices=["thread", "asyncio"])
+    parser.add_argument("--port", type=int, default=18090)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.02, help="메시지 전송 간격(초)")
+    parser.add_argument("--poll-gap", type=float, default=1.0, help="App.js의 폴링 사이 대기(초)")
+    args = parser.parse_args()
+
+    proc = subprocess.Popen([sys.executable, "-m", "src.server", "--mode", args.mode, "--port", str(args.port)],
+                            cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1.0)
+        run(args.port, args.messages, args.interval, args.poll_gap)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+부하 생성 / 지연 측정 도구 (src/client.py의 http_request 재사용)
+
+가상 유저 N명이 각자 채널에 참가해
+- /events long-poll을 계속 걸어 두고 (받은 메시지로 전달 지연 측정)
+- --msg-rate(초당, 포아송) 간격으로 POST /message
+- --presence-interval마다 POST /presence
+- --upload-rate(초당)로 /upload 후 파일 메시지 전송
+을 --duration초 동안 반복합니다. 가상 유저는 --procs개 프로세스에 나눠 스레드로 돌립니다.
+
+결과: 요청 종류별 requests/s, 오류율, 응답 지연, 전달 지연(보낸 시각 -> poller 수신) p50/p99/p999,
+서버 RSS(자식 워커 포함). --output으로 JSON을 남기고 --compare로 이전 결과와 비교할 수 있습니다.
+
+    python benchmarks/loadgen.py --spawn --users 500 --duration 30 --output before.json
+    python benchmarks/loadgen.py --spawn --users 500 --duration 30 --compare before.json
+    python benchmarks/loadgen.py --port 8080 --server-pid 1234 --users 2000 --procs 8
+"""
+import argparse
+import collections
+import heapq
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.client import http_request  # noqa: E402
+
+# 전달 지연 측정용 메시지 표식: "lg <보낸 시각>"
+MARK = "lg "
+
+
+class Histogram:
+    """
+    로그 구간 지연 히스토그램 (1us부터 구간마다 GROWTH배). 구간 카운트만 가지므로
+    프로세스별 결과를 더해 합칠 수 있고, 분위수 오차는 구간 폭(약 2%) 이내입니다.
+    """
+
+    GROWTH = 1.02
+    BASE = 1e-6
+
+    def __init__(self, buckets=None):
+        self.buckets = collections.Counter(buckets or {})
+
+    def add(self, seconds):
+        self.buckets[int(math.log(max(seconds, self.BASE) / self.BASE, self.GROWTH))] += 1
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+
+    def count(self):
+        return sum(self.buckets.values())
+
+    def percentile(self, pct):
+        total = self.count()
+        if not total:
+            return float("nan")
+        target = pct / 100.0 * total
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return self.BASE * self.GROWTH ** (bucket + 1)
+        return float("nan")
+
+    def summary(self):
+        """ms 단위 요약 + 원본 구간 (다른 결과와 다시 합치거나 비교할 수 있도록)"""
+        return {
+            "count": self.count(),
+            "p50_ms": self.percentile(50) * 1e3,
+            "p99_ms": self.percentile(99) * 1e3,
+            "p999_ms": self.percentile(99.9) * 1e3,
+            "max_ms": self.percentile(100) * 1e3,
+            "buckets": {str(b): n for b, n in sorted(self.buckets.items())},
+        }
+
+
+class Stats:
+    """한 프로세스의 측정값. 측정 구간(start~end)에 끝난 요청만 셈"""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.lock = threading.Lock()
+        self.ok = collections.Counter()
+        self.errors = collections.Counter()
+        self.latency = collections.defaultdict(Histogram)
+        self.delivery = Histogram()
+
+    def request(self, op, started, ok):
+        now = time.time()
+        if not self.start <= now <= self.end:
+            return
+        with self.lock:
+            (self.ok if ok else self.errors)[op] += 1
+            self.latency[op].add(now - started)
+
+    def delivered(self, sent_at):
+        now = time.time()
+        if self.start <= sent_at <= self.end:
+            with self.lock:
+                self.delivery.add(now - sent_at)
+
+    def export(self):
+        return {
+            "ok": dict(self.ok),
+            "errors": dict(self.errors),
+            "latency": {op: dict(h.buckets) for op, h in self.latency.items()},
+            "delivery": dict(self.delivery.buckets),
+        }
+
+
+class VirtualUser:
+    def __init__(self, args, index, channel, stats):
+        self.args = args
+        self.nick = f"{args.prefix}{index}"
+        self.channel = channel
+        self.stats = stats
+        self.since = 0
+        self.running = True
+
+    def call(self, op, method, path, body=None, body_bytes=None, content_type=None, timeout=30):
+        started = time.time()
+        try:
+            status, _, resp = http_request(self.args.host, self.args.port, method, path, body,
+                                           body_bytes=body_bytes, content_type=content_type, timeout=timeout)
+        except (OSError, RuntimeError):
+            self.stats.request(op, started, False)
+            return None
+        self.stats.request(op, started, status == 200)
+        if status != 200:
+            return None
+        try:
+            return json.loads(resp.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def join(self):
+        data = self.call("join", "POST", "/join", {"nick": self.nick, "channel": self.channel})
+        if data:
+            self.since = data["event_id"]
+        return data is not None
+
+    def poll_loop(self):
+        path = f"/events?channel={urllib.parse.quote(self.channel)}&nick={urllib.parse.quote(self.nick)}"
+        while self.running:
+            data = self.call("poll", "GET", f"{path}&since={self.since}", timeout=60)
+            if data is None:
+                time.sleep(0.5)
+                continue
+            for event in data.get("events", []):
+                self.since = max(self.since, event["id"])
+                text = event.get("text") or ""
+                if event.get("type") == "message" and text.startswith(MARK):
+                    self.stats.delivered(float(text[len(MARK):]))
+            self.since = max(self.since, data.get("latest", self.since))
+
+    def action_loop(self, until):
+        """메시지/presence/업로드를 일정에 따라 보냄 (메시지·업로드는 포아송 도착)"""
+        args = self.args
+        now = time.time()
+        schedule = [(now + random.uniform(0, args.presence_interval), "presence")]
+        if args.msg_rate > 0:
+            schedule.append((now + random.expovariate(args.msg_rate), "message"))
+        if args.upload_rate > 0:
+            schedule.append((now + random.expovariate(args.upload_rate), "upload"))
+        heapq.heapify(schedule)
+        while schedule:
+            at, kind = heapq.heappop(schedule)
+            if at >= until:
+                break
+            time.sleep(max(0.0, at - time.time()))
+            if kind == "message":
+                self.call("message", "POST", "/message",
+                          {"nick": self.nick, "channel": self.channel, "text": f"{MARK}{time.time():.6f}"})
+                heapq.heappush(schedule, (at + random.expovariate(args.msg_rate), kind))
+            elif kind == "presence":
+                self.call("presence", "POST", "/presence", {"nick": self.nick, "active": True})
+                heapq.heappush(schedule, (at + args.presence_interval, kind))
+            else:
+                self.upload()
+                heapq.heappush(schedule, (at + random.expovariate(args.upload_rate), kind))
+
+    def upload(self):
+        boundary = f"loadgen{random.getrandbits(64):016x}"
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{self.nick}.bin"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode("utf-8")
+            + os.urandom(self.args.upload_kb * 1024)
+            + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        )
+        data = self.call("upload", "POST", "/upload", body_bytes=body,
+                         content_type=f"multipart/form-data; boundary={boundary}")
+        if data:
+            self.call("message", "POST", "/message", {"nick": self.nick, "channel": self.channel, "text": data["url"],
+                                                      "msg_type": "file", "file_name": data["filename"]})
+
+
+def run_client_proc(args, indices, start, end, result):
+    """가상 유저 일부를 이 프로세스의 스레드로 실행"""
+    threading.stack_size(256 * 1024)
+    raise_fd_limit()
+    stats = Stats(start, end)
+    users = [VirtualUser(args, i, f"# load-{i % args.channels}", stats) for i in indices]
+    joined = [u for u in users if u.join()]
+    threads = []
+    for user in joined:
+        threads.append(threading.Thread(target=user.poll_loop, daemon=True))
+        threads.append(threading.Thread(target=user.action_loop, args=(end,), daemon=True))
+    for t in threads:
+        t.start()
+    time.sleep(max(0.0, end - time.time()))
+    # 마지막 메시지가 전달될 시간을 준 뒤 퇴장 (part 이벤트로 대기 중인 long-poll도 깨어남)
+    time.sleep(args.drain)
+    for user in joined:
+        user.running = False
+    for user in joined:
+        user.call("leave", "POST", "/leave", {"nick": user.nick})
+    result.put(stats.export())
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def process_tree_rss_kb(pid):
+    """pid와 그 자식 프로세스(클러스터 워커)의 RSS 합"""
+    children = collections.defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                children[ppid].append(int(entry))
+            except (OSError, ValueError, IndexError):
+                pass
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+        stack.extend(children.get(p, ()))
+    return total
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, server_pid):
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    start = time.time() + args.ramp
+    end = start + args.duration
+    procs = []
+    for p in range(args.procs):
+        indices = range(p, args.users, args.procs)
+        procs.append(ctx.Process(target=run_client_proc, args=(args, indices, start, end, queue)))
+    for proc in procs:
+        proc.start()
+
+    rss = []
+    while time.time() < end:
+        if server_pid:
+            rss.append(process_tree_rss_kb(server_pid))
+        time.sleep(1.0)
+    parts = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    ok, errors = collections.Counter(), collections.Counter()
+    latency = collections.defaultdict(Histogram)
+    delivery = Histogram()
+    for part in parts:
+        ok.update(part["ok"])
+        errors.update(part["errors"])
+        for op, buckets in part["latency"].items():
+            latency[op].merge(Histogram({int(b): n for b, n in buckets.items()}))
+        delivery.merge(Histogram({int(b): n for b, n in part["delivery"].items()}))
+
+    total_ok, total_err = sum(ok.values()), sum(errors.values())
+    requests = {}
+    for op in sorted(set(ok) | set(errors)):
+        count = ok[op] + errors[op]
+        requests[op] = {
+            "requests_per_s": count / args.duration,
+            "error_rate": errors[op] / count,
+            "latency": latency[op].summary(),
+        }
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "totals": {
+            "requests_per_s": (total_ok + total_err) / args.duration,
+            "error_rate": total_err / max(1, total_ok + total_err),
+            "deliveries_per_s": delivery.count() / args.duration,
+        },
+        "requests": requests,
+        "delivery": delivery.summary(),
+        "server": {
+            "rss_kb_peak": max(rss) if rss else None,
+            "rss_kb_end": rss[-1] if rss else None,
+        },
+    }
+
+
+def print_report(result):
+    print(f"## commit {result['commit']}, {result['config']['users']} users, {result['config']['duration']:.0f}s")
+    print(f"{'op':<10} {'req/s':>9} {'err%':>7} {'p50(ms)':>9} {'p99(ms)':>9} {'p999(ms)':>9}")
+    for op, r in result["requests"].items():
+        lat = r["latency"]
+        print(f"{op:<10} {r['requests_per_s']:>9.1f} {r['error_rate'] * 100:>6.2f}% "
+              f"{lat['p50_ms']:>9.2f} {lat['p99_ms']:>9.2f} {lat['p999_ms']:>9.2f}")
+    d, t = result["delivery"], result["totals"]
+    print(f"{'delivery':<10} {t['deliveries_per_s']:>9.1f} {'':>7} "
+          f"{d['p50_ms']:>9.2f} {d['p99_ms']:>9.2f} {d['p999_ms']:>9.2f}")
+    print(f"total {t['requests_per_s']:.1f} req/s, error rate {t['error_rate'] * 100:.2f}%")
+    if result["server"]["rss_kb_peak"] is not None:
+        print(f"server RSS peak {result['server']['rss_kb_peak'] / 1024:.1f} MB, "
+              f"end {result['server']['rss_kb_end'] / 1024:.1f} MB")
+
+
+def compare_metrics(result):
+    """비교할 주요 지표: 이름 -> 값"""
+    metrics = {
+        "total req/s": result["totals"]["requests_per_s"],
+        "error rate %": result["totals"]["error_rate"] * 100,
+        "delivery p50 ms": result["delivery"]["p50_ms"],
+        "delivery p99 ms": result["delivery"]["p99_ms"],
+        "delivery p999 ms": result["delivery"]["p999_ms"],
+        "server RSS peak MB": (result["server"]["rss_kb_peak"] or 0) / 1024,
+    }
+    for op, r in result["requests"].items():
+        if op != "poll":  # long-poll 응답 시간은 대기 시간이라 비교 의미가 없음
+            metrics[f"{op} p99 ms"] = r["latency"]["p99_ms"]
+    return metrics
+
+
+def print_compare(base, result):
+    print(f"## compare: {base['commit']} -> {result['commit']}")
+    old, new = compare_metrics(base), compare_metrics(result)
+    for name in new:
+        if name in old and old[name]:
+            print(f"{name:<22} {old[name]:>10.2f} -> {new[name]:>10.2f}  ({(new[name] / old[name] - 1) * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="chat server load generator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18100)
+    parser.add_argument("--spawn", action="store_true", help="서버를 직접 띄워서 측정")
+    parser.add_argument("--mode", choices=["thread", "asyncio"], default="asyncio", help="--spawn 시 서버 모드")
+    parser.add_argument("--workers", type=int, default=1, help="--spawn 시 서버 워커 수")
+    parser.add_argument("--server-pid", type=int, help="RSS를 잴 서버 pid (--spawn이 아닐 때)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--procs", type=int, default=4, help="가상 유저를 나눠 돌릴 클라이언트 프로세스 수")
+    parser.add_argument("--msg-rate", type=float, default=0.1, help="유저당 초당 메시지 수")
+    parser.add_argument("--presence-interval", type=float, default=10.0, help="유저당 presence 주기(초)")
+    parser.add_argument("--upload-rate", type=float, default=0.0, help="유저당 초당 업로드 수")
+    parser.add_argument("--upload-kb", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--ramp", type=float, default=3.0, help="참가 후 측정 시작까지 대기(초)")
+    parser.add_argument("--drain", type=float, default=1.0, help="측정 종료 후 전달을 기다리는 시간(초)")
+    parser.add_argument("--prefix", default=f"lg{random.getrandbits(16):04x}-", help="가상 유저 닉네임 접두사")
+    parser.add_argument("--output", help="결과 JSON 파일")
+    parser.add_argument("--compare", metavar="JSON", help="이전 결과와 주요 지표 비교")
+    args = parser.parse_args()
+    raise_fd_limit()
+
+    server = None
+    server_pid = args.server_pid
+    if args.spawn:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "src.server", "--port", str(args.port), "--mode", args.mode,
+             "--workers", str(args.workers),
+             # 가상 유저가 모두 같은 IP에서 접속하므로 IP별 한도는 끄고, 유저당 연결 2개(poll/action)만큼 워커 확보
+             "--max-connections-per-client", "0", "--max-long-polls", "0", "--max-workers", str(2 * args.users + 64)],
+            cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        server_pid = server.pid
+        time.sleep(1.0 + 0.2 * args.workers)
+    try:
+        result = run(args, server_pid)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
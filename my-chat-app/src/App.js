@@ -28,6 +28,9 @@ function App() {
 
     const messagesEndRef = useRef(null);
     const lastIdRef = useRef(0);
+    // /sync로 마지막에 받은 채널 목록/접속자 버전 (epoch가 바뀌면 서버가 전체 목록을 다시 보냄)
+    const syncRef = useRef({ epoch: null, versions: {} });
+    const activeRef = useRef(document.visibilityState === 'visible');
     const fileInputRef = useRef(null);
 
     const scrollToBottom = () => {
@@ -51,62 +54,6 @@ function App() {
         return partner || ch;
     };
 
-    // 포커스 상태를 서버에 알리기
-    useEffect(() => {
-        if (step !== 'chat') return;
-        const sendPresence = (active) => {
-            if (!nick) return;
-            const payload = { nick, active };
-            axios.post(`${API_URL}/presence`, payload, { timeout: 1000 }).catch(() => {});
-        };
-        const handleVisibility = () => {
-            const active = document.visibilityState === 'visible';
-            sendPresence(active);
-        };
-        const handleFocus = () => sendPresence(true);
-        const handleBlur = () => sendPresence(false);
-
-        document.addEventListener('visibilitychange', handleVisibility);
-        window.addEventListener('focus', handleFocus);
-        window.addEventListener('blur', handleBlur);
-
-        // 초기 상태 전송
-        handleVisibility();
-
-        return () => {
-            document.removeEventListener('visibilitychange', handleVisibility);
-            window.removeEventListener('focus', handleFocus);
-            window.removeEventListener('blur', handleBlur);
-        };
-    }, [step, nick]);
-
-    // 초기 데이터 로드
-    useEffect(() => {
-        if(step === 'chat') {
-            fetchChannels();
-            fetchUsers();
-            const interval = setInterval(() => {
-                fetchUsers();
-                fetchChannels();
-            }, 5000);
-            return () => clearInterval(interval);
-        }
-    }, [step]);
-
-    const fetchChannels = async () => {
-        try {
-            const res = await axios.get(`${API_URL}/channels`, { params: { nick } });
-            if(res.data.channels) setChannels(res.data.channels);
-        } catch(e) { console.error("채널 목록 로드 실패", e); }
-    };
-
-    const fetchUsers = async () => {
-        try {
-            const res = await axios.get(`${API_URL}/users`);
-            if(res.data.users) setOnlineUsers(res.data.users);
-        } catch(e) {}
-    };
-
     // 로그인
     const handleLogin = async () => {
         if (!nick.trim()) return alert("닉네임을 입력해주세요!");
@@ -152,11 +99,12 @@ function App() {
         joinChannel(`!dm_${sorted}`);
     };
 
-    // 폴링 로직
+    // 동기화 루프: 채널 목록, 접속자, 현재 채널 이벤트를 /sync long-poll 하나로 받음.
+    // 바뀐 것만 델타로 오고, 포커스 상태(presence)도 같은 요청에 실어 보냄
     useEffect(() => {
         if (step !== 'chat') return;
         let canceled = false;
-        let inFlight = false;
+        let controller = null;
         let timerId = null;
 
         const updateLastId = (val) => {
@@ -164,41 +112,94 @@ function App() {
             setLastId(val);
         };
 
-        const poll = async () => {
-            if (canceled || inFlight) return;
-            inFlight = true;
-            try {
-                const res = await axios.get(`${API_URL}/events`, {
-                    params: { channel, since: lastIdRef.current, nick }
+        const applyChannels = (delta) => {
+            setChannels(prev => {
+                const kept = delta.reset ? [] : prev.filter(ch => !delta.removed.includes(ch));
+                return [...new Set([...kept, ...delta.added])].sort();
+            });
+        };
+
+        const applyUsers = (delta) => {
+            setOnlineUsers(prev => {
+                const users = new Map(delta.reset ? [] : prev.map(u => [u.nick, u.active]));
+                delta.removed.forEach(n => users.delete(n));
+                delta.users.forEach(u => users.set(u.nick, u.active));
+                return [...users.keys()].sort().map(n => ({ nick: n, active: users.get(n) }));
+            });
+        };
+
+        const applyEvents = (entry) => {
+            if (!entry) return; // 이 채널에는 새 이벤트 없음
+            const { events, cursor, resync } = entry;
+            if (resync) {
+                // 커서가 서버 보관 범위 밖: 중간 이력이 빠졌으므로 받은 이벤트로 다시 그림
+                setMessages(events);
+            } else if (events.length > 0) {
+                setMessages(prev => {
+                    const newEvents = events.filter(e => !prev.some(p => p.id === e.id));
+                    return [...prev, ...newEvents];
                 });
-                if(canceled) return;
-
-                const { events, latest } = res.data;
-                if (events && events.length > 0) {
-                    setMessages(prev => {
-                        const newEvents = events.filter(e => !prev.some(p => p.id === e.id));
-                        return [...prev, ...newEvents];
-                    });
-                    updateLastId(latest);
-                } else if(latest > lastIdRef.current) {
-                    updateLastId(latest);
-                }
+            }
+            updateLastId(cursor);
+        };
+
+        const sync = async () => {
+            if (canceled) return;
+            controller = new AbortController();
+            const active = activeRef.current;
+            const { epoch, versions } = syncRef.current;
+            let delay = 0;
+            try {
+                const res = await axios.post(`${API_URL}/sync`, {
+                    nick, epoch, versions, active,
+                    cursors: { [channel]: lastIdRef.current },
+                    // 보고 있을 때만 읽음 처리
+                    read: active ? [channel] : [],
+                }, { signal: controller.signal, timeout: 30000 });
+                if (canceled) return;
+
+                const data = res.data;
+                if (data.channels) applyChannels(data.channels);
+                if (data.users) applyUsers(data.users);
+                syncRef.current = {
+                    epoch: data.epoch,
+                    versions: {
+                        channels: data.channels ? data.channels.version : versions.channels,
+                        users: data.users ? data.users.version : versions.users,
+                    },
+                };
+                applyEvents(data.events.channels[channel]);
             } catch (err) {
-                // 폴링 에러는 조용히 넘어가거나 콘솔에만 출력
-            } finally {
-                inFlight = false;
-                if (!canceled) {
-                    timerId = setTimeout(poll, 1000);
-                }
+                // 포커스 변경으로 취소한 요청은 바로 다시 보내고, 그 외 에러는 잠시 쉬었다가 재시도
+                if (!axios.isCancel(err)) delay = 1000;
             }
+            if (!canceled) timerId = setTimeout(sync, delay);
+        };
+
+        // 포커스가 바뀌면 대기 중인 요청을 끊고 새 상태로 바로 다시 요청
+        const setActive = (active) => {
+            if (activeRef.current === active) return;
+            activeRef.current = active;
+            if (controller) controller.abort();
         };
+        const handleVisibility = () => setActive(document.visibilityState === 'visible');
+        const handleFocus = () => setActive(true);
+        const handleBlur = () => setActive(false);
 
-        poll();
+        document.addEventListener('visibilitychange', handleVisibility);
+        window.addEventListener('focus', handleFocus);
+        window.addEventListener('blur', handleBlur);
+
+        sync();
         return () => {
             canceled = true;
             if (timerId) clearTimeout(timerId);
+            if (controller) controller.abort();
+            document.removeEventListener('visibilitychange', handleVisibility);
+            window.removeEventListener('focus', handleFocus);
+            window.removeEventListener('blur', handleBlur);
         };
-    }, [step, channel]);
+    }, [step, channel, nick]);
 
     const handleFileChange = (e) => {
         if(e.target.files.length > 0) setSelectedFile(e.target.files[0]);
@@ -0,0 +1,218 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+과부하 제어 (admission control)
+
+- 스레드 모드는 연결마다 스레드를 만들지 않고 WorkerPool(스레드 상한 + 크기 제한 대기열)로 처리
+- 전체/클라이언트(IP)별 동시 연결 수, 동시 long-poll(/events, /sync, /unread, /stream, /ws) 수를 제한
+- 한도를 넘으면 대기열에 무한정 쌓지 않고 바로 503 + Retry-After로 거절 (shed)
+요청 헤더/바디 읽기 기한(slowloris 방어)은 http_utils.HttpConnection과 async_server에서 적용합니다.
+"""
+
+import collections
+import threading
+import time
+
+try:
+    from src.http_utils import send_response
+except ImportError:
+    from http_utils import send_response
+
+# 스레드 모드 워커 스레드 수 / 워커를 기다릴 수 있는 연결 수
+MAX_WORKERS = 512
+MAX_QUEUE = 1024
+# 프로세스(워커)당 동시 연결 수, 같은 IP에서 오는 동시 연결 수
+MAX_CONNECTIONS = 10000
+MAX_CONNECTIONS_PER_CLIENT = 64
+# 스레드 모드에서 long-poll이 차지할 수 있는 워커 비율 (나머지는 짧은 요청용으로 남김)
+LONG_POLL_SHARE = 0.75
+# 거절 응답의 Retry-After(초)
+RETRY_AFTER = 2
+# 거절한 소켓을 닫기 전에 기다리는 시간(초). 바로 닫으면 뒤늦게 도착한 요청 때문에
+# RST가 나가 클라이언트가 503을 읽기 전에 연결 오류로 보게 됨
+SHED_LINGER = 1.0
+MAX_LINGERING = 1024
+
+# 응답할 때까지 오래 붙잡는 요청 (스레드 모드에서는 그동안 워커 하나를 차지)
+LONG_POLL_ROUTES = {"/events", "/sync", "/unread", "/stream", "/ws"}
+
+_SHED_BODY = b"Server overloaded, retry later"
+SHED_RESPONSE = (
+    f"HTTP/1.1 503 Service Unavailable\r\nRetry-After: {RETRY_AFTER}\r\n"
+    f"Content-Type: text/plain\r\nContent-Length: {len(_SHED_BODY)}\r\nConnection: close\r\n\r\n"
+).encode("ascii") + _SHED_BODY
+
+
+def send_overloaded(conn):
+    """동시 long-poll 한도 초과: 대기열에 쌓지 않고 바로 503 (클라이언트는 Retry-After 후 재시도)"""
+    send_response(conn, 503, "Service Unavailable", "Too many waiting requests, retry later",
+                  headers={"Retry-After": str(RETRY_AFTER)})
+
+
+class Admission:
+    """동시 연결/long-poll 수 집계와 거절 통계. 스레드 모드와 asyncio 모드가 함께 사용"""
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_per_client=MAX_CONNECTIONS_PER_CLIENT,
+                 max_long_polls=None):
+        self.max_connections = max_connections
+        self.max_per_client = max_per_client
+        self.max_long_polls = max_long_polls if max_long_polls is not None else max_connections
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.clients = {}  # client ip -> 동시 연결 수
+        self.long_polls = 0
+        self.shed = collections.Counter()  # 503으로 거절한 사유별 횟수
+        self.rejected = collections.Counter()  # 408/431 등 읽기 단계에서 거절한 사유별 횟수
+        self.pool = None  # WorkerPool (스레드 모드)
+        self.lingering = collections.deque()  # (닫을 시각, sock): accept 스레드만 사용
+
+    def admit(self, client):
+        """연결을 받을 수 있으면 None, 아니면 거절 사유"""
+        with self.lock:
+            if self.connections >= self.max_connections:
+                reason = "connections"
+            elif self.clients.get(client, 0) >= self.max_per_client:
+                reason = "client_limit"
+            else:
+                self.connections += 1
+                self.clients[client] = self.clients.get(client, 0) + 1
+                return None
+            self.shed[reason] += 1
+            return reason
+
+    def release(self, client):
+        with self.lock:
+            self.connections -= 1
+            count = self.clients.get(client, 0) - 1
+            if count > 0:
+                self.clients[client] = count
+            else:
+                self.clients.pop(client, None)
+
+    def begin_long_poll(self):
+        with self.lock:
+            if self.long_polls >= self.max_long_polls:
+                self.shed["long_polls"] += 1
+                return False
+            self.long_polls += 1
+            return True
+
+    def end_long_poll(self):
+        with self.lock:
+            self.long_polls -= 1
+
+    def count_shed(self, reason):
+        with self.lock:
+            self.shed[reason] += 1
+
+    def count_rejected(self, reason):
+        with self.lock:
+            self.rejected[reason] += 1
+
+    def saturated(self):
+        """워커를 기다리는 연결이 있으면 True: 요청을 마친 keep-alive 연결은 닫아 워커를 양보"""
+        return self.pool is not None and self.pool.saturated()
+
+    def shed_socket(self, sock):
+        """
+        accept 스레드에서 막히지 않게 논블로킹으로 503을 쓰고 송신 방향만 닫은 뒤,
+        SHED_LINGER 후에 닫도록 보관합니다.
+        """
+        try:
+            sock.setblocking(False)
+            sock.send(SHED_RESPONSE)
+            sock.shutdown(1)  # SHUT_WR
+        except OSError:
+            sock.close()
+            return
+        now = time.monotonic()
+        self.lingering.append((now + SHED_LINGER, sock))
+        self.close_lingering(now)
+
+    def close_lingering(self, now=None):
+        now = now if now is not None else time.monotonic()
+        while self.lingering and (self.lingering[0][0] <= now or len(self.lingering) > MAX_LINGERING):
+            try:
+                self.lingering.popleft()[1].close()
+            except OSError:
+                pass
+
+    def snapshot(self):
+        """/metrics용 현재 값"""
+        with self.lock:
+            stats = {
+                "connections": self.connections,
+                "long_polls": self.long_polls,
+                "shed": dict(self.shed),
+                "rejected": dict(self.rejected),
+            }
+        if self.pool is not None:
+            stats.update(self.pool.snapshot())
+        return stats
+
+
+class WorkerPool:
+    """
+    스레드 수 상한이 있는 워커 풀. 모든 워커가 일하는 중일 때만 스레드를 늘리고, 상한에 닿은 뒤
+    워커를 기다리는 연결이 queue_size를 넘으면 submit()이 False를 반환합니다 (호출한 쪽이 503으로 거절).
+    워커는 같은 락 안에서 연결을 꺼내며 busy를 올리므로, 꺼낸 직후의 워커를 쉬는 워커로 세지 않습니다.
+    WebSocket 연결의 전달 스레드(server.serve_websocket)는 이 상한 밖입니다. /ws는 LONG_POLL_ROUTES라
+    Admission.max_long_polls가 그 수를 제한합니다.
+    """
+
+    def __init__(self, handler, size=MAX_WORKERS, queue_size=MAX_QUEUE):
+        self.handler = handler
+        self.size = size
+        self.queue_size = queue_size
+        self.pending = collections.deque()  # 워커를 기다리는 연결
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.threads = 0
+        self.busy = 0
+
+    def _backlog_locked(self):
+        # 쉬는 워커가 가져가지 못하고 기다려야 하는 연결 수
+        return len(self.pending) - (self.threads - self.busy)
+
+    def submit(self, *args):
+        with self.lock:
+            if self._backlog_locked() >= 0:
+                if self.threads < self.size:
+                    self.threads += 1
+                    threading.Thread(target=self._run, name=f"worker-{self.threads}", daemon=True).start()
+                elif self._backlog_locked() >= self.queue_size:
+                    return False
+            self.pending.append(args)
+            self.cond.notify()
+        return True
+
+    def saturated(self):
+        with self.lock:
+            return self._backlog_locked() > 0
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                args = self.pending.popleft()
+                self.busy += 1
+            try:
+                self.handler(*args)
+            except Exception as e:
+                print(f"[WORKER ERROR] {e}")
+            finally:
+                with self.lock:
+                    self.busy -= 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"queue_depth": max(0, self._backlog_locked()), "workers": self.threads,
+                    "busy_workers": self.busy}
@@ -0,0 +1,380 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+단일 asyncio 이벤트 루프 기반 서버 엔진 (server.py --mode asyncio)
+
+연결당 스레드 대신 코루틴으로 요청을 처리합니다. /events long-poll은
+ChannelManager.wait_events_async()로 future에 파킹되므로 대기 중인 클라이언트가
+수천 명이어도 OS 스레드를 점유하지 않습니다. 나머지 라우트는 server.route_request를
+그대로 재사용해 스레드 모드와 동일한 응답을 보냅니다.
+클러스터(--workers N)에서는 변경 요청(POST, /ws 명령)이 버스 왕복을 기다리므로 executor 스레드에서 처리합니다.
+연결/long-poll 수 제한은 스레드 모드와 같은 Admission을 쓰고, 헤더는 KEEPALIVE_TIMEOUT 안에,
+바디는 body_deadline() 안에 다 와야 합니다.
+"""
+
+import asyncio
+import time
+import traceback
+
+try:
+    from src.http_utils import (KEEPALIVE_MAX_REQUESTS, KEEPALIVE_TIMEOUT, MAX_BODY_SIZE, MAX_HEADER_SIZE,
+                                RECV_SIZE, SSE_HEARTBEAT_INTERVAL, RequestRejected, body_deadline, content_length, events_json, grouped_events_json,
+                                negotiate_encoding, parse_cursors, parse_request_head, parse_query, parse_sync, parse_unread,
+                                send_json_bytes, send_response, sse_cursor, sse_event_frames, sse_head,
+                                sync_json, unread_json, wants_keep_alive)
+except ImportError:
+    from http_utils import (KEEPALIVE_MAX_REQUESTS, KEEPALIVE_TIMEOUT, MAX_BODY_SIZE, MAX_HEADER_SIZE,
+                            RECV_SIZE, SSE_HEARTBEAT_INTERVAL, RequestRejected, body_deadline, content_length, events_json, grouped_events_json,
+                            negotiate_encoding, parse_cursors, parse_request_head, parse_query, parse_sync, parse_unread,
+                            send_json_bytes, send_response, sse_cursor, sse_event_frames, sse_head,
+                            sync_json, unread_json, wants_keep_alive)
+
+try:
+    from src.admission import LONG_POLL_ROUTES, SHED_LINGER, SHED_RESPONSE, send_overloaded
+except ImportError:
+    from admission import LONG_POLL_ROUTES, SHED_LINGER, SHED_RESPONSE, send_overloaded
+
+try:
+    from src.metrics import observe_error, observe_request, route_label
+except ImportError:
+    from metrics import observe_error, observe_request, route_label
+
+try:
+    from src.websocket import (OP_PING, WS_IDLE_TIMEOUT, WS_PING_INTERVAL, AsyncSignal, ChatSession,
+                               FrameParser, ProtocolError, close_frame, encode_frame, handshake_response,
+                               is_upgrade_request)
+except ImportError:
+    from websocket import (OP_PING, WS_IDLE_TIMEOUT, WS_PING_INTERVAL, AsyncSignal, ChatSession,
+                           FrameParser, ProtocolError, close_frame, encode_frame, handshake_response,
+                           is_upgrade_request)
+
+
+class StreamConnection:
+    """route_request/send_* 에 넘기는 소켓 대용 객체 (sendall -> StreamWriter.write)"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.keep_alive = False
+        self.accept_encoding = None
+        self.status = None  # 마지막 응답 상태 코드, 누적 송수신 바이트 (/metrics)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.pending_file = None  # (file, offset, count): 라우트 처리 후 loop.sendfile로 전송
+        self.buffer = None  # run_blocking 중에는 다른 스레드가 쓰므로 모았다가 루프에서 write
+
+    def sendall(self, data):
+        if self.buffer is not None:
+            self.buffer.append(data)
+        else:
+            self.writer.write(data)
+        self.bytes_out += len(data)
+
+    async def run_blocking(self, fn, *args):
+        """
+        fn(*args)를 기본 executor 스레드에서 실행 (클러스터의 버스 왕복을 기다리는 변경 요청).
+        그동안 이 연결로 보내는 바이트는 모아 두었다가 끝난 뒤 루프에서 씁니다.
+        """
+        self.buffer = []
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        finally:
+            buffered, self.buffer = self.buffer, None
+            for data in buffered:
+                self.writer.write(data)
+
+    def sendfile(self, f, offset, count):
+        # 동기 라우트 안에서는 await할 수 없으므로 파일을 다시 열어 두고 이후에 전송
+        self.pending_file = (open(f.name, "rb"), offset, count)
+        self.bytes_out += count
+
+    async def flush(self):
+        await self.writer.drain()
+        if self.pending_file is not None:
+            f, offset, count = self.pending_file
+            self.pending_file = None
+            with f:
+                # os.sendfile 사용, 불가능한 transport면 asyncio가 청크 전송으로 fallback
+                await asyncio.get_running_loop().sendfile(self.writer.transport, f, offset, count)
+
+
+async def read_request_head(reader, conn):
+    """HttpConnection.read_request_head의 asyncio 버전. 실패 시 None 4개를 반환합니다."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+        conn.bytes_in += len(head)
+        return parse_request_head(head[:-4])
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None, None, None, None
+    except asyncio.LimitOverrunError:
+        # StreamReader limit(MAX_HEADER_SIZE) 안에 헤더 끝이 없음
+        raise RequestRejected(431, "Request Header Fields Too Large", "header_too_large")
+    except Exception as e:
+        print(f"[Parser Error] {e}")
+        return None, None, None, None
+
+
+async def stream_upload(reader, conn, sink, length):
+    """업로드 바디를 청크 단위로 읽어 UploadSink에 전달"""
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = await reader.read(min(RECV_SIZE, remaining))
+            if not chunk:
+                raise ConnectionError("Connection closed while reading body")
+            conn.bytes_in += len(chunk)
+            remaining -= len(chunk)
+            sink.feed(chunk)
+    except BaseException:
+        sink.abort()
+        raise
+
+
+async def stream_events(conn, manager, query, headers):
+    """server.stream_events의 asyncio 버전 (GET /stream, SSE)"""
+    channel = query.get("channel")
+    if not channel:
+        send_response(conn, 400, "Bad Request", "channel required")
+        return
+    since = sse_cursor(query, headers)
+    conn.keep_alive = False
+    conn.sendall(sse_head(conn))
+    while True:
+        # drain()은 클라이언트가 끊겼으면 ConnectionError를 냄
+        await conn.writer.drain()
+        events, latest, expired = await manager.wait_events_async(
+            channel, since, query.get("nick"), timeout=SSE_HEARTBEAT_INTERVAL
+        )
+        conn.sendall(sse_event_frames(events, latest, expired))
+        if events:
+            since = events[-1]["id"]
+
+
+async def serve_websocket(reader, conn, manager, query, headers):
+    """server.serve_websocket의 asyncio 버전 (GET /ws). 읽기/전달을 코루틴 두 개로 나눠 처리"""
+    nick = query.get("nick")
+    if not nick:
+        send_response(conn, 400, "Bad Request", "nick required")
+        return
+    if not is_upgrade_request(headers):
+        send_response(conn, 426, "Upgrade Required", "WebSocket upgrade required")
+        return
+    conn.keep_alive = False
+    conn.sendall(handshake_response(headers))
+    conn.status = 101
+
+    signal = AsyncSignal(asyncio.get_running_loop())
+    session = ChatSession(manager, nick, signal)
+
+    async def deliver():
+        while True:
+            try:
+                await asyncio.wait_for(signal.event.wait(), WS_PING_INTERVAL)
+                woken = True
+            except asyncio.TimeoutError:
+                woken = False
+            signal.event.clear()
+            conn.sendall(session.pending_frames())
+            if not woken:
+                conn.sendall(encode_frame(OP_PING))
+                manager.touch(nick)
+            await conn.writer.drain()
+
+    deliverer = asyncio.ensure_future(deliver())
+    parser = FrameParser()
+    try:
+        while not session.closed and not deliverer.done():
+            try:
+                data = await asyncio.wait_for(reader.read(RECV_SIZE), WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
+            if not data:
+                return
+            conn.bytes_in += len(data)
+            for opcode, payload in parser.feed(data):
+                if manager.blocking_writes:
+                    # join/message 등은 버스 왕복을 기다리므로 루프 밖에서 처리
+                    conn.sendall(await conn.run_blocking(session.handle, opcode, payload))
+                else:
+                    conn.sendall(session.handle(opcode, payload))
+                if session.closed:
+                    break
+            await conn.writer.drain()
+    except ProtocolError as e:
+        conn.sendall(close_frame(e.code, e.reason))
+    finally:
+        deliverer.cancel()
+        session.close()
+
+
+async def shed_connection(reader, writer):
+    """한도를 넘은 연결: 요청 헤더를 잠깐 기다렸다가 503 + Retry-After를 보내고 닫음"""
+    try:
+        await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), SHED_LINGER)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    try:
+        writer.write(SHED_RESPONSE)
+        await writer.drain()
+    except ConnectionError:
+        pass
+    writer.close()
+
+
+async def read_body(reader, conn, length):
+    try:
+        body = await asyncio.wait_for(reader.readexactly(length), body_deadline(length))
+    except asyncio.TimeoutError:
+        raise RequestRejected(408, "Request Timeout", "body_timeout")
+    conn.bytes_in += length
+    return body
+
+
+async def handle_connection(reader, writer, manager, route, begin_upload, admission):
+    client = (writer.get_extra_info("peername") or ("?",))[0]
+    if admission.admit(client) is not None:
+        await shed_connection(reader, writer)
+        return
+    conn = StreamConnection(writer)
+    try:
+        for served in range(1, KEEPALIVE_MAX_REQUESTS + 1):
+            bytes_in, bytes_out = conn.bytes_in, conn.bytes_out
+            try:
+                method, path, version, headers = await asyncio.wait_for(read_request_head(reader, conn),
+                                                                        KEEPALIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
+            if method is None:
+                return
+
+            path_only, query = parse_query(path)
+            conn.keep_alive = served < KEEPALIVE_MAX_REQUESTS and wants_keep_alive(version, headers)
+            conn.accept_encoding = negotiate_encoding(headers)
+            started = time.perf_counter()
+
+            if method == "POST" and path_only == "/upload":
+                sink = begin_upload(conn, headers)
+                if sink is not None:
+                    length = content_length(headers)
+                    try:
+                        await asyncio.wait_for(stream_upload(reader, conn, sink, length), body_deadline(length))
+                    except asyncio.TimeoutError:
+                        raise RequestRejected(408, "Request Timeout", "body_timeout")
+                    sink.finish(conn)
+            else:
+                length = content_length(headers)
+                if length > MAX_BODY_SIZE:
+                    conn.keep_alive = False
+                    send_response(conn, 413, "Payload Too Large", f"Body exceeds {MAX_BODY_SIZE} bytes")
+                    await writer.drain()
+                    return
+                body = await read_body(reader, conn, length) if length else b""
+
+                waiting = path_only in LONG_POLL_ROUTES
+                if waiting and not admission.begin_long_poll():
+                    send_overloaded(conn)
+                else:
+                    try:
+                        if method == "GET" and path_only == "/events":
+                            events, latest, expired = await manager.wait_events_async(
+                                query.get("channel"), int(query.get("since", 0)), query.get("nick")
+                            )
+                            send_json_bytes(conn, 200, events_json(events, latest, expired))
+                        elif method == "POST" and path_only == "/events":
+                            # 여러 채널을 한 번의 long-poll로 대기: {"nick", "cursors": {channel: since}, "read"?}
+                            try:
+                                cursors, nick, read = parse_cursors(body)
+                            except ValueError as e:
+                                send_response(conn, 400, "Bad Request", str(e))
+                            else:
+                                results, latest = await manager.wait_channels_async(cursors, nick, read=read)
+                                send_json_bytes(conn, 200, grouped_events_json(results, latest, cursors))
+                        elif method == "POST" and path_only == "/sync":
+                            # 채널 목록/접속자/이벤트 델타를 한 번의 long-poll로: 브라우저의 폴링 루프 세 개를 대체
+                            try:
+                                nick, epoch, versions, cursors, read, active = parse_sync(body)
+                            except ValueError as e:
+                                send_response(conn, 400, "Bad Request", str(e))
+                            else:
+                                state, results, latest = await manager.sync_async(
+                                    nick, epoch, versions, cursors, read=read, active=active)
+                                send_json_bytes(conn, 200, sync_json(state, results, latest, cursors))
+                        elif method == "GET" and path_only == "/unread":
+                            # 채널별 안 읽은 수 (이벤트 없이), version을 주면 바뀔 때까지 대기
+                            try:
+                                nick, version = parse_unread(query)
+                            except ValueError as e:
+                                send_response(conn, 400, "Bad Request", str(e))
+                            else:
+                                counts, version = await manager.wait_unread_async(nick, version)
+                                send_json_bytes(conn, 200, unread_json(counts, version))
+                        elif method == "GET" and path_only == "/stream":
+                            await stream_events(conn, manager, query, headers)
+                        elif method == "GET" and path_only == "/ws":
+                            await serve_websocket(reader, conn, manager, query, headers)
+                        elif method == "POST" and manager.blocking_writes:
+                            # 변경 요청은 클러스터 버스 왕복을 기다리므로 루프 밖에서 처리
+                            await conn.run_blocking(route, conn, method, path_only, query, headers, body)
+                        else:
+                            route(conn, method, path_only, query, headers, body)
+                    finally:
+                        if waiting:
+                            admission.end_long_poll()
+            await conn.flush()
+            observe_request(route_label(method, path_only), conn.status, time.perf_counter() - started,
+                            conn.bytes_in - bytes_in, conn.bytes_out - bytes_out)
+
+            if not conn.keep_alive:
+                return
+
+    except RequestRejected as e:
+        # 읽기 기한 초과(408) / 헤더가 너무 큼(431)
+        admission.count_rejected(e.kind)
+        conn.keep_alive = False
+        send_response(conn, e.status, e.reason, e.reason)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        traceback.print_exc()
+        observe_error()
+        try:
+            conn.keep_alive = False
+            send_response(conn, 500, "Internal Error", str(e))
+        except: pass
+    finally:
+        admission.release(client)
+        if conn.pending_file is not None:
+            conn.pending_file[0].close()
+        try: writer.close()
+        except: pass
+
+
+def start_async_server(server_sock, manager, route, begin_upload, admission):
+    """
+    이미 bind/listen 된 server_sock으로 asyncio 서버를 실행합니다.
+    route/begin_upload/admission은 server.py의 route_request/begin_upload/admission (스레드 모드와 공유)
+    """
+
+    async def _serve():
+        # limit: readuntil()로 읽는 요청 헤더의 최대 크기
+        server = await asyncio.start_server(
+            lambda r, w: handle_connection(r, w, manager, route, begin_upload, admission), sock=server_sock,
+            limit=MAX_HEADER_SIZE
+        )
+        print(f"[HTTP] Server running on {server_sock.getsockname()[:2]} (asyncio)")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_sock.close()
@@ -7,61 +7,228 @@
 # 21011650 이규민 (QA & Documentation Specialist)
 # ==============================================================================
 
+import asyncio
+import heapq
+import itertools
+import json
+import os
 import threading
 import time
 
+try:
+    from src.event_log import EVENT_LOG_MAX_AGE, EVENT_LOG_MAX_EVENTS, Event, EventLog
+    from src.metrics import InstrumentedRLock
+    from src.search_index import SEARCH_LIMIT, TextIndex, message_grams
+except ImportError:
+    from event_log import EVENT_LOG_MAX_AGE, EVENT_LOG_MAX_EVENTS, Event, EventLog
+    from metrics import InstrumentedRLock
+    from search_index import SEARCH_LIMIT, TextIndex, message_grams
+
 # 유저 활동 기준(초) – 너무 짧게 깜빡이지 않도록 여유를 둠
 ACTIVE_THRESHOLD = 15
 # 활동이 완전히 끊긴 유저를 채널에서 제거하는 시간(초)
 STALE_TIMEOUT = 20
+# /sync가 델타로 돌려줄 수 있는 채널/유저 변경 기록 수. 이보다 뒤처진 클라이언트는 전체 목록을 받음
+SYNC_LOG_SIZE = 1024
+# 활성 -> 비활성 전환 시각에 정확히 깨면 아직 활성으로 판정되므로 살짝 늦게 깨움
+FLIP_MARGIN = 0.05
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def _visible_to(channel, nick):
+    """DM 채널(!dm_a_b)은 참가자에게만 보임"""
+    if not channel.startswith('!dm_'):
+        return True
+    return bool(nick) and nick in channel.replace('!dm_', '').split('_')
+
+def _append_sync_log(log, entry):
+    # 가끔 앞부분을 한 번에 잘라 append를 O(1)로 유지 (버전 v의 변경은 log[v - floor - 1])
+    log.append(entry)
+    if len(log) > 2 * SYNC_LOG_SIZE:
+        del log[:len(log) - SYNC_LOG_SIZE]
+
+def _iter_locked(lock, iterator):
+    """next() 한 번마다 lock을 잡았다 놓음: 여러 채널을 병합하는 동안 채널 락을 계속 쥐고 있지 않도록"""
+    while True:
+        with lock:
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+def _wake_future(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class _ThreadWaiter:
+    """wait_events 스레드 하나. 매니저 락을 공유하는 전용 Condition으로 대기"""
+
+    def __init__(self, lock):
+        self.cond = threading.Condition(lock)
+        self.woken = False
+
+    def wake(self):
+        self.woken = True
+        self.cond.notify()
+
+
+class _AsyncWaiter:
+    """wait_events_async 코루틴 하나. future가 완료되면 깨어남"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.woken = False
+
+    def wake(self):
+        self.woken = True
+        if self.loop is _running_loop():
+            self.loop.call_soon(_wake_future, self.future)
+        else:
+            self.loop.call_soon_threadsafe(_wake_future, self.future)
+
 
 class ChannelManager:
-    def __init__(self):
+    """
+    락은 두 단계입니다.
+    - self.lock(self.cond): 멤버십, 접속 상태, 이벤트 id, 대기자, /sync 기록
+    - log_locks[channel]: 그 채널의 EventLog와 TextIndex. 항상 매니저 락 다음에 잡고(또는 단독으로),
+      채널 락을 쥔 채 매니저 락을 잡지 않음
+    스크롤백/검색은 채널 락만 잡고, 채널 목록과 접속자 목록은 바뀔 때 만들어 둔 불변 스냅샷을
+    락 없이 읽으므로 다른 채널의 메시지 기록을 기다리지 않습니다.
+    """
+
+    # 변경 메서드(join/part/leave/message/presence)가 다른 프로세스의 응답을 기다리는지 (클러스터 복제본).
+    # 그렇다면 asyncio 서버는 그 호출을 이벤트 루프 밖(executor)에서 실행
+    blocking_writes = False
+
+    def __init__(self, max_events=EVENT_LOG_MAX_EVENTS, max_age=EVENT_LOG_MAX_AGE):
         self.channels = {}  # channel -> set(nick)
-        self.channel_events = {}  # channel -> list of event dicts
+        self.channel_events = {}  # channel -> EventLog (링 버퍼)
+        self.text_indexes = {}  # channel -> TextIndex (보관 중인 메시지의 검색 색인)
+        self.log_locks = {}  # channel -> Lock (위 두 항목 보호)
+        self.max_events = max_events  # 채널별 이벤트 보관 개수/기간
+        self.max_age = max_age
         self.last_event_id = 0
         self.last_read = {}  # channel -> {nick: last_read_event_id}
+        # 안 읽은 메시지 수 = 채널의 누적 메시지 수 - 유저가 마지막으로 읽었을 때의 누적 메시지 수.
+        # 기록/읽음 처리마다 값 하나만 바꾸므로 채널 멤버 수나 보관 이벤트 수와 관계없이 O(1)
+        self.message_counts = {}  # channel -> 지금까지 기록된 message 이벤트 수
+        self.read_marks = {}  # channel -> {nick: 읽음 처리 시점의 message_counts 값}
+        self.unread_versions = {}  # nick -> 읽음 위치/채널 구성이 마지막으로 바뀐 read_seq
+        self.read_seq = 0
+        self.unread_waiters = {}  # nick -> set(waiter): GET /unread long-poll 대기자
         self.last_seen = {}  # nick -> last activity timestamp
+        self.user_channels = {}  # nick -> set(channel): 만료 시 유저가 속한 채널만 정리
+        # (last_seen + STALE_TIMEOUT, nick) 최소 힙. 활동 갱신은 last_seen만 바꾸고,
+        # 힙 맨 앞 항목이 기한을 넘겼을 때 실제 last_seen으로 다시 확인함
+        self.expiry_heap = []
+        self.expiry_pending = set()  # 힙에 항목이 있는 nick (유저당 항목 하나만 유지)
         self.focus_state = {}  # nick -> bool (True if page focused/visible)
-        self.cond = threading.Condition()
+        self.lock = InstrumentedRLock()  # RLock + 대기/보유 시간 계측 (/metrics)
+        self.cond = threading.Condition(self.lock)
+        # channel -> set(waiter): 해당 채널에 이벤트가 생길 때만 깨울 long-poll 대기자
+        self.waiters = {}
+        # 깨어났을 때 이벤트를 받아간 횟수 / 받을 게 없어 다시 잠든 횟수
+        self.wakeup_stats = {"delivered": 0, "empty": 0}
+        self.journal = None  # EventJournal (옵션): 기록된 이벤트를 디스크에 남김
+        # 이벤트 기록/삭제 콜백 (옵션): 업로드 저장소가 메시지의 파일 참조 수를 따라가는 데 사용
+        self.on_record = None
+        self.on_evict = None
+        # /channels, /users 응답 캐시. 채널 목록/접속 상태가 바뀔 때만 버전을 올려 무효화
+        self.channels_version = 0  # 채널이 생기거나 없어질 때
+        self.channel_snapshot = (0, ())  # (channels_version, 정렬된 채널 이름 튜플): 락 없이 읽음
+        self.users_version = 0  # 멤버십/포커스/활성 여부가 바뀔 때
+        self.channels_cache = (-1, {})  # (channels_version, {nick: 응답 바이트})
+        self.users_cache = (-1, 0, b"")  # (users_version, 유효 기한, 응답 바이트)
+        # /sync 델타. 채널 로그는 channels_version 하나당 (channel, 존재 여부) 하나.
+        # 유저 상태는 바뀌었을 수 있는 nick만 dirty_users에 모았다가 sync 때 게시(user_view)하고,
+        # 실제로 바뀐 것만 user_seq를 올려 user_log에 (nick, active 또는 None=퇴장)으로 남김
+        self.sync_epoch = os.urandom(6).hex()  # 재시작/다른 워커의 버전을 구분
+        self.channel_log = []
+        self.user_view = {}  # nick -> active (클라이언트에 게시된 상태)
+        self.user_seq = 0
+        self.user_log = []
+        self.dirty_users = set()
+        # (비활성으로 바뀌는 시각, nick): 포커스 없이 활성으로 게시된 유저는 시간만 지나도 바뀜
+        self.flip_heap = []
+        self.flip_pending = set()
+        self.sync_waiters = set()  # 채널/유저 변경에도 깨울 /sync 대기자
 
     def list_channels(self, nick=None):
-        with self.cond:
-            self._cleanup_inactive_locked()
-            channels = []
-            for ch in sorted(self.channels.keys()):
-                if ch.startswith('!dm_'):
-                    if not nick:
-                        continue
-                    participants = ch.replace('!dm_', '').split('_')
-                    if nick not in participants:
-                        continue
-                channels.append(ch)
-            return channels
+        self._expire_if_due()
+        return [ch for ch in self.channel_snapshot[1] if _visible_to(ch, nick)]
 
     def get_all_users(self):
         """현재 접속 중인 모든 유저 목록 (중복 제거)"""
         with self.cond:
-            self._cleanup_inactive_locked()
-            users = set()
-            for members in self.channels.values():
-                users.update(members)
+            self._expire_inactive_locked()
             user_list = []
             now = time.time()
-            for u in users:
+            for u in self.user_channels:
                 last = self.last_seen.get(u, 0)
                 active = self.focus_state.get(u, False) or ((now - last) <= ACTIVE_THRESHOLD)
                 user_list.append({"nick": u, "active": active})
             user_list.sort(key=lambda x: x["nick"])
             return user_list
 
+    def channels_json(self, nick=None):
+        """
+        GET /channels 응답 바디 {"channels": [...]} (채널 목록이 바뀌기 전까지 nick별로 캐시).
+        스냅샷과 캐시만 읽으므로 락을 잡지 않음 (동시에 만든 같은 바디는 마지막 것이 남음)
+        """
+        self._expire_if_due()
+        version, names = self.channel_snapshot
+        cached_version, bodies = self.channels_cache
+        if cached_version != version:
+            bodies = {}
+            self.channels_cache = (version, bodies)
+        body = bodies.get(nick)
+        if body is None:
+            channels = [ch for ch in names if _visible_to(ch, nick)]
+            body = bodies[nick] = json.dumps({"channels": channels}).encode("utf-8")
+        return body
+
+    def users_json(self):
+        """
+        GET /users 응답 바디 {"users": [...]}.
+        active는 시간이 지나면 바뀌므로 버전과 함께 가장 먼저 비활성으로 바뀔 유저의 시각까지만 캐시.
+        캐시가 유효하면 락 없이 바로 돌려주고, 다시 만들 때만 락을 잡음
+        """
+        now = time.time()
+        version, valid_until, body = self.users_cache
+        if version == self.users_version and now < valid_until and not self._expiry_due(now):
+            return body
+        with self.cond:
+            self._expire_inactive_locked()
+            now = time.time()
+            version, valid_until, body = self.users_cache
+            if version == self.users_version and now < valid_until:
+                return body
+            users = self.get_all_users()
+            flips = [self.last_seen.get(u["nick"], 0) + ACTIVE_THRESHOLD for u in users
+                     if u["active"] and not self.focus_state.get(u["nick"], False)]
+            body = json.dumps({"users": users}).encode("utf-8")
+            self.users_cache = (self.users_version, min(flips, default=float("inf")), body)
+            return body
+
     def join_channel(self, channel, nick):
         with self.cond:
+            if channel not in self.channels:
+                self._channels_changed_locked(channel, True)
             members = self.channels.setdefault(channel, set())
             members.add(nick)
-            self.last_seen[nick] = time.time()
+            self.user_channels.setdefault(nick, set()).add(channel)
+            self._users_changed_locked(nick)
+            self._touch_locked(nick)
             self.last_read.setdefault(channel, {})[nick] = self.last_event_id
-            self._cleanup_inactive_locked()
+            self._set_read_mark_locked(channel, nick, self.message_counts.get(channel, 0))
+            self._expire_inactive_locked()
             # 입장 시스템 메시지
             event = self._record_event_locked(channel, "join", nick)
             return list(members), event
@@ -70,121 +237,669 @@ class ChannelManager:
         with self.cond:
             if channel not in self.channels or nick not in self.channels[channel]:
                 return False
-            self.channels[channel].remove(nick)
-            if channel in self.last_read and nick in self.last_read[channel]:
-                del self.last_read[channel][nick]
-            # 채널에서 나가면 last_seen은 일단 두지만 이후 cleanup에서 정리됨
+            # 채널에서 나가면 last_seen은 일단 두지만 이후 만료 처리에서 정리됨
+            self._remove_member_locked(channel, nick)
             self._record_event_locked(channel, "part", nick, text=reason)
-            if not self.channels[channel]:
-                del self.channels[channel]
-                if channel in self.last_read:
-                    del self.last_read[channel]
             return True
     def leave_all(self, nick, reason="leaving"):
         with self.cond:
-            changed = False
-            for channel, members in list(self.channels.items()):
-                if nick in members:
-                    members.remove(nick)
-                    changed = True
-                    if channel in self.last_read and nick in self.last_read[channel]:
-                        del self.last_read[channel][nick]
-                    self._record_event_locked(channel, "part", nick, text=reason)
-                    if not members:
-                        del self.channels[channel]
-                        if channel in self.last_read:
-                            del self.last_read[channel]
-            if nick in self.last_seen:
-                del self.last_seen[nick]
-            return changed
+            channels = sorted(self.user_channels.get(nick, ()))
+            for channel in channels:
+                self._remove_member_locked(channel, nick)
+                self._record_event_locked(channel, "part", nick, text=reason)
+            # 힙에 남은 항목은 기한이 되어 꺼낼 때 정리됨 (그 전에 재입장하면 그대로 재사용)
+            self.last_seen.pop(nick, None)
+            return bool(channels)
 
     # [핵심 수정] msg_type 인자가 추가되었습니다!
     def post_message(self, channel, nick, text, msg_type="text", file_name=None):
         """msg_type: 'text', 'image', or 'file'"""
+        grams = message_grams(msg_type, text, file_name)  # 색인 준비는 락 밖에서
         with self.cond:
             if channel not in self.channels or nick not in self.channels[channel]:
                 return None
-            self.last_seen[nick] = time.time()
-            self.focus_state[nick] = True
-            self._cleanup_inactive_locked()
+            self._touch_locked(nick)
+            self._set_focus_locked(nick, True)
+            self._expire_inactive_locked()
             return self._record_event_locked(
-                channel, "message", nick, text=text, msg_type=msg_type, file_name=file_name
+                channel, "message", nick, text=text, msg_type=msg_type, file_name=file_name, grams=grams
             )
 
     def wait_events(self, channel, since_id, nick=None, timeout=10):
+        """
+        since_id 이후 이벤트가 생길 때까지 대기 후 (events, latest, expired)를 반환.
+        expired=True면 커서가 보관 범위 밖이라 클라이언트가 재동기화해야 함.
+        """
+        results, latest = self.wait_channels({channel: since_id}, nick, timeout)
+        events, expired = results[channel]
+        return events, latest, expired
+
+    async def wait_events_async(self, channel, since_id, nick=None, timeout=10):
+        """wait_events의 asyncio 버전: 스레드를 막지 않고 future로 대기"""
+        results, latest = await self.wait_channels_async({channel: since_id}, nick, timeout)
+        events, expired = results[channel]
+        return events, latest, expired
+
+    def wait_channels(self, cursors, nick=None, timeout=10, read=None):
+        """
+        여러 채널을 한 번에 대기합니다. cursors는 {channel: since_id}.
+        어느 한 채널에라도 새 이벤트가 생기면 ({channel: (events, expired)}, latest)를 반환.
+        대기자 하나를 요청한 모든 채널에 등록하므로 채널 수와 관계없이 스레드 하나만 파킹됨.
+        read가 주어지면 그 채널들만 읽음 처리 (나머지는 보고 있지 않은 배경 구독)
+        """
+        deadline = time.time() + timeout
+        with self.cond:
+            results, latest, ready = self._collect_many_locked(cursors)
+            if not ready:
+                waiter = _ThreadWaiter(self.lock)
+                for channel in cursors:
+                    self._add_waiter_locked(channel, waiter)
+                try:
+                    while not ready:
+                        remaining = deadline - time.time()
+                        if remaining <= 0: break
+                        waiter.woken = False
+                        waiter.cond.wait(timeout=remaining)
+                        results, latest, ready = self._collect_many_locked(cursors)
+                        if waiter.woken:
+                            self._count_wakeup_locked(ready)
+                finally:
+                    for channel in cursors:
+                        self._remove_waiter_locked(channel, waiter)
+
+            self._finish_wait_locked(cursors, nick, latest, read)
+            return results, latest
+
+    async def wait_channels_async(self, cursors, nick=None, timeout=10, read=None):
+        """wait_channels의 asyncio 버전"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter = None
+        while True:
+            with self.cond:
+                results, latest, ready = self._collect_many_locked(cursors)
+                if waiter is not None:
+                    for channel in cursors:
+                        self._remove_waiter_locked(channel, waiter)
+                    if waiter.woken:
+                        self._count_wakeup_locked(ready)
+                remaining = deadline - loop.time()
+                if ready or remaining <= 0:
+                    self._finish_wait_locked(cursors, nick, latest, read)
+                    return results, latest
+                waiter = _AsyncWaiter(loop)
+                for channel in cursors:
+                    self._add_waiter_locked(channel, waiter)
+            try:
+                await asyncio.wait_for(waiter.future, timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                with self.cond:
+                    for channel in cursors:
+                        self._remove_waiter_locked(channel, waiter)
+                raise
+
+    def sync(self, nick, epoch, versions, cursors, timeout=10, read=None, active=None):
+        """
+        POST /sync: 채널 목록, 접속자, 이벤트를 한 번의 long-poll로 대기합니다.
+        versions는 클라이언트가 마지막으로 받은 {"channels", "users"} 버전(epoch가 다르면 무시).
+        그 이후 바뀐 것이나 cursors 채널의 새 이벤트가 생기면 (state, results, latest)를 반환.
+        active가 주어지면 먼저 포커스 상태를 갱신 (/presence heartbeat를 겸함)
+        """
+        self._sync_presence(nick, active)
+        deadline = time.time() + timeout
+        with self.cond:
+            state, results, latest, ready = self._collect_sync_locked(nick, epoch, versions, cursors)
+            if not ready:
+                waiter = _ThreadWaiter(self.lock)
+                self._add_sync_waiter_locked(cursors, waiter)
+                try:
+                    while not ready:
+                        now = time.time()
+                        if deadline <= now: break
+                        waiter.woken = False
+                        waiter.cond.wait(timeout=max(0, min(deadline, self._next_flip_locked()) - now))
+                        state, results, latest, ready = self._collect_sync_locked(nick, epoch, versions, cursors)
+                        if waiter.woken:
+                            self._count_wakeup_locked(ready)
+                finally:
+                    self._remove_sync_waiter_locked(cursors, waiter)
+
+            self._finish_wait_locked(cursors, nick, latest, read)
+            return state, results, latest
+
+    async def sync_async(self, nick, epoch, versions, cursors, timeout=10, read=None, active=None):
+        """sync의 asyncio 버전"""
+        if active is not None and nick and self.focus_state.get(nick, False) != active:
+            await self.set_focus_async(nick, active)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter = None
+        while True:
+            with self.cond:
+                state, results, latest, ready = self._collect_sync_locked(nick, epoch, versions, cursors)
+                if waiter is not None:
+                    self._remove_sync_waiter_locked(cursors, waiter)
+                    if waiter.woken:
+                        self._count_wakeup_locked(ready)
+                remaining = deadline - loop.time()
+                if ready or remaining <= 0:
+                    self._finish_wait_locked(cursors, nick, latest, read)
+                    return state, results, latest
+                remaining = min(remaining, self._next_flip_locked() - time.time())
+                waiter = _AsyncWaiter(loop)
+                self._add_sync_waiter_locked(cursors, waiter)
+            try:
+                await asyncio.wait_for(waiter.future, timeout=max(0, remaining))
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                with self.cond:
+                    self._remove_sync_waiter_locked(cursors, waiter)
+                raise
+
+    def poll_events(self, channel, since_id, nick=None):
+        """대기 없이 since_id 이후 이벤트를 (events, latest, expired)로 반환 (구독형 연결용)"""
+        with self.cond:
+            events, latest, expired = self._collect_locked(channel, since_id)
+            self._mark_read_locked(channel, nick, latest)
+            return events, latest, expired
+
+    def unread(self, nick):
+        """({channel: 안 읽은 메시지 수}, 버전). 유저가 속한 채널 수에 비례하며 이벤트는 보지 않음"""
+        with self.cond:
+            return self._unread_locked(nick)
+
+    def wait_unread(self, nick, version=None, timeout=10):
+        """
+        GET /unread long-poll. version이 현재 버전과 같으면 안 읽은 수가 바뀔 때까지 대기 후
+        (counts, version)을 반환합니다. version이 없거나 이미 다르면 바로 반환
+        """
         deadline = time.time() + timeout
         with self.cond:
-            def _collect():
-                raw = [e for e in self.channel_events.get(channel, []) if e["id"] > since_id]
-                return raw, self.last_event_id
+            self._expire_inactive_locked()
+            counts, current = self._unread_locked(nick)
+            if current == version:
+                waiter = _ThreadWaiter(self.lock)
+                channels = self._add_unread_waiter_locked(nick, waiter)
+                try:
+                    while current == version:
+                        remaining = deadline - time.time()
+                        if remaining <= 0: break
+                        waiter.woken = False
+                        waiter.cond.wait(timeout=remaining)
+                        counts, current = self._unread_locked(nick)
+                        if waiter.woken:
+                            self._count_wakeup_locked(current != version)
+                finally:
+                    self._remove_unread_waiter_locked(nick, channels, waiter)
+            self._finish_unread_locked(nick)
+            return counts, current
 
-            events, latest = _collect()
-            while not events:
-                remaining = deadline - time.time()
-                if remaining <= 0: break
-                self.cond.wait(timeout=remaining)
-                events, latest = _collect()
+    async def wait_unread_async(self, nick, version=None, timeout=10):
+        """wait_unread의 asyncio 버전"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter = None
+        channels = ()
+        while True:
+            with self.cond:
+                if waiter is None:
+                    self._expire_inactive_locked()
+                counts, current = self._unread_locked(nick)
+                if waiter is not None:
+                    self._remove_unread_waiter_locked(nick, channels, waiter)
+                    if waiter.woken:
+                        self._count_wakeup_locked(current != version)
+                remaining = deadline - loop.time()
+                if current != version or remaining <= 0:
+                    self._finish_unread_locked(nick)
+                    return counts, current
+                waiter = _AsyncWaiter(loop)
+                channels = self._add_unread_waiter_locked(nick, waiter)
+            try:
+                await asyncio.wait_for(waiter.future, timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                with self.cond:
+                    self._remove_unread_waiter_locked(nick, channels, waiter)
+                raise
 
-            # 이 호출을 한 유저를 읽음 처리
-            if nick:
+    def history(self, channel, before_id=None, limit=50, nick=None):
+        """스크롤백: before_id 이전 이벤트 최대 limit개 (오래된 순), 더 이전 이벤트가 남았는지. 다른 사람의 DM은 빈 페이지"""
+        log = self.channel_events.get(channel)
+        if log is None or not _visible_to(channel, nick):
+            return [], False
+        # 보통은 락 없이 읽고, 버리기와 겹쳤을 때만 채널 락을 잡음 (읽는 쪽이 락을 쥔 채 선점되어
+        # 그 채널에 기록하려는 스레드가 매니저 락을 쥐고 기다리는 일을 줄임)
+        page = log.try_before(before_id, limit)
+        if page is not None:
+            return page
+        with self.log_locks[channel]:
+            return log.before(before_id, limit)
+
+    def search(self, terms, channel=None, nick=None, before_id=None, limit=SEARCH_LIMIT):
+        """
+        terms(search_index.query_terms)를 모두 포함하는 메시지를 최신순으로 최대 limit개.
+        channel이 없으면 nick이 볼 수 있는 모든 채널에서 (어느 쪽이든 다른 사람의 DM은 제외)
+        """
+        if channel is not None:
+            channels = [channel] if _visible_to(channel, nick) else []
+        else:
+            # tuple()은 GIL 안에서 한 번에 복사되므로 채널이 새로 생겨도 안전
+            channels = [ch for ch in tuple(self.channel_events) if _visible_to(ch, nick)]
+        found = []
+        for ch in channels:
+            log = self.channel_events.get(ch)
+            if log is None:
+                continue
+            lock = self.log_locks[ch]
+            with lock:
+                log.trim()
+            found.append(_iter_locked(lock, self.text_indexes[ch].iter_matches(terms, log, before_id)))
+        # 채널마다 최신순이므로 병합하면서 limit개만 확인 (채널 수 x limit개를 모두 찾지 않음)
+        merged = heapq.merge(*found, key=lambda e: e.id, reverse=True)
+        return list(itertools.islice(merged, limit))
+
+    def subscribe(self, channels, waiter):
+        """
+        wake() 메서드를 가진 waiter를 채널들의 대기자로 등록합니다.
+        WebSocket처럼 연결 하나가 여러 채널을 계속 구독할 때 사용 (wake는 락을 쥔 채 호출됨)
+        """
+        with self.cond:
+            for channel in channels:
+                self._add_waiter_locked(channel, waiter)
+
+    def unsubscribe(self, channels, waiter):
+        with self.cond:
+            for channel in channels:
+                self._remove_waiter_locked(channel, waiter)
+
+    def touch(self, nick):
+        """이벤트 없이 연결만 유지 중인 유저의 활동 시각 갱신"""
+        with self.cond:
+            self._touch_locked(nick)
+
+    def restore_events(self, events):
+        """저널에서 읽은 이벤트로 채널 이력과 이벤트 id를 복구합니다. (멤버십은 복구하지 않음)"""
+        count = 0
+        with self.cond:
+            for event in events:
+                event = Event.from_dict(event)
+                self._append_event_locked(event)
+                self.last_event_id = max(self.last_event_id, event.id)
+                count += 1
+        return count
+
+    def snapshot_events(self):
+        """저널 스냅샷용: (last_event_id, 보관 중인 전체 이벤트를 id 순으로)"""
+        with self.cond:
+            events = []
+            for channel, log in self.channel_events.items():
+                with self.log_locks[channel]:
+                    events.extend(log.since(0)[0])
+            last_event_id = self.last_event_id
+        events.sort(key=lambda e: e.id)
+        return last_event_id, events
+
+    def wakeup_counters(self):
+        """대기자 깨우기 통계 + 현재 채널별 대기 중인 long-poll 수"""
+        with self.cond:
+            parked = {ch: len(ws) for ch, ws in self.waiters.items()}
+            return dict(self.wakeup_stats), parked
+
+    def event_log_sizes(self):
+        """채널별 보관 중인 이벤트 수 (/metrics용 근삿값이라 락 없이 읽음)"""
+        return {ch: len(log) for ch, log in tuple(self.channel_events.items())}
+
+    def _add_waiter_locked(self, channel, waiter):
+        self.waiters.setdefault(channel, set()).add(waiter)
+
+    def _remove_waiter_locked(self, channel, waiter):
+        waiters = self.waiters.get(channel)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self.waiters[channel]
+
+    def _add_unread_waiter_locked(self, nick, waiter):
+        """nick의 읽음/채널 변경과, 속한 채널의 새 이벤트에 깨도록 등록. 등록한 채널 목록을 반환"""
+        self.unread_waiters.setdefault(nick, set()).add(waiter)
+        channels = list(self.user_channels.get(nick, ()))
+        for channel in channels:
+            self._add_waiter_locked(channel, waiter)
+        return channels
+
+    def _remove_unread_waiter_locked(self, nick, channels, waiter):
+        waiters = self.unread_waiters.get(nick)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self.unread_waiters[nick]
+        for channel in channels:
+            self._remove_waiter_locked(channel, waiter)
+
+    def _sync_presence(self, nick, active):
+        # 활동 시각은 대기를 마칠 때 갱신되므로 포커스가 달라졌을 때만 반영 (클러스터에서는 버스 op 하나)
+        if active is not None and nick and self.focus_state.get(nick, False) != active:
+            self.set_focus(nick, active)
+
+    def _add_sync_waiter_locked(self, cursors, waiter):
+        self.sync_waiters.add(waiter)
+        for channel in cursors:
+            self._add_waiter_locked(channel, waiter)
+
+    def _remove_sync_waiter_locked(self, cursors, waiter):
+        self.sync_waiters.discard(waiter)
+        for channel in cursors:
+            self._remove_waiter_locked(channel, waiter)
+
+    def _wake_sync_locked(self):
+        for waiter in self.sync_waiters:
+            waiter.wake()
+
+    def _channels_changed_locked(self, channel, exists):
+        """채널이 생기기 직전 또는 없어진 직후에 호출: 새 채널 목록 스냅샷을 게시하고 버전을 올림"""
+        names = set(self.channels)
+        if exists:
+            names.add(channel)
+        else:
+            names.discard(channel)
+        # 정렬이 실패해도 버전만 올라가 channel_log와 어긋나지 않도록 스냅샷을 먼저 만듦
+        names = tuple(sorted(names))
+        self.channels_version += 1
+        self.channel_snapshot = (self.channels_version, names)
+        _append_sync_log(self.channel_log, (channel, exists))
+        self._wake_sync_locked()
+
+    def _users_changed_locked(self, nick):
+        """멤버십/포커스/활성 여부가 바뀜: /users 캐시 무효화, /sync 대기자가 게시하도록 깨움"""
+        self.users_version += 1
+        self.dirty_users.add(nick)
+        self._wake_sync_locked()
+
+    def _next_flip_locked(self):
+        return self.flip_heap[0][0] + FLIP_MARGIN if self.flip_heap else float("inf")
+
+    def _publish_users_locked(self, now):
+        """dirty 유저와 활성 기한이 지난 유저의 현재 상태를 user_view와 비교해 바뀐 것만 user_log에 기록"""
+        heap = self.flip_heap
+        while heap and heap[0][0] < now:
+            _, nick = heapq.heappop(heap)
+            self.flip_pending.discard(nick)
+            self.dirty_users.add(nick)
+        if not self.dirty_users:
+            return
+        changed = False
+        for nick in self.dirty_users:
+            active = None
+            if nick in self.user_channels:
+                focused = self.focus_state.get(nick, False)
+                last = self.last_seen.get(nick, 0)
+                active = focused or (now - last) <= ACTIVE_THRESHOLD
+                if active and not focused and nick not in self.flip_pending:
+                    # 항목은 유저당 하나. 그 사이 활동이 있었으면 꺼낼 때 다시 확인해 새 기한으로 넣음
+                    self.flip_pending.add(nick)
+                    heapq.heappush(heap, (last + ACTIVE_THRESHOLD, nick))
+            if self.user_view.get(nick) == active:
+                continue
+            if active is None:
+                del self.user_view[nick]
+            else:
+                self.user_view[nick] = active
+            self.user_seq += 1
+            _append_sync_log(self.user_log, (nick, active))
+            changed = True
+        self.dirty_users.clear()
+        if changed:
+            self._wake_sync_locked()  # 시간이 지나 바뀐 경우 다른 /sync 대기자도 받아가도록
+
+    def _channels_delta_locked(self, nick, version):
+        """클라이언트의 채널 목록 버전 이후 변경. 바뀐 것이 없으면 None"""
+        current = self.channels_version
+        if version == current:
+            return None
+        floor = current - len(self.channel_log)
+        if version is None or not floor <= version <= current:
+            return {"version": current, "reset": True,
+                    "added": [ch for ch in self.channel_snapshot[1] if _visible_to(ch, nick)], "removed": []}
+        changes = {}
+        for channel, exists in self.channel_log[version - floor:]:
+            changes[channel] = exists
+        visible = sorted(ch for ch in changes if _visible_to(ch, nick))
+        return {"version": current, "added": [ch for ch in visible if changes[ch]],
+                "removed": [ch for ch in visible if not changes[ch]]}
+
+    def _users_delta_locked(self, version):
+        """클라이언트의 접속자 버전 이후 변경. 바뀐 것이 없으면 None"""
+        current = self.user_seq
+        if version == current:
+            return None
+        floor = current - len(self.user_log)
+        if version is None or not floor <= version <= current:
+            users = [{"nick": u, "active": a} for u, a in sorted(self.user_view.items())]
+            return {"version": current, "reset": True, "users": users, "removed": []}
+        changes = {}
+        for nick, active in self.user_log[version - floor:]:
+            changes[nick] = active
+        return {"version": current,
+                "users": [{"nick": u, "active": a} for u, a in sorted(changes.items()) if a is not None],
+                "removed": sorted(u for u, a in changes.items() if a is None)}
+
+    def _collect_sync_locked(self, nick, epoch, versions, cursors):
+        """({"epoch", "channels", "users"}, 이벤트 결과, 최신 id, 돌려줄 것이 있는지)"""
+        self._expire_inactive_locked()
+        self._publish_users_locked(time.time())
+        if epoch != self.sync_epoch:
+            versions = {}
+        channels = self._channels_delta_locked(nick, versions.get("channels"))
+        users = self._users_delta_locked(versions.get("users"))
+        results, latest, ready = self._collect_many_locked(cursors)
+        state = {"epoch": self.sync_epoch, "channels": channels, "users": users}
+        return state, results, latest, ready or channels is not None or users is not None
+
+    def _unread_locked(self, nick):
+        """
+        ({channel: 안 읽은 수}, 버전 문자열). 버전은 epoch, 이 유저의 읽음/채널 구성 변경 순번,
+        속한 채널의 누적 메시지 수 합으로 만들어 셋 중 하나라도 바뀌면 달라짐
+        """
+        counts = {}
+        total = 0
+        for channel in sorted(self.user_channels.get(nick, ())):
+            count = self.message_counts.get(channel, 0)
+            marks = self.read_marks.get(channel)
+            counts[channel] = count - (marks.get(nick, count) if marks is not None else count)
+            total += count
+        return counts, f"{self.sync_epoch}.{self.unread_versions.get(nick, 0)}.{total}"
+
+    def _finish_unread_locked(self, nick):
+        # 배지를 확인 중인 유저는 접속 중으로 봄 (채널에 없는 nick은 만료 힙에 넣지 않음)
+        if nick in self.user_channels:
+            self._touch_locked(nick)
+
+    def _set_read_mark_locked(self, channel, nick, mark):
+        marks = self.read_marks.setdefault(channel, {})
+        if marks.get(nick) != mark:
+            marks[nick] = mark
+            self._unread_changed_locked(nick)
+
+    def _unread_changed_locked(self, nick):
+        self.read_seq += 1
+        self.unread_versions[nick] = self.read_seq
+        for waiter in self.unread_waiters.get(nick, ()):
+            waiter.wake()
+
+    def _count_wakeup_locked(self, events):
+        self.wakeup_stats["delivered" if events else "empty"] += 1
+
+    def _collect_locked(self, channel, since_id):
+        """(since_id 이후 이벤트, 최신 id, 커서 만료 여부)"""
+        log = self.channel_events.get(channel)
+        if log is None:
+            return [], self.last_event_id, False
+        with self.log_locks[channel]:
+            events, expired = log.since(since_id)
+        return events, self.last_event_id, expired
+
+    def _collect_many_locked(self, cursors):
+        """({channel: (events, expired)}, 최신 id, 돌려줄 것이 있는지)"""
+        results = {}
+        ready = False
+        for channel, since_id in cursors.items():
+            events, _, expired = self._collect_locked(channel, since_id)
+            results[channel] = (events, expired)
+            ready = ready or bool(events) or expired
+        return results, self.last_event_id, ready
+
+    def _finish_wait_locked(self, cursors, nick, latest, read):
+        for channel in cursors:
+            if read is None or channel in read:
+                self._mark_read_locked(channel, nick, latest)
+        if nick:
+            self._touch_locked(nick)
+
+    def _mark_read_locked(self, channel, nick, latest):
+        # 이 호출을 한 유저를 읽음 처리 (채널 멤버가 아니면 읽음 위치는 남기지 않음)
+        if nick:
+            if nick in self.channels.get(channel, ()):
                 self.last_read.setdefault(channel, {})[nick] = latest
-                self.last_seen[nick] = time.time()
-                self.focus_state[nick] = True
+                self._set_read_mark_locked(channel, nick, self.message_counts.get(channel, 0))
+            self._touch_locked(nick)
+            self._set_focus_locked(nick, True)
 
-            self._cleanup_inactive_locked()
-            return events, latest
+        self._expire_inactive_locked()
 
     # [핵심 수정] 내부 함수도 msg_type을 저장하도록 변경
-    def _record_event_locked(self, channel, event_type, nick, text=None, msg_type="text", file_name=None):
-        self.last_event_id += 1
-        event = {
-            "id": self.last_event_id,
-            "type": event_type,
-            "channel": channel,
-            "nick": nick,
-            "timestamp": time.time(),
-            "msg_type": msg_type  # text, image, or file
-        }
-        if text is not None:
-            event["text"] = text
-        if file_name:
-            event["file_name"] = file_name
-        self.channel_events.setdefault(channel, []).append(event)
-        self.cond.notify_all()
+    def _record_event_locked(self, channel, event_type, nick, text=None, msg_type="text", file_name=None,
+                             grams=None):
+        event = Event(self.last_event_id + 1, event_type, channel, nick, int(self._now() * 1000),
+                      msg_type, text, file_name)
+        # 생성 시 한 번만 인코딩해 두고, 응답은 이 바이트를 이어 붙여 만듦
+        event.keep_encoded()
+        self._append_event_locked(event, grams)
+        # 로그에 넣은 뒤에 올림: last_event_id 이하의 이벤트는 항상 채널 로그에서 보임
+        self.last_event_id = event.id
+        if self.journal is not None:
+            self.journal.append(event)
+        if self.on_record is not None:
+            self.on_record(event)
+        if event_type == "message":
+            count = self.message_counts[channel] = self.message_counts.get(channel, 0) + 1
+            # 보낸 사람은 그 채널을 보고 있으므로 읽음 처리 (자기 메시지는 안 읽은 수에 넣지 않음)
+            self._set_read_mark_locked(channel, nick, count)
+        # 이 채널을 기다리는 대기자만 깨움 (전체 notify_all 대신)
+        for waiter in self.waiters.get(channel, ()):
+            waiter.wake()
         return event
 
-    def _cleanup_inactive_locked(self):
-        """채널에서 완전히 떠난/오래 비활성인 유저 정리"""
-        now = time.time()
-        for channel, members in list(self.channels.items()):
-            to_remove = []
-            for m in list(members):
-                last = self.last_seen.get(m, 0)
-                if now - last > STALE_TIMEOUT:
-                    to_remove.append(m)
-            for m in to_remove:
-                members.remove(m)
-                if channel in self.last_read and m in self.last_read[channel]:
-                    del self.last_read[channel][m]
-            if not members:
-                del self.channels[channel]
-                if channel in self.last_read:
-                    del self.last_read[channel]
-
-        # last_seen/last_read 에서 채널에 속하지 않는 유저 정리
-        active_members = {m for ms in self.channels.values() for m in ms}
-        for nick in list(self.last_seen.keys()):
-            if nick not in active_members:
-                del self.last_seen[nick]
-        for channel, readers in list(self.last_read.items()):
-            to_del = [n for n in readers if n not in active_members]
-            for n in to_del:
-                del readers[n]
-            if not readers:
-                del self.last_read[channel]
+    def _append_event_locked(self, event, grams=None):
+        channel = event.channel
+        log = self.channel_events.get(channel)
+        if log is None:
+            # 락 없이 channel_events를 보는 쪽이 채널 락과 색인을 찾을 수 있도록 로그를 마지막에 게시
+            self.log_locks[channel] = threading.Lock()
+            self.text_indexes[channel] = TextIndex()
+            log = self.channel_events[channel] = EventLog(self.max_events, self.max_age, self._event_evicted)
+        with self.log_locks[channel]:
+            log.append(event)
+            self.text_indexes[channel].add(event, grams)
+
+    def _event_evicted(self, event):
+        # EventLog가 채널 락을 쥔 채 호출 (매니저 락은 없을 수 있음)
+        index = self.text_indexes.get(event.channel)
+        if index is not None:
+            # 채널 안에서 id는 증가하므로 버려진 id 다음부터가 보관 범위
+            index.evicted(event, event.id + 1)
+        if self.on_evict is not None:
+            self.on_evict(event)
+
+    def _now(self):
+        """이벤트/활동 시각. 클러스터 복제본은 op에 기록된 시각을 써서 모든 워커가 같은 값을 갖게 함"""
+        return time.time()
+
+    def _touch_locked(self, nick, now=None):
+        """유저 활동 시각 갱신 (O(1)). 힙에 항목이 없는 유저만 새로 등록"""
+        now = now if now is not None else self._now()
+        if nick not in self.expiry_pending:
+            self.expiry_pending.add(nick)
+            heapq.heappush(self.expiry_heap, (now + STALE_TIMEOUT, nick))
+        last = self.last_seen.get(nick)
+        if not self.focus_state.get(nick, False) and (last is None or now - last > ACTIVE_THRESHOLD):
+            self._users_changed_locked(nick)  # 비활성 -> 활성
+        self.last_seen[nick] = now
+
+    def _set_focus_locked(self, nick, active):
+        if self.focus_state.get(nick, False) != active:
+            self.focus_state[nick] = active
+            self._users_changed_locked(nick)
+
+    def _remove_member_locked(self, channel, nick):
+        members = self.channels.get(channel)
+        if members is None or nick not in members:
+            return
+        members.remove(nick)
+        self._users_changed_locked(nick)
+        readers = self.last_read.get(channel)
+        if readers is not None:
+            readers.pop(nick, None)
+        marks = self.read_marks.get(channel)
+        if marks is not None:
+            marks.pop(nick, None)
+        self._unread_changed_locked(nick)
+        channels = self.user_channels.get(nick)
+        if channels is not None:
+            channels.discard(channel)
+            if not channels:
+                del self.user_channels[nick]
+                self.unread_versions.pop(nick, None)
+        if not members:
+            del self.channels[channel]
+            self.last_read.pop(channel, None)
+            self.read_marks.pop(channel, None)
+            self._channels_changed_locked(channel, False)
+
+    def _expiry_due(self, now):
+        """만료 기한이 지난 유저가 있을 수 있는지 (락 없이 힙 맨 앞만 봄)"""
+        try:
+            return self.expiry_heap[0][0] < now
+        except IndexError:
+            return False
+
+    def _expire_if_due(self):
+        # 락 없이 읽는 경로: 정리할 유저가 있을 때만 락을 잡아 만료 처리
+        if self._expiry_due(time.time()):
+            with self.cond:
+                self._expire_inactive_locked()
+
+    def _expire_inactive_locked(self, now=None):
+        """
+        기한이 지난 힙 항목만 꺼내 오래 비활성인 유저를 채널에서 정리합니다.
+        기한 안에 다시 활동한 유저는 실제 기한으로 다시 넣으므로, 할 일이 없으면 힙 맨 앞만 확인하고 끝납니다.
+        """
+        now = now if now is not None else time.time()
+        heap = self.expiry_heap
+        while heap and heap[0][0] < now:
+            _, nick = heapq.heappop(heap)
+            last = self.last_seen.get(nick)
+            if last is None:
+                self.expiry_pending.discard(nick)  # 이미 나간 유저
+                continue
+            if now - last <= STALE_TIMEOUT:
+                heapq.heappush(heap, (last + STALE_TIMEOUT, nick))
+                continue
+            self.expiry_pending.discard(nick)
+            for channel in list(self.user_channels.get(nick, ())):
+                self._remove_member_locked(channel, nick)
+            del self.last_seen[nick]
+
+    async def set_focus_async(self, nick, is_active):
+        """set_focus의 asyncio 버전 (로컬 매니저는 바로 적용되므로 그대로 호출)"""
+        return self.set_focus(nick, is_active)
 
     def set_focus(self, nick, is_active):
         with self.cond:
-            self.last_seen[nick] = time.time()
-            self.focus_state[nick] = bool(is_active)
-            self._cleanup_inactive_locked()
+            self._touch_locked(nick)
+            self._set_focus_locked(nick, bool(is_active))
+            self._expire_inactive_locked()
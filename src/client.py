@@ -1,53 +1,69 @@
 """
 HTTP chat client using raw sockets.
 Team Info: <fill team name / members / roles>
+
+http_request() is a one-shot blocking call (one connection per request).
+AsyncChatClient/ConnectionPool keep connections alive and can pipeline batches:
+
+    client = AsyncChatClient("127.0.0.1", 8080, "bot")
+    await client.join("# 일반")
+    await client.send_many("# 일반", [f"line {i}" for i in range(1000)])  # a few writes, not 1000 sockets
+    async for event in client.events(["# 일반"]):
+        ...
 """
 import argparse
+import asyncio
 import json
 import socket
-import threading
-import time
 import urllib.parse
 
+RECV_SIZE = 65536
+# Requests written per round trip. The server closes a connection after KEEPALIVE_MAX_REQUESTS (100);
+# unanswered requests are re-sent on a new connection.
+MAX_PIPELINE = 64
+
+
+class ClientError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f"{status}: {body.decode('utf-8', errors='ignore')}")
+        self.status = status
+        self.body = body
+
 
-def http_request(host, port, method, path, body_dict=None):
-    body_bytes = b""
+def _encode_request(host, port, method, path, body_dict=None, body_bytes=None, content_type=None,
+                    keep_alive=False):
     headers = {
         "Host": f"{host}:{port}",
-        "Connection": "close",
+        "Connection": "keep-alive" if keep_alive else "close",
     }
     if body_dict is not None:
         body_bytes = json.dumps(body_dict).encode("utf-8")
-        headers["Content-Type"] = "application/json"
-        headers["Content-Length"] = str(len(body_bytes))
-    else:
-        headers["Content-Length"] = "0"
+        content_type = "application/json"
+    body_bytes = body_bytes or b""
+    if content_type:
+        headers["Content-Type"] = content_type
+    headers["Content-Length"] = str(len(body_bytes))
 
+    request_lines = [f"{method} {path} HTTP/1.1"]
+    for k, v in headers.items():
+        request_lines.append(f"{k}: {v}")
+    request_lines.extend(["", ""])
+    return "\r\n".join(request_lines).encode("utf-8") + body_bytes
+
+
+def http_request(host, port, method, path, body_dict=None, body_bytes=None, content_type=None, timeout=None):
+    """One request on a fresh connection. body_dict is sent as JSON; pass body_bytes and content_type for raw bodies (uploads)."""
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
         sock.connect((host, port))
-        request_lines = [f"{method} {path} HTTP/1.1"]
-        for k, v in headers.items():
-            request_lines.append(f"{k}: {v}")
-        request_lines.extend(["", ""])
-        request_head = "\r\n".join(request_lines).encode("utf-8")
-        sock.sendall(request_head + body_bytes)
+        sock.sendall(_encode_request(host, port, method, path, body_dict, body_bytes, content_type))
 
         status, resp_headers, resp_body = _read_http_response(sock)
         return status, resp_headers, resp_body
 
 
-def _read_http_response(sock):
-    buffer = b""
-    while b"\r\n\r\n" not in buffer:
-        chunk = sock.recv(4096)
-        if not chunk:
-            break
-        buffer += chunk
-
-    if b"\r\n\r\n" not in buffer:
-        raise RuntimeError("Malformed HTTP response")
-
-    header_bytes, body = buffer.split(b"\r\n\r\n", 1)
+def _parse_response_head(header_bytes):
+    """-> (status, headers, content_length or None)"""
     header_text = header_bytes.decode("iso-8859-1")
     lines = header_text.split("\r\n")
     status_line = lines[0]
@@ -61,35 +77,264 @@ def _read_http_response(sock):
             continue
         name, value = line.split(":", 1)
         headers[name.strip().lower()] = value.strip()
-    content_length = int(headers.get("content-length", "0") or 0)
-    while len(body) < content_length:
-        more = sock.recv(4096)
+    length = headers.get("content-length")
+    return status, headers, int(length) if length else None
+
+
+def _read_http_response(sock):
+    buffer = bytearray()
+    scan_from = 0
+    while True:
+        idx = buffer.find(b"\r\n\r\n", scan_from)
+        if idx != -1:
+            break
+        scan_from = max(0, len(buffer) - 3)
+        chunk = sock.recv(RECV_SIZE)
+        if not chunk:
+            raise RuntimeError("Malformed HTTP response")
+        buffer += chunk
+
+    status, headers, content_length = _parse_response_head(bytes(buffer[:idx]))
+    del buffer[:idx + 4]
+    content_length = content_length or 0
+    while len(buffer) < content_length:
+        more = sock.recv(min(RECV_SIZE, content_length - len(buffer)))
         if not more:
             break
-        body += more
-    return status, headers, body[:content_length]
+        buffer += more
+    return status, headers, bytes(buffer[:content_length])
 
 
-def poll_events(host, port, channel, since_ref, running_flag):
-    while running_flag["running"]:
-        path = f"/events?channel={urllib.parse.quote(channel)}&since={since_ref['value']}"
+class ResponseParser:
+    """Incremental HTTP/1.1 response parser: feed() bytes as they arrive, get complete responses back."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.head = None  # (status, headers, content_length) of the response being read
+
+    def feed(self, data):
+        self.buffer += data
+        responses = []
+        while True:
+            if self.head is None:
+                idx = self.buffer.find(b"\r\n\r\n")
+                if idx == -1:
+                    break
+                self.head = _parse_response_head(bytes(self.buffer[:idx]))
+                del self.buffer[:idx + 4]
+            status, headers, length = self.head
+            if length is None or len(self.buffer) < length:
+                break  # no Content-Length: body runs until EOF (see finish)
+            responses.append((status, headers, bytes(self.buffer[:length])))
+            del self.buffer[:length]
+            self.head = None
+        return responses
+
+    def finish(self):
+        """Connection closed: returns the close-delimited response in progress, if any."""
+        if self.head is None or self.head[2] is not None:
+            return None
+        status, headers, _ = self.head
+        self.head = None
+        return status, headers, bytes(self.buffer)
+
+
+class AsyncConnection:
+    """One keep-alive connection. Requests are written back to back and responses read in order."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.parser = ResponseParser()
+        self.closed = False
+        self.used = False  # reused idle connections may have been closed by the server meanwhile
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def pipeline(self, requests):
+        """
+        requests: [(method, path, body_dict, body_bytes, content_type)].
+        Returns (responses in order, error). The list is shorter than requests when the connection ended early:
+        - error is None: the server closed it cleanly (keep-alive limit) and did not process the rest
+        - error is the ConnectionError/IncompleteReadError: it was reset, and the rest may or may not have run
+        """
+        self.used = True
+        responses = []
         try:
-            status, _, body = http_request(host, port, "GET", path)
-            if status == 200 and body:
-                data = json.loads(body.decode("utf-8"))
-                events = data.get("events", [])
-                latest = data.get("latest", since_ref["value"])
-                if events:
-                    since_ref["value"] = max(e.get("id", since_ref["value"]) for e in events)
-                    for event in events:
-                        _print_event(event)
+            self.writer.write(b"".join(_encode_request(self.host, self.port, *req, keep_alive=True)
+                                       for req in requests))
+            await self.writer.drain()
+            while len(responses) < len(requests) and not self.closed:
+                data = await self.reader.read(RECV_SIZE)
+                if not data:
+                    self.closed = True
+                    tail = self.parser.finish()
+                    if tail is not None:
+                        responses.append(tail)
+                    break
+                for response in self.parser.feed(data):
+                    responses.append(response)
+                    if response[1].get("connection", "").lower() == "close":
+                        self.closed = True
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            self.closed = True
+            return responses, e
+        return responses, None
+
+    def close(self):
+        self.closed = True
+        if self.writer is not None:
+            self.writer.close()
+
+
+class ConnectionPool:
+    """
+    Up to `size` keep-alive connections to one server. A request borrows a connection for one
+    round trip (a long-poll holds it until the server answers).
+    """
+
+    def __init__(self, host, port, size=8, max_pipeline=MAX_PIPELINE):
+        self.host = host
+        self.port = port
+        self.max_pipeline = max_pipeline
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, body_dict=None, body_bytes=None, content_type=None):
+        """-> (status, headers, body)"""
+        return (await self.pipeline([(method, path, body_dict, body_bytes, content_type)]))[0]
+
+    def _take_idle(self):
+        while self.idle:
+            conn = self.idle.pop()
+            if not conn.reader.at_eof():
+                return conn
+            conn.close()  # the server closed it while idle
+        return None
+
+    async def pipeline(self, requests):
+        """
+        Sends the batch MAX_PIPELINE requests per write and returns every response in order.
+        Requests the server did not answer are re-sent on another connection, except after a reset
+        where non-GET requests may already have run: then ConnectionError is raised instead.
+        """
+        requests = [tuple(req) + (None,) * (5 - len(req)) for req in requests]
+        results = []
+        while len(results) < len(requests):
+            batch = requests[len(results):len(results) + self.max_pipeline]
+            async with self.slots:
+                conn = self._take_idle()
+                if conn is None:
+                    conn = AsyncConnection(self.host, self.port)
+                    await conn.open()
+                reused = conn.used
+                try:
+                    got, error = await conn.pipeline(batch)
+                except BaseException:
+                    conn.close()  # cancelled mid-response: the stream position is unknown
+                    raise
+                if conn.closed:
+                    conn.close()
                 else:
-                    since_ref["value"] = max(since_ref["value"], latest)
-            else:
-                time.sleep(1)
-        except Exception as e:
-            print(f"[poll] error: {e}")
-            time.sleep(2)
+                    self.idle.append(conn)
+            results.extend(got)
+            unanswered = batch[len(got):]
+            if error is not None and any(req[0] != "GET" for req in unanswered):
+                raise ConnectionError(f"Connection reset with {len(unanswered)} unanswered requests "
+                                      f"that may have been processed; not retrying") from error
+            if not got and not reused:
+                raise ConnectionError("Server closed a new connection without responding") from error
+        return results
+
+    def close(self):
+        for conn in self.idle:
+            conn.close()
+        self.idle = []
+
+
+class AsyncChatClient:
+    def __init__(self, host, port, nick, pool_size=8):
+        self.nick = nick
+        self.pool = ConnectionPool(host, port, pool_size)
+
+    async def _call(self, method, path, body_dict=None):
+        status, _, body = await self.pool.request(method, path, body_dict)
+        if status != 200:
+            raise ClientError(status, body)
+        return json.loads(body) if body else None
+
+    async def join(self, channel):
+        """Returns the join event id (use it as the first `since` cursor)."""
+        return (await self._call("POST", "/join", {"nick": self.nick, "channel": channel}))["event_id"]
+
+    async def part(self, channel=None, reason="leaving"):
+        await self._call("POST", "/leave", {"nick": self.nick, "channel": channel, "reason": reason})
+
+    async def send(self, channel, text, msg_type="text"):
+        return (await self._call("POST", "/message", {"nick": self.nick, "channel": channel, "text": text,
+                                                      "msg_type": msg_type}))["event_id"]
+
+    async def send_many(self, channel, texts):
+        """Pipelines one /message per text; returns the event ids in order."""
+        requests = [("POST", "/message", {"nick": self.nick, "channel": channel, "text": text}) for text in texts]
+        ids = []
+        for status, _, body in await self.pool.pipeline(requests):
+            if status != 200:
+                raise ClientError(status, body)
+            ids.append(json.loads(body)["event_id"])
+        return ids
+
+    async def presence(self, active=True):
+        await self._call("POST", "/presence", {"nick": self.nick, "active": active})
+
+    async def poll(self, cursors, read=None):
+        """One multi-channel long-poll (POST /events): {channel: since} -> server response dict."""
+        body = {"nick": self.nick, "cursors": cursors}
+        if read is not None:
+            body["read"] = list(read)
+        return await self._call("POST", "/events", body)
+
+    async def history(self, channel, before=None, limit=50):
+        """One page of scrollback (GET /history): (events oldest-first, has_more)."""
+        params = {"channel": channel, "nick": self.nick, "limit": limit}
+        if before is not None:
+            params["before"] = before
+        data = await self._call("GET", "/history?" + urllib.parse.urlencode(params))
+        return data["events"], data["has_more"]
+
+    async def search(self, query, channel=None, before=None, limit=50):
+        """Full-text search (GET /search): (events newest-first, next `before` or None)."""
+        params = {"q": query, "nick": self.nick, "limit": limit}
+        if channel is not None:
+            params["channel"] = channel
+        if before is not None:
+            params["before"] = before
+        data = await self._call("GET", "/search?" + urllib.parse.urlencode(params))
+        return data["events"], data.get("next")
+
+    async def unread(self, version=None):
+        """Unread counts (GET /unread): ({channel: count}, version); pass version to wait for a change."""
+        params = {"nick": self.nick}
+        if version is not None:
+            params["version"] = version
+        data = await self._call("GET", "/unread?" + urllib.parse.urlencode(params))
+        return data["unread"], data["version"]
+
+    async def events(self, channels, since=0):
+        """Yields events from all channels forever, resuming from each channel's cursor."""
+        cursors = {channel: since for channel in channels}
+        while True:
+            data = await self.poll(cursors)
+            for channel, entry in data["channels"].items():
+                cursors[channel] = entry["cursor"]
+                for event in entry["events"]:
+                    yield event
+
+    async def close(self):
+        self.pool.close()
 
 
 def _print_event(event):
@@ -105,54 +350,68 @@ def _print_event(event):
         print(f"[{channel}] {nick} left")
 
 
-def main():
-    parser = argparse.ArgumentParser(description="HTTP chat client (raw sockets)")
-    parser.add_argument("--host", default="127.0.0.1")
-    parser.add_argument("--port", type=int, default=8080)
-    parser.add_argument("--channel", default="# 일반")
-    parser.add_argument("--nick", default="Guest")
-    args = parser.parse_args()
-
-    # Join channel first
-    status, _, body = http_request(args.host, args.port, "POST", "/join", {"nick": args.nick, "channel": args.channel})
-    if status != 200:
-        print(f"Join failed ({status}): {body.decode('utf-8', errors='ignore')}")
+async def interactive(args):
+    client = AsyncChatClient(args.host, args.port, args.nick)
+    try:
+        since = await client.join(args.channel)
+    except (ClientError, OSError) as e:
+        print(f"Join failed ({e})")
+        await client.close()
         return
     print(f"Joined {args.channel} as {args.nick}")
 
-    running_flag = {"running": True}
-    since_ref = {"value": 0}
-    poll_thread = threading.Thread(target=poll_events, args=(args.host, args.port, args.channel, since_ref, running_flag), daemon=True)
-    poll_thread.start()
+    async def poll_loop():
+        nonlocal since
+        while True:
+            try:
+                async for event in client.events([args.channel], since):
+                    _print_event(event)
+                    since = event["id"]  # resume after the last printed event when reconnecting
+            except (ClientError, OSError, ValueError) as e:
+                print(f"[poll] error: {e}")
+                await asyncio.sleep(2)
 
+    poller = asyncio.ensure_future(poll_loop())
+    loop = asyncio.get_running_loop()
     try:
         while True:
-            msg = input("> ")
+            msg = await loop.run_in_executor(None, input, "> ")
             if msg.strip() in ("/quit", "/exit"):
                 break
             if msg.strip().startswith("/part"):
-                http_request(args.host, args.port, "POST", "/part", {"nick": args.nick, "channel": args.channel})
+                await client.part(args.channel)
                 print(f"Left {args.channel}")
-                break
+                return
             if not msg.strip():
                 continue
-            status, _, resp_body = http_request(
-                args.host,
-                args.port,
-                "POST",
-                "/message",
-                {"nick": args.nick, "channel": args.channel, "text": msg},
-            )
-            if status != 200:
-                print(f"[send error] {status}: {resp_body.decode('utf-8', errors='ignore')}")
-    except KeyboardInterrupt:
+            try:
+                await client.send(args.channel, msg)
+            except (ClientError, OSError) as e:
+                print(f"[send error] {e}")
+    except (EOFError, KeyboardInterrupt):
         pass
     finally:
-        running_flag["running"] = False
-        http_request(args.host, args.port, "POST", "/part", {"nick": args.nick, "channel": args.channel, "reason": "client exit"})
-        time.sleep(0.2)
+        poller.cancel()
+        try:
+            await client.part(args.channel, reason="client exit")
+        except (ClientError, OSError):
+            pass
+        await client.close()
         print("bye")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="HTTP chat client (raw sockets)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--channel", default="# 일반")
+    parser.add_argument("--nick", default="Guest")
+    args = parser.parse_args()
+    try:
+        asyncio.run(interactive(args))
+    except KeyboardInterrupt:
+        pass
+
+
 if __name__ == "__main__":
     main()
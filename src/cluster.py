@@ -0,0 +1,393 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+멀티 프로세스 클러스터 (server.py --workers N)
+
+워커 N개가 SO_REUSEPORT로 같은 포트를 나눠 받고, 각자 ChannelManager 복제본을 가집니다.
+상태를 바꾸는 요청(join/part/leave/message/presence)은 바로 적용하지 않고 부모 프로세스의
+EventBus(Unix 소켓)로 보냅니다. 버스는 받은 순서대로 모든 워커에게 같은 op를 전달하므로
+모든 복제본이 같은 순서로 적용해 이벤트 id/멤버십이 일치합니다. 요청한 워커는 자기 op가
+적용될 때까지 기다렸다가 결과로 응답합니다 (다른 워커의 poller도 같은 이벤트를 받음).
+
+- 이벤트 id는 모든 채널에서 단조 증가해야 since 커서가 동작하므로, 채널별 shard가 id를 따로 매기지 않고
+  버스가 전체 순서를 정합니다. 채널 shard(crc32(채널명) % N)는 그 채널 멤버의 접속 만료를 판단합니다.
+- 읽음/활동/포커스 갱신(poll, ping)은 워커 안에 모았다가 PRESENCE_FLUSH_INTERVAL마다 한 번에 전파합니다.
+- 워커 하나가 죽으면 복제본 일관성을 보장할 수 없으므로 클러스터 전체를 종료합니다.
+"""
+
+import asyncio
+import heapq
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    from src.channel_manager import STALE_TIMEOUT, ChannelManager
+except ImportError:
+    from channel_manager import STALE_TIMEOUT, ChannelManager
+
+# 워커에 모인 활동 갱신/만료 판단을 버스로 보내는 주기(초)
+PRESENCE_FLUSH_INTERVAL = 1.0
+
+_FRAME = struct.Struct("<I")
+
+
+def shard_of(key, workers):
+    """채널/닉네임을 담당하는 워커 번호"""
+    return zlib.crc32(key.encode("utf-8")) % workers
+
+
+def _encode(message):
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return _FRAME.pack(len(data)) + data
+
+
+def _complete_frames(buf):
+    """버퍼 앞쪽의 완성된 프레임들이 끝나는 위치"""
+    pos = 0
+    while pos + _FRAME.size <= len(buf):
+        end = pos + _FRAME.size + _FRAME.unpack_from(buf, pos)[0]
+        if end > len(buf):
+            break
+        pos = end
+    return pos
+
+
+class EventBus:
+    """
+    부모 프로세스에서 도는 순서 결정자. 워커가 보낸 프레임을 받은 순서대로 모든 워커에게 그대로 전달합니다.
+    내용은 해석하지 않으므로 버스 자체의 비용은 프레임 복사뿐입니다.
+    """
+
+    def __init__(self, path, workers):
+        self.path = path
+        self.workers = workers
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(workers)
+        self.conns = []
+
+    def serve(self):
+        # 모든 워커가 붙은 뒤에 전달을 시작해야 어떤 워커도 op를 놓치지 않음
+        while len(self.conns) < self.workers:
+            conn, _ = self.sock.accept()
+            self.conns.append(conn)
+        selector = selectors.DefaultSelector()
+        buffers = {}
+        for conn in self.conns:
+            selector.register(conn, selectors.EVENT_READ)
+            buffers[conn] = bytearray()
+
+        while True:
+            for key, _ in selector.select():
+                conn = key.fileobj
+                data = conn.recv(1024 * 1024)
+                if not data:
+                    print("[CLUSTER] Worker disconnected from bus")
+                    return
+                buf = buffers[conn]
+                buf += data
+                end = _complete_frames(buf)
+                if end:
+                    chunk = bytes(buf[:end])
+                    del buf[:end]
+                    for target in self.conns:
+                        target.sendall(chunk)
+
+    def close(self):
+        for conn in self.conns:
+            conn.close()
+        self.sock.close()
+
+
+class BusLink:
+    """
+    워커 쪽 버스 연결. submit()은 op가 이 워커에 적용될 때까지 기다려 결과를 반환합니다.
+    asyncio 코루틴에서는 루프를 막지 않도록 submit_async()를 await
+    """
+
+    def __init__(self, path, index, apply):
+        self.index = index
+        self.apply = apply  # apply(name, args, ts) -> 결과
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.send_lock = threading.Lock()
+        self.seq = 0
+        self.pending = {}  # seq -> 결과를 받을 콜백 (읽기 스레드에서 호출)
+        self.thread = threading.Thread(target=self._read_loop, name="bus-reader", daemon=True)
+        self.thread.start()
+
+    def submit(self, op):
+        done, slot = threading.Event(), [None]
+
+        def resolve(result):
+            slot[0] = result
+            done.set()
+
+        self._send(op, resolve)
+        done.wait()
+        return slot[0]
+
+    async def submit_async(self, op):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def set_result(result):
+            if not future.done():  # 기다리던 요청이 취소됐으면 버림
+                future.set_result(result)
+
+        self._send(op, lambda result: loop.call_soon_threadsafe(set_result, result))
+        return await future
+
+    def _send(self, op, resolve):
+        with self.send_lock:
+            self.seq += 1
+            self.pending[self.seq] = resolve
+            self.sock.sendall(_encode([self.index, self.seq, time.time()] + op))
+
+    def publish(self, op):
+        """결과를 기다리지 않는 op (활동 갱신, 만료)"""
+        with self.send_lock:
+            self.sock.sendall(_encode([self.index, 0, time.time()] + op))
+
+    def _read_loop(self):
+        buf = bytearray()
+        while True:
+            data = self.sock.recv(1024 * 1024)
+            if not data:
+                print("[CLUSTER] Bus closed, exiting worker")
+                os._exit(1)
+            buf += data
+            end = _complete_frames(buf)
+            pos = 0
+            while pos < end:
+                length = _FRAME.unpack_from(buf, pos)[0]
+                origin, seq, ts, name, *args = json.loads(bytes(buf[pos + _FRAME.size:pos + _FRAME.size + length]))
+                pos += _FRAME.size + length
+                try:
+                    result = self.apply(name, args, ts)
+                except Exception as e:
+                    print(f"[CLUSTER ERROR] {name}: {e}")
+                    result = None
+                if origin == self.index and seq:
+                    self.pending.pop(seq)(result)
+            del buf[:end]
+
+
+class ReplicatedChannelManager(ChannelManager):
+    """
+    클러스터 워커의 ChannelManager 복제본.
+    공개 변경 메서드는 버스를 거쳐 적용되고, 조회/대기(wait_events 등)는 로컬 복제본에서 처리합니다.
+    """
+
+    blocking_writes = True  # 변경 메서드는 버스 왕복을 기다림
+
+    def __init__(self, index, workers, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+        self.workers = workers
+        self.bus = None
+        self.op_time = None  # 버스 op를 적용하는 동안 그 op의 시각
+        self.pending_touches = set()  # 다음 flush 때 전파할 활동 갱신
+        self.pending_reads = {}  # (channel, nick) -> 읽음 위치: 다음 flush 때 전파
+        self.pending_focus = {}  # nick -> 포커스: 요청 경로(poll 읽음 처리)의 변경을 다음 flush 때 전파
+
+    def connect(self, path):
+        self.bus = BusLink(path, self.index, self.apply)
+        threading.Thread(target=self._presence_loop, name="presence", daemon=True).start()
+
+    # ------------------------------------------------------------------ 요청 경로 (버스로 전달)
+    def join_channel(self, channel, nick):
+        return self.bus.submit(["join", channel, nick])
+
+    def part_channel(self, channel, nick, reason="leaving"):
+        return self.bus.submit(["part", channel, nick, reason])
+
+    def leave_all(self, nick, reason="leaving"):
+        return self.bus.submit(["leave", nick, reason])
+
+    def post_message(self, channel, nick, text, msg_type="text", file_name=None):
+        return self.bus.submit(["message", channel, nick, text, msg_type, file_name])
+
+    def set_focus(self, nick, is_active):
+        return self.bus.submit(["focus", nick, bool(is_active)])
+
+    async def set_focus_async(self, nick, is_active):
+        return await self.bus.submit_async(["focus", nick, bool(is_active)])
+
+    # ------------------------------------------------------------------ 버스 op 적용 (모든 워커에서 같은 순서)
+    def apply(self, name, args, ts):
+        with self.cond:
+            self.op_time = ts
+            try:
+                if name == "join":
+                    return ChannelManager.join_channel(self, *args)
+                if name == "part":
+                    return ChannelManager.part_channel(self, *args)
+                if name == "leave":
+                    return ChannelManager.leave_all(self, *args)
+                if name == "message":
+                    return ChannelManager.post_message(self, *args)
+                if name == "focus":
+                    return ChannelManager.set_focus(self, *args)
+                if name == "touch":
+                    # 이미 접속 중인 유저만 갱신 (만료된 유저를 되살리지 않음)
+                    for nick in args[0]:
+                        if ts > self.last_seen.get(nick, ts):
+                            ChannelManager._touch_locked(self, nick, ts)
+                    return None
+                if name == "expire":
+                    self._apply_expire_locked(args[0], args[1], ts)
+                    return None
+                if name == "focused":
+                    # poll이 바꾼 포커스: 접속 중인 유저만 (touch와 같은 flush에서 먼저 적용됨)
+                    for nick, active in args[0]:
+                        if nick in self.last_seen:
+                            ChannelManager._set_focus_locked(self, nick, active)
+                    return None
+                if name == "read":
+                    # 읽음 위치는 앞으로만 (전파 전에 다른 op로 이미 더 앞선 위치가 됐을 수 있음)
+                    for channel, nick, mark in args[0]:
+                        marks = self.read_marks.get(channel, {})
+                        if nick in self.channels.get(channel, ()) and mark > marks.get(nick, -1):
+                            ChannelManager._set_read_mark_locked(self, channel, nick, mark)
+                    return None
+                raise ValueError(f"Unknown op {name}")
+            finally:
+                self.op_time = None
+
+    def _apply_expire_locked(self, channel, nick, ts):
+        last = self.last_seen.get(nick)
+        if last is None or ts - last <= STALE_TIMEOUT:
+            return  # 판단 이후에 다른 워커에서 활동이 전파됨
+        if channel is not None:
+            self._remove_member_locked(channel, nick)
+        if nick not in self.user_channels:
+            del self.last_seen[nick]
+
+    def _now(self):
+        return self.op_time if self.op_time is not None else super()._now()
+
+    def _touch_locked(self, nick, now=None):
+        if self.op_time is None:
+            # 요청 경로의 활동 갱신은 복제본을 바로 바꾸지 않고 모아서 전파
+            self.pending_touches.add(nick)
+            return
+        super()._touch_locked(nick, now)
+
+    def _set_read_mark_locked(self, channel, nick, mark):
+        if self.op_time is None:
+            # 요청 경로의 읽음 처리: 이 워커에는 바로 반영하고 다른 워커에는 모아서 전파.
+            # message_counts는 모든 워커에서 같은 op 순서로 늘어나므로 같은 값이 같은 메시지까지를 뜻함
+            self.pending_reads[(channel, nick)] = mark
+        super()._set_read_mark_locked(channel, nick, mark)
+
+    def _set_focus_locked(self, nick, active):
+        if self.op_time is None:
+            # 요청 경로의 포커스 변경도 활동 갱신처럼 모았다가 op로 전파해 모든 복제본이 같은 순서로 적용
+            if self.focus_state.get(nick, False) != active or nick in self.pending_focus:
+                self.pending_focus[nick] = active
+            return
+        super()._set_focus_locked(nick, active)
+
+    def _expire_inactive_locked(self, now=None):
+        # 복제본끼리 시계가 달라도 결과가 같도록 만료는 expire op로만 적용
+        pass
+
+    def _expiry_due(self, now):
+        # 만료 힙은 _presence_loop가 처리하므로 조회 경로에서 락을 잡을 필요 없음
+        return False
+
+    # ------------------------------------------------------------------ 접속 만료 판단
+    def _presence_loop(self):
+        while True:
+            time.sleep(PRESENCE_FLUSH_INTERVAL)
+            with self.cond:
+                touched, self.pending_touches = self.pending_touches, set()
+                reads, self.pending_reads = self.pending_reads, {}
+                focus, self.pending_focus = self.pending_focus, {}
+                expires = self._owned_expiries_locked(time.time())
+            if touched:
+                self.bus.publish(["touch", sorted(touched)])
+            if reads:
+                self.bus.publish(["read", [[channel, nick, mark] for (channel, nick), mark in sorted(reads.items())]])
+            if focus:
+                self.bus.publish(["focused", sorted(focus.items())])
+            for channel, nick in expires:
+                self.bus.publish(["expire", channel, nick])
+
+    def _owned_expiries_locked(self, now):
+        """
+        만료 힙에서 기한이 지난 유저를 꺼내, 이 워커가 담당하는 채널의 멤버십에 대한 expire op 목록을 만듭니다.
+        채널이 없는 유저는 닉네임의 shard가 담당합니다.
+        """
+        heap = self.expiry_heap
+        expires = []
+        while heap and heap[0][0] < now:
+            _, nick = heapq.heappop(heap)
+            last = self.last_seen.get(nick)
+            if last is None:
+                self.expiry_pending.discard(nick)
+                continue
+            if now - last <= STALE_TIMEOUT:
+                heapq.heappush(heap, (last + STALE_TIMEOUT, nick))
+                continue
+            channels = self.user_channels.get(nick)
+            if channels:
+                expires.extend((ch, nick) for ch in sorted(channels) if shard_of(ch, self.workers) == self.index)
+            elif shard_of(nick, self.workers) == self.index:
+                expires.append((None, nick))
+            # expire op가 적용되면 다음에 꺼낼 때 last_seen이 없어 정리됨
+            heapq.heappush(heap, (now + PRESENCE_FLUSH_INTERVAL, nick))
+        return expires
+
+
+def run_cluster(workers, serve):
+    """
+    버스를 열고 워커 프로세스 N개를 fork 합니다. serve(index, bus_path)는 워커에서 호출되어
+    복제본을 만들고 SO_REUSEPORT 소켓으로 서비스를 시작해야 합니다.
+    """
+    bus_dir = tempfile.mkdtemp(prefix="chat-bus-")
+    bus_path = os.path.join(bus_dir, "bus.sock")
+    bus = EventBus(bus_path, workers)
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=serve, args=(i, bus_path), name=f"worker-{i}", daemon=True) for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    threading.Thread(target=bus.serve, name="event-bus", daemon=True).start()
+    print(f"[CLUSTER] {workers} workers started (bus {bus_path})")
+
+    try:
+        # 워커 하나라도 종료되면 전체 종료
+        multiprocessing.connection.wait([p.sentinel for p in procs])
+        print("[CLUSTER] A worker exited, shutting down")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs:
+            proc.join(5)
+        bus.close()
+        try:
+            os.remove(bus_path)
+            os.rmdir(bus_dir)
+        except OSError:
+            pass
@@ -0,0 +1,258 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+import json
+import sys
+import time
+
+# 채널당 보관할 최대 이벤트 수 / 최대 보관 기간(초, None이면 무제한)
+EVENT_LOG_MAX_EVENTS = 10000
+EVENT_LOG_MAX_AGE = 24 * 3600
+# 링 버퍼 초기 크기 (DM처럼 조용한 채널이 많으므로 필요할 때 두 배씩 키움)
+_INITIAL_SLOTS = 16
+# 채널마다 최근 이벤트 몇 개까지 JSON 인코딩 결과를 들고 있을지 (poller 팬아웃은 대부분 최신 이벤트)
+ENCODED_RECENT_EVENTS = 256
+
+_MISSING = object()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Event:
+    """
+    채널 이벤트 한 건. 이벤트마다 dict(키 테이블 + float 시각)를 두지 않고 슬롯에 값만 보관합니다.
+    channel/nick/type/msg_type 문자열은 intern해서 같은 채널/유저의 이벤트가 한 객체를 공유하고,
+    시각은 정수 밀리초(ts)로 둡니다. 기존 JSON 모양({"id", "type", "channel", "nick", "timestamp"(초),
+    "msg_type", "text"?, "file_name"?})은 직렬화할 때(encoded/to_dict)만 만듭니다.
+    event["id"], event.get("text")처럼 읽기 전용 dict 접근도 그대로 됩니다.
+    (기록이 끝난 이벤트는 수정하지 않는다는 전제)
+    """
+
+    __slots__ = ("id", "type", "channel", "nick", "ts", "msg_type", "text", "file_name", "_encoded")
+
+    def __init__(self, id, type, channel, nick, ts, msg_type="text", text=None, file_name=None):
+        self.id = id
+        self.type = _intern(type)
+        self.channel = _intern(channel)
+        self.nick = _intern(nick)
+        self.ts = ts  # 밀리초
+        self.msg_type = _intern(msg_type)  # text, image, or file
+        self.text = text
+        self.file_name = file_name or None
+        self._encoded = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """저널/스냅샷에 기록된 dict -> Event"""
+        return cls(data["id"], data["type"], data["channel"], data["nick"], round(data["timestamp"] * 1000),
+                   data.get("msg_type", "text"), data.get("text"), data.get("file_name"))
+
+    def to_dict(self):
+        data = {"id": self.id, "type": self.type, "channel": self.channel, "nick": self.nick,
+                "timestamp": self.ts / 1000, "msg_type": self.msg_type}
+        if self.text is not None:
+            data["text"] = self.text
+        if self.file_name:
+            data["file_name"] = self.file_name
+        return data
+
+    def get(self, key, default=None):
+        if key == "timestamp":
+            return self.ts / 1000
+        if key in _EVENT_KEYS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def encoded(self):
+        """UTF-8 JSON 바이트. 최근 이벤트는 보관해 둔 바이트, 오래된 이벤트는 그때 인코딩"""
+        return self._encoded or json.dumps(self.to_dict()).encode("utf-8")
+
+    def keep_encoded(self):
+        """인코딩 결과를 보관 (같은 이벤트를 여러 poller에게 보낼 때 다시 json.dumps 하지 않도록)"""
+        if self._encoded is None:
+            self._encoded = json.dumps(self.to_dict()).encode("utf-8")
+
+
+_EVENT_KEYS = frozenset(("id", "type", "channel", "nick", "msg_type", "text", "file_name"))
+
+
+def encode_events(events):
+    """이벤트 목록 -> JSON 배열 바이트 (미리 인코딩된 조각을 이어 붙임)"""
+    return b"[" + b", ".join(event.encoded() for event in events) + b"]"
+
+
+class EventLog:
+    """
+    채널 하나의 이벤트 링 버퍼.
+    이벤트 id는 단조 증가하므로 "id > N 이후 이벤트"를 이진 탐색으로 찾습니다.
+    개수(max_events)와 기간(max_age) 기준으로 오래된 이벤트를 앞에서부터 버립니다.
+    변경은 호출한 쪽의 락 안에서 하며, try_before()만 락 없이 읽을 수 있습니다.
+    """
+
+    def __init__(self, max_events=EVENT_LOG_MAX_EVENTS, max_age=EVENT_LOG_MAX_AGE, on_evict=None):
+        if max_events < 1:
+            raise ValueError(f"max_events must be at least 1, got {max_events}")
+        self.max_events = max_events
+        self.max_age = max_age
+        self.on_evict = on_evict  # 이벤트를 버릴 때 호출 (업로드 참조 수 감소 등)
+        self.slots = [None] * min(_INITIAL_SLOTS, max_events)
+        self.head = 0  # 가장 오래된 이벤트의 슬롯 위치
+        self.size = 0
+        self.evicted_id = 0  # 마지막으로 버려진 이벤트 id (0이면 버린 적 없음)
+        # 기존 슬롯 위치를 바꾸는 변경(버리기/확장) 동안 홀수. 락 없이 읽은 쪽이 겹쳤는지 확인하는 데 사용
+        self.seq = 0
+
+    def __len__(self):
+        return self.size
+
+    def _at(self, i):
+        return self.slots[(self.head + i) % len(self.slots)]
+
+    def first_id(self):
+        return self._at(0).id if self.size else None
+
+    def last_id(self):
+        return self._at(self.size - 1).id if self.size else None
+
+    def append(self, event):
+        if self.size == len(self.slots):
+            if len(self.slots) < self.max_events:
+                self._grow(min(len(self.slots) * 2, self.max_events))
+            else:
+                self._evict_oldest()
+        self.slots[(self.head + self.size) % len(self.slots)] = event
+        self.size += 1
+        if self.size > ENCODED_RECENT_EVENTS:
+            # 최근 범위를 벗어난 이벤트는 인코딩 바이트를 놓아 줌 (다시 필요하면 encoded()가 새로 만듦)
+            self._at(self.size - 1 - ENCODED_RECENT_EVENTS)._encoded = None
+        self.trim(event.ts / 1000)
+
+    def trim(self, now=None):
+        """max_age보다 오래된 이벤트를 버립니다."""
+        if self.max_age is None:
+            return
+        cutoff = ((now if now is not None else time.time()) - self.max_age) * 1000
+        while self.size and self.slots[self.head].ts < cutoff:
+            self._evict_oldest()
+
+    def since(self, since_id):
+        """
+        id > since_id 인 이벤트 목록과 expired 여부를 반환합니다.
+        expired=True면 since_id 이후 이벤트 중 일부가 이미 버려져 클라이언트가 재동기화해야 함.
+        """
+        self.trim()
+        lo = self._bisect(since_id + 1)
+        events = [self._at(i) for i in range(lo, self.size)]
+        # since=0은 "처음부터"라는 뜻이므로 재동기화 대상이 아님
+        expired = 0 < since_id < self.evicted_id
+        return events, expired
+
+    def before(self, before_id=None, limit=50):
+        """
+        id < before_id 인 이벤트 중 최신 limit개를 오래된 순으로, 그보다 이전 이벤트가 남아 있는지와 함께 반환.
+        before_id가 None이면 가장 최근 이벤트부터 (스크롤백 페이지)
+        """
+        self.trim()
+        hi = self.size if before_id is None else self._bisect(before_id)
+        lo = max(0, hi - limit)
+        return [self._at(i) for i in range(lo, hi)], lo > 0
+
+    def try_before(self, before_id=None, limit=50):
+        """
+        before()를 락 없이 시도합니다. 읽는 동안 버리기/확장이 겹쳤거나 기간이 지난 이벤트를
+        먼저 정리해야 하면 None (호출한 쪽이 락을 잡고 before() 호출).
+        append는 기존 슬롯을 건드리지 않으므로 seq가 그대로면 읽은 값이 일관됨
+        """
+        seq = self.seq
+        if seq & 1:
+            return None
+        slots, head, size = self.slots, self.head, self.size
+        n = len(slots)
+        try:
+            if size and self.max_age is not None and slots[head].ts < (time.time() - self.max_age) * 1000:
+                return None
+            lo, hi = 0, size
+            if before_id is not None:
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if slots[(head + mid) % n].id < before_id:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+            lo = max(0, hi - limit)
+            events = [slots[(head + i) % n] for i in range(lo, hi)]
+        except TypeError:
+            return None  # 읽는 사이 버려진 슬롯(None)
+        if self.seq != seq:
+            return None
+        return events, lo > 0
+
+    def get(self, event_id):
+        """id로 이벤트 찾기 (보관 범위 밖이면 None)"""
+        i = self._bisect(event_id)
+        if i < self.size:
+            event = self._at(i)
+            if event.id == event_id:
+                return event
+        return None
+
+    def iter_back(self, before_id=None):
+        """
+        id < before_id 인 이벤트를 최신순으로.
+        호출한 쪽이 사이사이 락을 놓아도 되도록 앞쪽 이벤트가 버려져 위치가 당겨졌으면 직전 id로 다시 찾음
+        """
+        last = before_id
+        i = self.size if before_id is None else self._bisect(before_id)
+        while True:
+            if last is not None and (i > self.size or (i > 0 and self._at(i - 1).id >= last)):
+                i = self._bisect(last)
+            if i <= 0:
+                return
+            i -= 1
+            event = self._at(i)
+            last = event.id
+            yield event
+
+    def _bisect(self, event_id):
+        """id >= event_id 인 첫 이벤트의 위치 (없으면 size)"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._at(mid).id < event_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _grow(self, new_len):
+        self.seq += 1
+        ordered = [self._at(i) for i in range(self.size)]
+        self.slots = ordered + [None] * (new_len - self.size)
+        self.head = 0
+        self.seq += 1
+
+    def _evict_oldest(self):
+        event = self.slots[self.head]
+        self.evicted_id = event.id
+        if self.on_evict is not None:
+            self.on_evict(event)
+        self.seq += 1
+        self.slots[self.head] = None
+        self.head = (self.head + 1) % len(self.slots)
+        self.size -= 1
+        self.seq += 1
@@ -1,145 +1,902 @@
+import collections
+import email.utils
+import hashlib
 import json
 import urllib.parse
 import mimetypes
 import os
+import queue
+import re
+import socket
+import stat
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    from src.event_log import encode_events
+    from src.search_index import MAX_QUERY_LENGTH, query_terms
+except ImportError:
+    from event_log import encode_events
+    from search_index import MAX_QUERY_LENGTH, query_terms
 
 CRLF = "\r\n"
+# 메모리에 통째로 읽는 요청 바디(JSON 등)의 최대 크기. 업로드는 스트리밍되므로 별도 한도 사용
+MAX_BODY_SIZE = 1024 * 1024
 
-def parse_http_request(sock):
+# Keep-Alive: 요청 사이 유휴 허용 시간(초), 연결당 최대 요청 수
+KEEPALIVE_TIMEOUT = 15
+KEEPALIVE_MAX_REQUESTS = 100
+# 읽기 기한 (slowloris 방어): 요청 첫 바이트 이후 헤더를 다 받기까지의 시간(초)과 헤더 최대 크기,
+# 바디는 BODY_TIMEOUT + 길이 / MIN_BODY_RATE 초 안에 다 와야 함 (넘으면 408/431 후 연결 종료)
+HEADER_TIMEOUT = 10
+MAX_HEADER_SIZE = 16 * 1024
+BODY_TIMEOUT = 10
+MIN_BODY_RATE = 32 * 1024
+RECV_SIZE = 65536
+# sendfile을 못 쓸 때 파일을 나눠 보내는 크기
+FILE_CHUNK_SIZE = 256 * 1024
+# POST /events 한 번에 대기할 수 있는 최대 채널 수
+MAX_POLL_CHANNELS = 1000
+# GET /history, GET /search 한 페이지 기본/최대 이벤트 수
+HISTORY_LIMIT = 50
+HISTORY_MAX_LIMIT = 200
+# SSE: heartbeat 주기(초), 끊겼을 때 브라우저 재연결 간격(ms)
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_RETRY_MS = 2000
+# 업로드 URL은 digest(이전 파일은 타임스탬프)로 유일하므로 내용이 바뀌지 않음 -> 1년 캐시
+UPLOAD_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 응답 압축: 이보다 작은 바디는 압축 이득보다 CPU/지연 비용이 커서 그대로 보냄
+COMPRESS_MIN_SIZE = 1024
+# 요청마다 압축하는 바디는 지연 우선 레벨, 한 번 만들어 계속 쓰는 파일 .gz 사본은 높은 레벨
+# (JSON은 레벨 1에서도 대부분 줄어듦: benchmarks/bench_compression.py)
+COMPRESS_LEVEL = 1
+COMPRESS_FILE_LEVEL = 6
+# 여러 요청이 같은 bytes 객체를 보내는 캐시된 /channels, /users 바디는 압축 결과를 재사용
+# (원본 + 압축 바이트 합계 상한, 넘으면 오래 안 쓴 것부터 버림)
+COMPRESS_CACHE_BYTES = 8 * 1024 * 1024
+# 이보다 큰 파일은 .gz 사본을 만들지 않고 그대로 보냄 (사본은 백그라운드 스레드 하나가 차례로 만듦)
+COMPRESS_MAX_FILE_SIZE = 8 * 1024 * 1024
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+class RequestRejected(Exception):
+    """요청을 다 읽기 전에 거절: 응답을 보낸 뒤 연결을 닫음. kind는 /metrics 사유 라벨"""
+
+    def __init__(self, status, reason, kind):
+        super().__init__(f"{status} {reason}")
+        self.status = status
+        self.reason = reason
+        self.kind = kind
+
+def body_deadline(length):
+    """바디 length 바이트를 받는 데 허용하는 시간(초)"""
+    return BODY_TIMEOUT + length / MIN_BODY_RATE
+
+class HttpConnection:
     """
-    HTTP 요청을 파싱하여 method, path, version, headers, body를 반환합니다.
+    클라이언트 소켓 + 수신 버퍼.
+    Content-Length를 넘어 읽힌 바이트(파이프라이닝된 다음 요청)는 버리지 않고
+    버퍼에 남겨 다음 read_request()에서 이어서 사용합니다.
     """
-    try:
-        buffer = b""
-        # 1. 헤더 읽기 (이중 CRLF가 나올 때까지)
-        while b"\r\n\r\n" not in buffer:
-            chunk = sock.recv(4096)
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+        self.keep_alive = False  # send_response가 Connection 헤더를 정할 때 참조
+        self.accept_encoding = None  # 현재 요청에 쓸 응답 압축 (negotiate_encoding)
+        self.status = None  # 마지막으로 보낸 응답 상태 코드 (/metrics)
+        self.bytes_in = 0  # 연결에서 읽고/쓴 누적 바이트 (/metrics)
+        self.bytes_out = 0
+        self.timeout = None  # 유휴 타임아웃 (settimeout)
+
+    def _recv_until(self, size, deadline, kind):
+        """deadline(time.monotonic)까지 남은 시간만 기다리는 recv. 넘으면 408"""
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                raise socket.timeout()
+            self.sock.settimeout(remaining)
+            return self.sock.recv(size)
+        except socket.timeout:
+            self.keep_alive = False
+            raise RequestRejected(408, "Request Timeout", kind)
+
+    def read_request_head(self):
+        """
+        요청 라인과 헤더까지만 읽어 method, path, version, headers를 반환합니다.
+        바디는 버퍼/소켓에 남겨두므로 read_body() 또는 iter_body()로 이어서 읽습니다.
+        연결 종료/유휴 타임아웃/파싱 실패 시 None 4개를 반환합니다.
+        첫 바이트 이후 HEADER_TIMEOUT 안에 헤더가 끝나지 않거나 MAX_HEADER_SIZE를 넘으면 RequestRejected
+        """
+        deadline = None
+        try:
+            # 헤더 읽기 (이중 CRLF가 나올 때까지)
+            scan_from = 0
+            while True:
+                idx = self.buffer.find(b"\r\n\r\n", scan_from)
+                if idx != -1:
+                    break
+                if len(self.buffer) > MAX_HEADER_SIZE:
+                    self.keep_alive = False
+                    raise RequestRejected(431, "Request Header Fields Too Large", "header_too_large")
+                scan_from = max(0, len(self.buffer) - 3)
+                if self.buffer and deadline is None:
+                    deadline = time.monotonic() + HEADER_TIMEOUT
+                if deadline is None:
+                    chunk = self.sock.recv(RECV_SIZE)  # 다음 요청을 기다리는 유휴 시간 (self.timeout)
+                else:
+                    chunk = self._recv_until(RECV_SIZE, deadline, "header_timeout")
+                if not chunk:
+                    return None, None, None, None
+                self.bytes_in += len(chunk)
+                self.buffer += chunk
+            if deadline is not None:
+                # 헤더 기한의 남은 시간이 소켓에 남지 않도록 유휴 타임아웃으로 되돌림
+                self.sock.settimeout(self.timeout)
+            if idx > MAX_HEADER_SIZE:
+                self.keep_alive = False
+                raise RequestRejected(431, "Request Header Fields Too Large", "header_too_large")
+
+            header_bytes = bytes(self.buffer[:idx])
+            del self.buffer[:idx + 4]
+            return parse_request_head(header_bytes)
+
+        except socket.timeout:
+            return None, None, None, None
+        except RequestRejected:
+            raise
+        except Exception as e:
+            print(f"[Parser Error] {e}")
+            return None, None, None, None
+
+    def iter_body(self, length):
+        """바디를 length 바이트만큼 청크 단위로 yield (메모리에 모으지 않음)"""
+        remaining = length
+        if self.buffer and remaining > 0:
+            chunk = bytes(self.buffer[:remaining])
+            del self.buffer[:len(chunk)]
+            remaining -= len(chunk)
+            yield chunk
+        deadline = time.monotonic() + body_deadline(length)
+        while remaining > 0:
+            chunk = self._recv_until(min(RECV_SIZE, remaining), deadline, "body_timeout")
             if not chunk:
-                return None, None, None, None, None
-            buffer += chunk
+                # 바디가 덜 왔으므로 이 연결은 더 이상 재사용할 수 없음
+                self.keep_alive = False
+                raise ConnectionError("Connection closed while reading body")
+            self.bytes_in += len(chunk)
+            remaining -= len(chunk)
+            yield chunk
+        self.sock.settimeout(self.timeout)
 
-        header_bytes, body_start = buffer.split(b"\r\n\r\n", 1)
-        header_text = header_bytes.decode("iso-8859-1")
-        lines = header_text.split(CRLF)
+    def read_body(self, length):
+        # 남는 바이트는 다음 요청의 시작이므로 버퍼에 보관 (Pipelining)
+        if len(self.buffer) < length:
+            deadline = time.monotonic() + body_deadline(length)
+            while len(self.buffer) < length:
+                more = self._recv_until(RECV_SIZE, deadline, "body_timeout")
+                if not more:
+                    self.keep_alive = False
+                    raise ConnectionError("Connection closed while reading body")
+                self.bytes_in += len(more)
+                self.buffer += more
+        # 바디가 이미 버퍼에 있었거나 없는 요청도 다음 요청은 유휴 타임아웃으로 기다림
+        self.sock.settimeout(self.timeout)
+        body = bytes(self.buffer[:length])
+        del self.buffer[:length]
+        return body
 
-        if not lines:
+    def read_request(self):
+        """
+        HTTP 요청 하나를 파싱하여 method, path, version, headers, body를 반환합니다.
+        연결 종료/유휴 타임아웃/파싱 실패 시 None 5개를 반환합니다.
+        """
+        method, path, version, headers = self.read_request_head()
+        if method is None:
+            return None, None, None, None, None
+        try:
+            length = content_length(headers)
+            if length > MAX_BODY_SIZE:
+                raise ValueError(f"Payload too large: {length} bytes")
+            return method, path, version, headers, self.read_body(length)
+        except Exception as e:
+            print(f"[Parser Error] {e}")
             return None, None, None, None, None
 
-        method, path, version = lines[0].split()[:3]
-        headers = {}
-        for line in lines[1:]:
-            if ":" in line:
-                key, val = line.split(":", 1)
-                headers[key.strip().lower()] = val.strip()
-
-        # 2. 바디 읽기 (Content-Length 만큼 정확히 읽기)
-        content_length = int(headers.get("content-length", 0))
-        # [안정성 수정] 10MB 이상의 요청은 거부 (서버 메모리 보호)
-        if content_length > 10 * 1024 * 1024:
-            raise ValueError(f"Payload too large: {content_length} bytes")
-        body = body_start
-        while len(body) < content_length:
-            more = sock.recv(4096)
-            if not more:
-                break
-            body += more
-
-        # 바디가 더 많이 읽혔을 경우 잘라내기 (Pipelining 대비)
-        return method, path, version, headers, body[:content_length]
-
-    except Exception as e:
-        print(f"[Parser Error] {e}")
-        return None, None, None, None, None
-
-def parse_multipart_data(body_bytes, boundary):
-    """
-    바이너리 안전한 멀티파트 파서
-    """
-    parts = {}
-    # 바디 내의 구분자는 '--' + boundary 형태임
-    boundary_bytes = b"--" + boundary.encode('utf-8')
-
-    # boundary로 데이터 분리
-    chunks = body_bytes.split(boundary_bytes)
-
-    for chunk in chunks:
-        # 빈 청크나 끝부분(--) 스킵
-        if not chunk or chunk == b"--\r\n" or chunk == b"--":
-            continue
+    def recv(self):
+        """프로토콜 전환(WebSocket) 후 원시 바이트 읽기. 버퍼에 남은 바이트를 먼저 반환합니다."""
+        if self.buffer:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            return data
+        data = self.sock.recv(RECV_SIZE)
+        self.bytes_in += len(data)
+        return data
 
-        # 청크 구조: \r\n헤더\r\n\r\n내용\r\n
-        # 1. 헤더와 바디 구분자(\r\n\r\n) 찾기
-        sep_idx = chunk.find(b"\r\n\r\n")
-        if sep_idx == -1: continue
+    def sendall(self, data):
+        self.sock.sendall(data)
+        self.bytes_out += len(data)
 
-        header_part = chunk[:sep_idx]
-        body_part = chunk[sep_idx+4:] # \r\n\r\n 뒤가 진짜 데이터
+    def sendfile(self, f, offset, count):
+        self.sock.sendfile(f, offset, count)
+        self.bytes_out += count
 
-        # 2. 멀티파트 프로토콜 상 데이터 뒤에 붙는 \r\n 제거
-        # (주의: 이미지 데이터 자체가 \r\n으로 끝날 수도 있으므로 무조건 제거가 아니라 프로토콜 패딩만 제거해야 함)
-        if body_part.endswith(b"\r\n"):
-            body_part = body_part[:-2]
+    def settimeout(self, timeout):
+        self.timeout = timeout
+        self.sock.settimeout(timeout)
 
-        # 3. 헤더에서 파일명 추출
-        try:
-            header_text = header_part.decode('utf-8', errors='ignore')
-            if 'filename="' in header_text:
-                # filename="이미지.png" 파싱
-                p1 = header_text.find('filename="') + 10
-                p2 = header_text.find('"', p1)
-                if p1 > 9 and p2 > p1:
-                    filename = header_text[p1:p2]
-                    parts['file'] = (filename, body_part)
-        except:
+    def close(self):
+        self.sock.close()
+
+def parse_http_request(sock):
+    """
+    HTTP 요청을 파싱하여 method, path, version, headers, body를 반환합니다.
+    (단발성 연결용. 연결을 재사용하려면 HttpConnection.read_request를 사용)
+    """
+    return HttpConnection(sock).read_request()
+
+def content_length(headers):
+    length = int(headers.get("content-length", 0) or 0)
+    if length < 0:
+        raise ValueError(f"Invalid Content-Length: {length}")
+    return length
+
+def wants_keep_alive(version, headers):
+    """HTTP/1.1은 기본 keep-alive, HTTP/1.0은 명시적으로 요청한 경우만"""
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return "keep-alive" in connection
+    return "close" not in connection
+
+def parse_request_head(header_bytes):
+    """
+    요청 라인 + 헤더 블록(이중 CRLF 제외)을 method, path, version, headers로 파싱합니다.
+    """
+    lines = header_bytes.decode("iso-8859-1").split(CRLF)
+    if not lines or not lines[0]:
+        return None, None, None, None
+
+    method, path, version = lines[0].split()[:3]
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, val = line.split(":", 1)
+            headers[key.strip().lower()] = val.strip()
+    return method, path, version, headers
+
+class MultipartParser:
+    """
+    스트리밍 multipart/form-data 파서.
+    feed()로 들어오는 청크에서 boundary를 롤링 윈도로 찾고, 파일 파트는 upload_dir의
+    임시 파일에 바로 기록합니다. 버퍼에는 청크 하나 + boundary 길이만큼만 남으므로
+    업로드 크기와 상관없이 메모리 사용량이 일정합니다. 파일 내용은 기록하면서 SHA-256을 함께 계산합니다.
+    완료 후 self.files = [(원본 파일명, 임시 파일 경로, 크기, sha256 hex)], self.fields = {이름: 값}
+    """
+
+    MAX_PART_HEADER = 16 * 1024
+    MAX_FIELD_SIZE = 64 * 1024
+
+    def __init__(self, boundary, upload_dir):
+        # 바디 내의 구분자는 CRLF + '--' + boundary 형태임 (첫 구분자 앞 CRLF는 버퍼에 미리 넣어 둠)
+        self.delimiter = b"\r\n--" + boundary.encode("utf-8")
+        self.upload_dir = upload_dir
+        self.buffer = bytearray(b"\r\n")
+        self.state = "preamble"
+        self.files = []
+        self.fields = {}
+        self.part = None  # 현재 파트: {"name", "filename", "file" | "data", "path", "size", "hash"}
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        while self._step():
             pass
 
-    return parts
+    def close(self):
+        """바디를 다 받은 뒤 호출. 종료 boundary가 없으면 ValueError"""
+        if self.state != "done":
+            self.abort()
+            raise ValueError("Incomplete multipart body")
+
+    def abort(self):
+        """실패 시 임시 파일 정리"""
+        if self.part and self.part.get("file"):
+            self.part["file"].close()
+            self.files.append((self.part["filename"], self.part["path"], self.part["size"], None))
+        self.part = None
+        for _, path, _, _ in self.files:
+            try: os.remove(path)
+            except OSError: pass
+        self.files = []
+
+    def _step(self):
+        """버퍼로 진행할 수 있으면 한 단계 처리하고 True, 데이터가 더 필요하면 False"""
+        if self.state == "preamble":
+            idx = self.buffer.find(self.delimiter)
+            if idx == -1:
+                del self.buffer[:max(0, len(self.buffer) - len(self.delimiter) + 1)]
+                return False
+            del self.buffer[:idx + len(self.delimiter)]
+            self.state = "boundary"
+            return True
+
+        if self.state == "boundary":
+            if len(self.buffer) < 2:
+                return False
+            marker = bytes(self.buffer[:2])
+            del self.buffer[:2]
+            if marker == b"--":
+                self.state = "done"
+            elif marker == CRLF.encode():
+                self.state = "headers"
+            else:
+                raise ValueError("Malformed multipart boundary")
+            return True
+
+        if self.state == "headers":
+            idx = self.buffer.find(b"\r\n\r\n")
+            if idx == -1:
+                if len(self.buffer) > self.MAX_PART_HEADER:
+                    raise ValueError("Multipart part header too large")
+                return False
+            header_text = bytes(self.buffer[:idx]).decode("utf-8", errors="ignore")
+            del self.buffer[:idx + 4]
+            self._open_part(header_text)
+            self.state = "body"
+            return True
+
+        if self.state == "body":
+            idx = self.buffer.find(self.delimiter)
+            if idx == -1:
+                # boundary가 청크 경계에 걸쳐 있을 수 있으므로 끝부분은 남겨 둠
+                keep = len(self.delimiter) - 1
+                if len(self.buffer) > keep:
+                    self._write_part(self.buffer[:len(self.buffer) - keep])
+                    del self.buffer[:len(self.buffer) - keep]
+                return False
+            self._write_part(self.buffer[:idx])
+            del self.buffer[:idx + len(self.delimiter)]
+            self._close_part()
+            self.state = "boundary"
+            return True
+
+        # done: 종료 boundary 뒤 epilogue는 무시
+        self.buffer.clear()
+        return False
+
+    def _open_part(self, header_text):
+        name = _disposition_param(header_text, "name")
+        filename = _disposition_param(header_text, "filename")
+        self.part = {"name": name, "filename": filename, "size": 0}
+        if filename is not None:
+            fd, path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=self.upload_dir)
+            self.part["file"] = os.fdopen(fd, "wb")
+            self.part["path"] = path
+            self.part["hash"] = hashlib.sha256()
+        else:
+            self.part["data"] = bytearray()
+
+    def _write_part(self, data):
+        if not data:
+            return
+        self.part["size"] += len(data)
+        if "file" in self.part:
+            self.part["file"].write(data)
+            self.part["hash"].update(data)
+        else:
+            if self.part["size"] > self.MAX_FIELD_SIZE:
+                raise ValueError("Multipart field too large")
+            self.part["data"] += data
+
+    def _close_part(self):
+        part, self.part = self.part, None
+        if "file" in part:
+            part["file"].close()
+            self.files.append((part["filename"], part["path"], part["size"], part["hash"].hexdigest()))
+        elif part["name"]:
+            self.fields[part["name"]] = bytes(part["data"]).decode("utf-8", errors="replace")
+
+def _disposition_param(header_text, key):
+    """Content-Disposition 헤더에서 name="..." / filename="..." 값을 추출"""
+    for line in header_text.split(CRLF):
+        if line.lower().startswith("content-disposition:"):
+            m = re.search(r'[;\s]' + key + r'="([^"]*)"', line, re.IGNORECASE)
+            return m.group(1) if m else None
+    return None
 
 def parse_query(path):
     parsed = urllib.parse.urlparse(path)
     query = {k: v[0] for k, v in urllib.parse.parse_qs(parsed.query).items() if v}
     return parsed.path, query
 
-def send_response(sock, status, reason, body, content_type="text/plain", headers=None):
-    if headers is None: headers = {}
-
-    # body가 str이면 인코딩, bytes면 그대로 둠 (이미지 전송 시 중요)
-    if isinstance(body, str):
-        body = body.encode("utf-8")
-
+def response_head(sock, status, reason, content_type, content_length, headers=None):
+    """상태 줄 + 헤더 블록 바이트 (바디를 따로 보내는 send_file/SSE 등에서 사용)"""
     headers_out = {
         "Content-Type": content_type,
-        "Content-Length": str(len(body)),
+        "Content-Length": str(content_length),
         "Access-Control-Allow-Origin": "*",
         "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
         "Access-Control-Allow-Headers": "*",
-        "Connection": "close",
-        **headers
+        **_connection_headers(sock),
+        **(headers or {})
     }
+    sock.status = status
+    if content_length is None:
+        # 길이를 모르는 스트리밍 응답: 연결 종료로 끝을 알림
+        del headers_out["Content-Length"]
 
     header_str = f"HTTP/1.1 {status} {reason}\r\n" + \
                  "".join([f"{k}: {v}\r\n" for k, v in headers_out.items()]) + "\r\n"
+    return header_str.encode("utf-8")
+
+def send_response(sock, status, reason, body, content_type="text/plain", headers=None, shared=False):
+    # body가 str이면 인코딩, bytes면 그대로 둠 (이미지 전송 시 중요)
+    # shared: 다른 요청도 같은 bytes 객체를 보내는 캐시된 바디 -> 압축 결과를 캐시
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    encoding = getattr(sock, "accept_encoding", None)
+    if encoding and len(body) >= COMPRESS_MIN_SIZE and is_compressible(content_type):
+        body = compress_body(body if isinstance(body, bytes) else bytes(body), encoding, shared=shared)
+        headers = dict(headers or {}, **{"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
 
     # 헤더와 바디(바이너리 포함) 합쳐서 전송
     try:
-        sock.sendall(header_str.encode("utf-8") + body)
+        sock.sendall(response_head(sock, status, reason, content_type, len(body), headers) + body)
     except:
         pass
 
+def negotiate_encoding(headers):
+    """Accept-Encoding에서 gzip/deflate 중 응답에 쓸 인코딩 (q=0은 거부, 같은 q면 gzip 우선). 없으면 None"""
+    value = headers.get("accept-encoding")
+    if not value:
+        return None
+    best, best_q = None, 0.0
+    for item in value.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if name == "*":
+            name = "gzip"
+        if name not in ("gzip", "deflate"):
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > best_q or (q == best_q and name == "gzip"):
+            best, best_q = name, q
+    return best
+
+def is_compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+_compress_cache = collections.OrderedDict()  # (encoding, id(body)) -> (body, 압축된 바디) (LRU)
+_compress_cache_bytes = 0
+_compress_lock = threading.Lock()
+
+def compress_body(body, encoding, level=COMPRESS_LEVEL, shared=False):
+    """
+    gzip 또는 deflate(zlib 형식)로 압축.
+    shared=True면 같은 bytes 객체는 캐시에서 꺼내므로 한 번만 압축됩니다.
+    키는 객체 id라 조회에 바디를 해시하지 않고, 원본을 함께 들고 있으므로 id가 재사용되지 않음
+    """
+    if shared:
+        key = (encoding, id(body))
+        with _compress_lock:
+            entry = _compress_cache.get(key)
+            if entry is not None and entry[0] is body:
+                _compress_cache.move_to_end(key)
+                return entry[1]
+    c = zlib.compressobj(level, zlib.DEFLATED, 31 if encoding == "gzip" else 15)
+    data = c.compress(body) + c.flush()
+    if shared and len(body) + len(data) <= COMPRESS_CACHE_BYTES:
+        _compress_cache_put(key, body, data)
+    return data
+
+def _compress_cache_put(key, body, data):
+    global _compress_cache_bytes
+    with _compress_lock:
+        old = _compress_cache.pop(key, None)
+        if old is not None:
+            _compress_cache_bytes -= len(old[0]) + len(old[1])
+        _compress_cache[key] = (body, data)
+        _compress_cache_bytes += len(body) + len(data)
+        while _compress_cache_bytes > COMPRESS_CACHE_BYTES:
+            _, (old_body, old_data) = _compress_cache.popitem(last=False)
+            _compress_cache_bytes -= len(old_body) + len(old_data)
+
+def _gzip_sidecar(filepath, st):
+    """이미 만들어 둔 원본보다 새로운 gzip 사본(filepath + ".gz")의 (경로, 크기). 없으면 None"""
+    gz_path = filepath + ".gz"
+    try:
+        gz_st = os.stat(gz_path)
+    except OSError:
+        return None
+    return (gz_path, gz_st.st_size) if gz_st.st_mtime_ns >= st.st_mtime_ns else None
+
+_sidecar_queue = queue.Queue()
+_sidecar_pending = set()  # 큐에 있거나 만드는 중인 파일 경로
+_sidecar_lock = threading.Lock()
+_sidecar_thread = None
+
+def schedule_gzip_sidecar(filepath, size, mime):
+    """
+    텍스트류 파일의 gzip 사본을 백그라운드 스레드에서 만들도록 예약 (업로드 저장 직후, 사본 없는 파일 요청 시).
+    압축은 요청 처리 밖에서 하므로 사본이 생기기 전까지 send_file은 원본을 보냅니다.
+    """
+    global _sidecar_thread
+    if not is_compressible(mime) or not COMPRESS_MIN_SIZE <= size <= COMPRESS_MAX_FILE_SIZE:
+        return
+    with _sidecar_lock:
+        if filepath in _sidecar_pending:
+            return
+        _sidecar_pending.add(filepath)
+        if _sidecar_thread is None:
+            _sidecar_thread = threading.Thread(target=_sidecar_loop, name="gzip-sidecar", daemon=True)
+            _sidecar_thread.start()
+    _sidecar_queue.put(filepath)
+
+def _sidecar_loop():
+    while True:
+        filepath = _sidecar_queue.get()
+        try:
+            _build_gzip_sidecar(filepath)
+        finally:
+            with _sidecar_lock:
+                _sidecar_pending.discard(filepath)
+
+def _build_gzip_sidecar(filepath):
+    """filepath + ".gz"를 임시 파일에 만든 뒤 원자적으로 교체. 이미 최신 사본이 있거나 실패하면 그냥 둠"""
+    try:
+        if _gzip_sidecar(filepath, os.stat(filepath)) is not None:
+            return
+        fd, tmp_path = tempfile.mkstemp(prefix=".gzip-", suffix=".part", dir=os.path.dirname(filepath))
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as out, open(filepath, "rb") as f:
+            c = zlib.compressobj(COMPRESS_FILE_LEVEL, zlib.DEFLATED, 31)
+            for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b""):
+                out.write(c.compress(chunk))
+            out.write(c.flush())
+        os.replace(tmp_path, filepath + ".gz")
+    except OSError as e:
+        print(f"[GZIP ERROR] {filepath}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def _connection_headers(sock):
+    if getattr(sock, "keep_alive", False):
+        return {"Connection": "keep-alive", "Keep-Alive": f"timeout={KEEPALIVE_TIMEOUT}"}
+    return {"Connection": "close"}
+
 def send_json(sock, status, payload):
     send_response(sock, status, "OK", json.dumps(payload), content_type="application/json")
 
-def send_file(sock, filepath):
-    if os.path.exists(filepath):
-        mime, _ = mimetypes.guess_type(filepath)
-        mime = mime or "application/octet-stream"
-        headers = {}
-        if not mime.startswith("image/"):
-            headers["Content-Disposition"] = f'attachment; filename="{os.path.basename(filepath)}"'
+def send_json_bytes(sock, status, body, shared=False):
+    """이미 인코딩해 둔 JSON 바디(캐시된 응답 등)를 그대로 전송. 여러 요청이 같이 쓰는 캐시 바디면 shared=True"""
+    send_response(sock, status, "OK", body, content_type="application/json", shared=shared)
+
+def events_json(events, latest, expired):
+    """GET /events 응답 바디 {"events", "latest", "resync"?}. 이벤트는 미리 인코딩된 바이트를 이어 붙임"""
+    body = b'{"events": ' + encode_events(events) + b', "latest": %d' % latest
+    if expired:
+        body += b', "resync": true'  # 커서가 보관 범위 밖: 이력 재로딩 필요
+    return body + b"}"
+
+def sse_head(sock):
+    """Server-Sent Events 응답 헤더 + 재연결 간격 안내"""
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return response_head(sock, 200, "OK", "text/event-stream; charset=utf-8", None, headers) + \
+        f"retry: {SSE_RETRY_MS}\n\n".encode("ascii")
+
+def sse_frame(data, event_id=None, event=None):
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+def sse_event_frames(events, latest, expired):
+    """
+    wait_events 결과를 SSE 프레임으로 변환. 이벤트가 없으면 heartbeat 주석을 보내
+    프록시가 연결을 끊지 않게 하고 끊긴 클라이언트를 감지합니다.
+    """
+    out = []
+    if expired:
+        out.append(sse_frame(json.dumps({"latest": latest}), event="resync"))
+    for event in events:
+        # 인코딩된 JSON에는 개행이 없으므로 data 줄 하나로 충분
+        out.append(b"id: %d\ndata: %s\n\n" % (event["id"], event.encoded()))
+    return b"".join(out) or b": ping\n\n"
+
+def sse_cursor(query, headers):
+    """재연결 시 브라우저가 보내는 Last-Event-ID가 since 파라미터보다 우선"""
+    value = headers.get("last-event-id") or query.get("since") or 0
+    return int(value)
+
+def _string_field(data, name, required):
+    value = data.get(name)
+    if value is None and not required:
+        return
+    if not isinstance(value, str) or (required and not value):
+        raise ValueError(f"{name} must be a non-empty string" if required else f"{name} must be a string")
 
-        with open(filepath, "rb") as f:
-            data = f.read()
+def parse_json_object(body, required=(), optional=()):
+    """
+    POST /join, /leave, /message, /presence 바디(JSON 객체) -> dict.
+    required 필드는 비어 있지 않은 문자열, optional 필드는 없거나 문자열이어야 함. 아니면 ValueError
+    """
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise ValueError("Invalid JSON")
+    if not isinstance(data, dict):
+        raise ValueError("Body must be a JSON object")
+    for name in required:
+        _string_field(data, name, True)
+    for name in optional:
+        _string_field(data, name, False)
+    return data
+
+def parse_cursors(body):
+    """
+    POST /events 바디 {"nick", "cursors": {channel: since}, "read": [channel]}를
+    (cursors, nick, read)로 변환. 형식이 잘못되면 ValueError
+    """
+    try:
+        data = json.loads(body or b"{}")
+        cursors = {str(ch): int(since) for ch, since in data["cursors"].items()}
+        read = data.get("read")
+        read = set(read) if read is not None else None
+    except (KeyError, TypeError, AttributeError, ValueError):
+        raise ValueError("cursors must be an object of channel -> since")
+    if not cursors or len(cursors) > MAX_POLL_CHANNELS:
+        raise ValueError(f"cursors must contain 1..{MAX_POLL_CHANNELS} channels")
+    _string_field(data, "nick", False)
+    return cursors, data.get("nick"), read
+
+def grouped_events_json(results, latest, cursors):
+    """
+    wait_channels 결과 -> {"channels": {channel: {"events", "cursor", "resync"?}}, "latest"} 바이트.
+    변화가 있는 채널만 포함하며, resync는 커서가 보관 범위 밖이라 그 채널 이력을 다시 받아야 한다는 뜻
+    """
+    parts = []
+    for channel, (events, expired) in results.items():
+        if not events and not expired:
+            continue
+        cursor = events[-1]["id"] if events else max(cursors[channel], latest)
+        entry = b'{"events": ' + encode_events(events) + b', "cursor": %d' % cursor
+        if expired:
+            entry += b', "resync": true'
+        parts.append(json.dumps(channel).encode("utf-8") + b": " + entry + b"}")
+    return b'{"channels": {' + b", ".join(parts) + b'}, "latest": %d}' % latest
+
+def parse_sync(body):
+    """
+    POST /sync 바디 {"nick", "epoch", "versions": {"channels", "users"}, "cursors"?, "read"?, "active"?}를
+    (nick, epoch, versions, cursors, read, active)로 변환. 형식이 잘못되면 ValueError
+    """
+    try:
+        data = json.loads(body or b"{}")
+        versions = {key: int(value) for key, value in (data.get("versions") or {}).items()
+                    if key in ("channels", "users") and value is not None}
+        cursors = {str(ch): int(since) for ch, since in (data.get("cursors") or {}).items()}
+        read = data.get("read")
+        read = set(read) if read is not None else None
+        active = data.get("active")
+        active = bool(active) if active is not None else None
+    except (TypeError, AttributeError, ValueError):
+        raise ValueError("versions must be numbers and cursors an object of channel -> since")
+    if len(cursors) > MAX_POLL_CHANNELS:
+        raise ValueError(f"cursors must contain at most {MAX_POLL_CHANNELS} channels")
+    _string_field(data, "nick", False)
+    return data.get("nick"), data.get("epoch"), versions, cursors, read, active
 
-        send_response(sock, 200, "OK", data, content_type=mime, headers=headers)
-    else:
+def sync_json(state, results, latest, cursors):
+    """
+    ChannelManager.sync 결과 -> {"epoch", "channels"?, "users"?, "events": {"channels", "latest"}} 바이트.
+    channels/users는 클라이언트 버전 이후 바뀐 것이 있을 때만 포함 (reset이면 전체 목록)
+    """
+    head = json.dumps({key: value for key, value in state.items() if value is not None}).encode("utf-8")
+    return head[:-1] + b', "events": ' + grouped_events_json(results, latest, cursors) + b"}"
+
+def _page_params(query):
+    """?before=&limit= -> (before_id or None, limit). 형식이 잘못되면 ValueError"""
+    try:
+        before = int(query["before"]) if query.get("before") else None
+        limit = int(query.get("limit") or HISTORY_LIMIT)
+    except ValueError:
+        raise ValueError("before and limit must be integers")
+    return before, max(1, min(limit, HISTORY_MAX_LIMIT))
+
+def parse_history(query):
+    """GET /history?channel=&nick=&before=&limit= -> (channel, nick, before_id, limit). DM 채널은 참가자 nick 필요"""
+    channel = query.get("channel")
+    if not channel:
+        raise ValueError("channel required")
+    return (channel, query.get("nick")) + _page_params(query)
+
+def parse_search(query):
+    """GET /search?q=&channel=&nick=&before=&limit= -> (terms, channel, nick, before_id, limit)"""
+    text = query.get("q") or ""
+    if len(text) > MAX_QUERY_LENGTH:
+        raise ValueError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+    terms = query_terms(text)
+    if not terms:
+        raise ValueError("q required")
+    return (terms, query.get("channel") or None, query.get("nick")) + _page_params(query)
+
+def history_json(events, has_more):
+    """{"events": 오래된 순, "has_more"} 바이트. 다음 페이지는 before=events[0].id"""
+    return b'{"events": ' + encode_events(events) + (b', "has_more": true}' if has_more else b', "has_more": false}')
+
+def search_json(events, limit):
+    """{"events": 최신순, "next"?} 바이트. next가 있으면 before=next로 이어서 검색"""
+    body = b'{"events": ' + encode_events(events)
+    if len(events) >= limit:
+        body += b', "next": %d' % events[-1]["id"]
+    return body + b"}"
+
+def parse_unread(query):
+    """GET /unread?nick=&version= -> (nick, version or None). version이 있으면 바뀔 때까지 대기"""
+    nick = query.get("nick")
+    if not nick:
+        raise ValueError("nick required")
+    return nick, query.get("version") or None
+
+def unread_json(counts, version):
+    """{"unread": {channel: 안 읽은 메시지 수}, "version"} 바이트. 다음 요청에 version을 넘기면 long-poll"""
+    return json.dumps({"unread": counts, "version": version}).encode("utf-8")
+
+def send_file(sock, filepath, req_headers=None, cache_control=None, content_type=None, filename=None):
+    """
+    파일 응답. 바디는 sendfile로 커널에서 바로 전송하고(불가능하면 청크 전송),
+    ETag/Last-Modified 검증 시 304, 단일 Range 요청 시 206을 보냅니다.
+    content_type/filename을 주면 경로 대신 사용 (확장자 없는 업로드 blob용)
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
         send_response(sock, 404, "Not Found", "File not found")
+        return
+
+    req_headers = req_headers or {}
+    mime = content_type or mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+
+    # 텍스트류 파일은 미리 만들어 둔 .gz 사본으로 응답 (Range 요청은 원본 기준이므로 제외)
+    # 사본이 아직 없으면 원본을 보내고 백그라운드에서 만들도록 예약
+    send_path, size = filepath, st.st_size
+    if is_compressible(mime):
+        headers["Vary"] = "Accept-Encoding"
+        if (getattr(sock, "accept_encoding", None) == "gzip" and "range" not in req_headers
+                and COMPRESS_MIN_SIZE <= st.st_size <= COMPRESS_MAX_FILE_SIZE):
+            sidecar = _gzip_sidecar(filepath, st)
+            if sidecar is not None:
+                send_path, size = sidecar
+                etag = headers["ETag"] = f'"{st.st_size:x}-{st.st_mtime_ns:x}-gz"'
+                headers["Content-Encoding"] = "gzip"
+            else:
+                schedule_gzip_sidecar(filepath, st.st_size, mime)
+
+    if _not_modified(req_headers, etag, st.st_mtime):
+        send_response(sock, 304, "Not Modified", b"", content_type=mime, headers=headers)
+        return
+
+    if not mime.startswith("image/"):
+        headers["Content-Disposition"] = f'attachment; filename="{filename or os.path.basename(filepath)}"'
+
+    status, reason, offset, length = 200, "OK", 0, size
+    range_header = req_headers.get("range")
+    if range_header and _if_range_matches(req_headers, etag, st.st_mtime):
+        byte_range = parse_range(range_header, st.st_size)
+        if byte_range == "unsatisfiable":
+            headers["Content-Range"] = f"bytes */{st.st_size}"
+            send_response(sock, 416, "Range Not Satisfiable", b"", content_type=mime, headers=headers)
+            return
+        if byte_range is not None:
+            offset, end = byte_range
+            length = end - offset + 1
+            status, reason = 206, "Partial Content"
+            headers["Content-Range"] = f"bytes {offset}-{end}/{st.st_size}"
+
+    try:
+        with open(send_path, "rb") as f:
+            sock.sendall(response_head(sock, status, reason, mime, length, headers))
+            if length:
+                _send_file_body(sock, f, offset, length)
+    except OSError:
+        pass
+
+def _send_file_body(sock, f, offset, length):
+    sendfile = getattr(sock, "sendfile", None)
+    if sendfile is not None:
+        # socket.sendfile: os.sendfile 사용, 지원하지 않는 환경에서는 send()로 자동 fallback
+        sendfile(f, offset, length)
+        return
+    f.seek(offset)
+    remaining = length
+    while remaining > 0:
+        chunk = f.read(min(FILE_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        sock.sendall(chunk)
+        remaining -= len(chunk)
+
+def parse_range(value, size):
+    """
+    단일 바이트 범위 'bytes=a-b' / 'bytes=a-' / 'bytes=-n' 을 (start, end)로 변환.
+    다중 범위나 해석 불가한 값은 None(전체 전송), 범위 밖이면 "unsatisfiable"
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            suffix = int(last)
+            if suffix <= 0:
+                return "unsatisfiable"
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "unsatisfiable"
+    return start, min(end, size - 1)
+
+def etag_list_matches(value, etag):
+    """If-None-Match 값(*, 콤마 목록, W/ 약한 태그)에 etag가 있는지. 업로드(send_file)와 정적 자산이 같이 씀"""
+    if value.strip() == "*":
+        return True
+    for candidate in value.split(","):
+        candidate = candidate.strip()
+        # If-None-Match는 약한 비교: W/ 접두어는 무시
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def _not_modified(req_headers, etag, mtime):
+    if "if-none-match" in req_headers:
+        return etag_list_matches(req_headers["if-none-match"], etag)
+    since = _parse_http_date(req_headers.get("if-modified-since"))
+    return since is not None and int(mtime) <= since
+
+def _if_range_matches(req_headers, etag, mtime):
+    value = req_headers.get("if-range")
+    if not value:
+        return True
+    if value.startswith('"'):
+        return value == etag  # If-Range는 강한 비교
+    since = _parse_http_date(value)
+    return since is not None and int(mtime) <= since
+
+def _parse_http_date(value):
+    if not value:
+        return None
+    try:
+        return int(email.utils.parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,251 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+이벤트 저널 (server.py --journal DIR)
+
+ChannelManager가 기록한 이벤트를 세그먼트 단위 append-only 파일에 남겨
+재시작 후에도 채팅 이력과 이벤트 id가 이어지도록 합니다.
+
+- append()는 큐에 넣기만 하고 바로 반환합니다. 백그라운드 flusher 스레드가
+  FLUSH_INTERVAL 동안 모인 이벤트를 한 번에 write + fsync 합니다 (group commit).
+  따라서 /message 응답은 디스크 지연을 기다리지 않으며, 장애 시 최대
+  FLUSH_INTERVAL 만큼의 이벤트가 유실될 수 있습니다.
+- 기록이 실패하면 그 묶음을 큐 앞에 되돌려 새 세그먼트에 다시 씁니다. 성공하기 전까지 durable은
+  늘지 않고 flush()는 False를 반환합니다. 실패 전에 일부 써진 레코드는 재생할 때 id로 걸러냅니다.
+- 레코드 형식: [길이 u32][crc32 u32][이벤트 JSON(UTF-8)]
+- 재시작 시 최신 스냅샷을 읽고, 그 이후 레코드만 세그먼트를 mmap 해서 재생합니다.
+  스냅샷에 포함된 세그먼트는 삭제되므로 재생 시간이 이력 전체 길이에 비례하지 않습니다.
+"""
+
+import collections
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+SEGMENT_SIZE = 64 * 1024 * 1024  # 세그먼트 파일 최대 크기
+FLUSH_INTERVAL = 0.005  # group commit 주기(초)
+RETRY_INTERVAL = 1.0  # 기록 실패 후 다시 시도하기까지(초)
+SNAPSHOT_EVERY = 100000  # 이 개수만큼 이벤트가 쌓일 때마다 스냅샷
+
+_HEADER = struct.Struct("<II")
+_SEGMENT_PREFIX = "journal-"
+_SNAPSHOT_PREFIX = "snapshot-"
+
+_fsync = getattr(os, "fdatasync", os.fsync)
+
+
+def _first_id(name, prefix):
+    return int(name[len(prefix):].split(".", 1)[0])
+
+
+class EventJournal:
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, flush_interval=FLUSH_INTERVAL,
+                 snapshot_every=SNAPSHOT_EVERY):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self.queue = collections.deque()
+        self.cond = threading.Condition()
+        self.appended = 0  # append()된 이벤트 수
+        self.durable = 0  # fsync까지 끝난 이벤트 수
+        self.error = None  # 마지막 기록 실패 (다시 성공하면 None)
+        self.since_snapshot = 0
+        self.snapshot_source = None
+        self.segment = None  # 현재 쓰고 있는 세그먼트 파일 객체
+        self.thread = None
+        self.running = False
+
+    # ------------------------------------------------------------------ 재생
+    def _list(self, prefix):
+        names = [n for n in os.listdir(self.directory) if n.startswith(prefix) and not n.endswith(".tmp")]
+        return sorted(names, key=lambda n: _first_id(n, prefix))
+
+    def replay(self):
+        """스냅샷 + 이후 세그먼트 레코드를 id 순서대로 yield 합니다."""
+        snapshot_id = 0
+        snapshots = self._list(_SNAPSHOT_PREFIX)
+        if snapshots:
+            with open(os.path.join(self.directory, snapshots[-1]), "rb") as f:
+                state = json.load(f)
+            snapshot_id = state["last_event_id"]
+            for event in state["events"]:
+                yield event
+
+        # 실패 후 다시 쓴 레코드는 앞 세그먼트에도 남아 있을 수 있으므로 이미 낸 id는 건너뜀
+        last_id = snapshot_id
+        for name in self._list(_SEGMENT_PREFIX):
+            path = os.path.join(self.directory, name)
+            for event in self._read_segment(path):
+                if event["id"] > last_id:
+                    last_id = event["id"]
+                    yield event
+
+    def _read_segment(self, path):
+        size = os.path.getsize(path)
+        if size == 0:
+            return
+        with open(path, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                pos = 0
+                while pos + _HEADER.size <= size:
+                    length, crc = _HEADER.unpack_from(mm, pos)
+                    start = pos + _HEADER.size
+                    data = mm[start:start + length]
+                    if len(data) < length or zlib.crc32(data) != crc:
+                        break  # 쓰다 만 꼬리 레코드
+                    yield json.loads(data)
+                    pos = start + length
+            finally:
+                mm.close()
+            if pos < size:
+                # 손상된 꼬리는 잘라내서 다음 append가 그 뒤에 붙지 않도록 함
+                print(f"[JOURNAL] Truncating torn tail of {os.path.basename(path)} at {pos}")
+                f.truncate(pos)
+
+    # ------------------------------------------------------------------ 기록
+    def start(self, snapshot_source=None):
+        """
+        flusher 스레드를 시작합니다. snapshot_source()는 (last_event_id, [events])를
+        반환해야 하며 SNAPSHOT_EVERY 개마다 호출됩니다.
+        """
+        self.snapshot_source = snapshot_source
+        self.running = True
+        self.thread = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+        self.thread.start()
+
+    def append(self, event):
+        """이벤트를 큐에 넣고 바로 반환 (내구화는 flusher가 묶어서 처리)"""
+        self.queue.append(event)
+        self.appended += 1
+
+    def flush(self, timeout=None):
+        """지금까지 append된 이벤트가 모두 fsync될 때까지 대기. 기록이 실패하고 있으면 바로 False"""
+        target = self.appended
+        with self.cond:
+            self.cond.notify_all()
+            self.cond.wait_for(lambda: self.durable >= target or self.error is not None or not self.running, timeout)
+            return self.durable >= target
+
+    def close(self):
+        self.flush()
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join()
+        if self.segment:
+            self.segment.close()
+            self.segment = None
+
+    def _flush_loop(self):
+        while True:
+            with self.cond:
+                if not self.queue and self.running:
+                    self.cond.wait(self.flush_interval)
+                if not self.queue and not self.running:
+                    return
+                if self.error is not None and not self.running:
+                    print(f"[JOURNAL ERROR] Closing with {len(self.queue)} events not written")
+                    return
+            batch = []
+            while self.queue:
+                batch.append(self.queue.popleft())
+            if not batch:
+                continue
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"[JOURNAL ERROR] {e} (retrying {len(batch)} events)")
+                self._abandon_segment()
+                with self.cond:
+                    # 순서를 지키도록 그사이 append된 이벤트 앞에 되돌림. durable은 그대로
+                    self.queue.extendleft(reversed(batch))
+                    self.error = e
+                    self.cond.notify_all()
+                    if self.running:
+                        self.cond.wait(RETRY_INTERVAL)
+                continue
+            with self.cond:
+                self.error = None
+                self.durable += len(batch)
+                self.cond.notify_all()
+
+            self.since_snapshot += len(batch)
+            if self.snapshot_source and self.since_snapshot >= self.snapshot_every:
+                self.since_snapshot = 0
+                try:
+                    self.write_snapshot(*self.snapshot_source())
+                except Exception as e:
+                    print(f"[JOURNAL ERROR] snapshot failed: {e}")
+
+    def _write_batch(self, batch):
+        out = bytearray()
+        for event in batch:
+            data = json.dumps(event.to_dict(), ensure_ascii=False).encode("utf-8")
+            record = _HEADER.pack(len(data), zlib.crc32(data)) + data
+            if self.segment is None or self.segment.tell() + len(out) + len(record) > self.segment_size:
+                # 새 세그먼트는 첫 레코드의 id로 이름을 붙임
+                self._write_out(out)
+                out = bytearray()
+                self._rotate(event.id)
+            out += record
+        self._write_out(out)
+
+    def _write_out(self, data):
+        if data and self.segment is not None:
+            self.segment.write(data)
+            self.segment.flush()
+            _fsync(self.segment.fileno())
+
+    def _rotate(self, first_id):
+        if self.segment is not None:
+            self.segment.close()
+        path = os.path.join(self.directory, f"{_SEGMENT_PREFIX}{first_id:020d}.log")
+        if os.path.exists(path):
+            # 실패한 시도가 만든 세그먼트: 쓰다 만 꼬리를 잘라낸 뒤 이어 씀
+            for _ in self._read_segment(path):
+                pass
+        self.segment = open(path, "ab")
+
+    def _abandon_segment(self):
+        """기록에 실패한 세그먼트는 닫고 다음 시도는 새 세그먼트에 씀 (쓰다 만 레코드 뒤에 이어 쓰지 않도록)"""
+        segment, self.segment = self.segment, None
+        if segment is not None:
+            try:
+                segment.close()
+            except OSError:
+                pass
+
+    def write_snapshot(self, last_event_id, events):
+        """스냅샷을 원자적으로 기록하고, 스냅샷에 포함된 세그먼트/이전 스냅샷을 삭제"""
+        name = f"{_SNAPSHOT_PREFIX}{last_event_id:020d}.json"
+        path = os.path.join(self.directory, name)
+        events = [event.to_dict() for event in events]
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"last_event_id": last_event_id, "events": events}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        for old in self._list(_SNAPSHOT_PREFIX):
+            if old != name:
+                os.remove(os.path.join(self.directory, old))
+        # 다음 세그먼트가 스냅샷 이후에서 시작하면 이 세그먼트 전체가 스냅샷에 포함됨
+        segments = self._list(_SEGMENT_PREFIX)
+        for seg, nxt in zip(segments, segments[1:]):
+            if _first_id(nxt, _SEGMENT_PREFIX) <= last_event_id + 1:
+                os.remove(os.path.join(self.directory, seg))
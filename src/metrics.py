@@ -0,0 +1,269 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+서버 계측 (GET /metrics, Prometheus 텍스트 형식)
+
+- 라우트별 요청 수(상태 코드별)와 처리 시간 히스토그램, 송수신 바이트
+- ChannelManager 락의 대기/보유 시간 (InstrumentedRLock)
+- 업로드 처리량, 스레드 수, 채널별 대기 중인 long-poll 수, 이벤트 로그 크기
+- 과부하 제어: 동시 연결/long-poll 수, 워커 대기열 길이, 503/408/431로 거절한 횟수 (Admission)
+요청 하나당 락 한 번 + 카운터 몇 개만 갱신하므로 항상 켜 둡니다.
+/events, /stream, /ws의 처리 시간은 대기/연결 유지 시간을 포함합니다.
+"""
+
+import bisect
+import threading
+import time
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 요청 처리 시간 구간(초)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 락 대기/보유 시간 구간(초)
+LOCK_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 0.05, 0.1, 0.5)
+
+# 라벨 수가 요청 경로에 따라 무한히 늘지 않도록 알려진 라우트만 그대로 쓰고 나머지는 "other"
+KNOWN_ROUTES = {"/events", "/stream", "/ws", "/channels", "/users", "/stats", "/join", "/leave", "/message",
+                "/presence", "/upload", "/metrics", "/sync", "/history", "/search", "/unread"}
+
+# 모든 시계열에 붙는 라벨 (클러스터 워커 번호 등)
+BASE_LABELS = {}
+
+
+class Histogram:
+    """누적 구간 히스토그램. 스레드 안전하지 않으므로 호출하는 쪽이 락을 잡고 갱신"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        out = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            out.append(_line(f"{name}_bucket", dict(labels, le=repr(bound)), total))
+        total += self.counts[-1]
+        out.append(_line(f"{name}_bucket", dict(labels, le="+Inf"), total))
+        out.append(_line(f"{name}_sum", labels, self.sum))
+        out.append(_line(f"{name}_count", labels, total))
+        return out
+
+
+class InstrumentedRLock:
+    """
+    대기/보유 시간을 재는 RLock. threading.Condition이 쓰는 _release_save/_acquire_restore도 구현해
+    cond.wait() 동안은 보유 시간에서 빠집니다. 통계는 이 락을 잡은 상태에서만 갱신하므로 별도 락이 필요 없고,
+    경합이 없을 때는 시각을 재지 않고 바로 잡습니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._acquired_at = 0.0
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait = Histogram(LOCK_BUCKETS)
+        self.hold = Histogram(LOCK_BUCKETS)
+
+    def acquire(self, blocking=True, timeout=-1):
+        if not self._lock.acquire(False):
+            if not blocking:
+                return False
+            started = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            self.contended += 1
+            self.wait.observe(time.perf_counter() - started)
+        self._depth += 1
+        if self._depth == 1:
+            self.acquisitions += 1
+            self._acquired_at = time.perf_counter()
+        return True
+
+    __enter__ = acquire
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self.hold.observe(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def _is_owned(self):
+        return self._lock._is_owned()
+
+    def _release_save(self):
+        depth, self._depth = self._depth, 0
+        self.hold.observe(time.perf_counter() - self._acquired_at)
+        return self._lock._release_save(), depth
+
+    def _acquire_restore(self, state):
+        inner, depth = state
+        started = time.perf_counter()
+        self._lock._acquire_restore(inner)
+        now = time.perf_counter()
+        self.wait.observe(now - started)
+        self._depth = depth
+        self._acquired_at = now
+
+    def families(self, name, labels):
+        """family 이름 -> 샘플 줄 목록 (HELP/TYPE는 render_metrics가 family마다 앞에 붙임)"""
+        return {
+            f"{name}_acquisitions_total": [_line(f"{name}_acquisitions_total", labels, self.acquisitions)],
+            f"{name}_contended_total": [_line(f"{name}_contended_total", labels, self.contended)],
+            f"{name}_wait_seconds": self.wait.lines(f"{name}_wait_seconds", labels),
+            f"{name}_hold_seconds": self.hold.lines(f"{name}_hold_seconds", labels),
+        }
+
+
+_lock = threading.Lock()
+_requests = {}  # (route, status) -> count
+_durations = {}  # route -> Histogram
+_counters = {"bytes_in": 0, "bytes_out": 0, "errors": 0, "uploads": 0, "upload_bytes": 0, "upload_dedup": 0}
+_started = time.time()
+
+
+def route_label(method, path_only):
+    if path_only in KNOWN_ROUTES:
+        return f"{method} {path_only}"
+    if path_only.startswith("/uploads/"):
+        return f"{method} /uploads"
+    if path_only.startswith("/static/"):
+        return f"{method} /static"
+    return "other"
+
+
+def observe_request(route, status, seconds, bytes_in, bytes_out):
+    with _lock:
+        key = (route, str(status))
+        _requests[key] = _requests.get(key, 0) + 1
+        hist = _durations.get(route)
+        if hist is None:
+            hist = _durations[route] = Histogram(LATENCY_BUCKETS)
+        hist.observe(seconds)
+        _counters["bytes_in"] += bytes_in
+        _counters["bytes_out"] += bytes_out
+
+
+def observe_error():
+    with _lock:
+        _counters["errors"] += 1
+
+
+def observe_upload(size, deduplicated):
+    with _lock:
+        _counters["uploads"] += 1
+        _counters["upload_bytes"] += size
+        if deduplicated:
+            _counters["upload_dedup"] += 1
+
+
+def render_metrics(manager, admission=None):
+    """Prometheus 텍스트 형식 (text/plain; version=0.0.4)"""
+    base = dict(BASE_LABELS)
+    wakeups, parked = manager.wakeup_counters()
+    log_sizes = manager.event_log_sizes()
+    out = []
+
+    def family(name, kind, help_text):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        requests = sorted(_requests.items())
+        durations = [(route, hist.lines("chat_http_request_duration_seconds", dict(base, route=route)))
+                     for route, hist in sorted(_durations.items())]
+        counters = dict(_counters)
+
+    family("chat_http_requests_total", "counter", "HTTP requests by route and status")
+    for (route, status), count in requests:
+        out.append(_line("chat_http_requests_total", dict(base, route=route, status=status), count))
+    family("chat_http_request_duration_seconds", "histogram", "Request handling time including long-poll waits")
+    for _, lines in durations:
+        out.extend(lines)
+    family("chat_http_received_bytes_total", "counter", "Request bytes read")
+    out.append(_line("chat_http_received_bytes_total", base, counters["bytes_in"]))
+    family("chat_http_sent_bytes_total", "counter", "Response bytes written")
+    out.append(_line("chat_http_sent_bytes_total", base, counters["bytes_out"]))
+    family("chat_http_errors_total", "counter", "Unhandled exceptions while serving requests")
+    out.append(_line("chat_http_errors_total", base, counters["errors"]))
+
+    family("chat_uploads_total", "counter", "Completed uploads")
+    out.append(_line("chat_uploads_total", base, counters["uploads"]))
+    family("chat_upload_bytes_total", "counter", "Uploaded bytes")
+    out.append(_line("chat_upload_bytes_total", base, counters["upload_bytes"]))
+    family("chat_upload_deduplicated_total", "counter", "Uploads whose content was already stored")
+    out.append(_line("chat_upload_deduplicated_total", base, counters["upload_dedup"]))
+
+    family("chat_threads", "gauge", "Live threads")
+    out.append(_line("chat_threads", base, threading.active_count()))
+    family("chat_uptime_seconds", "gauge", "Seconds since the process started")
+    out.append(_line("chat_uptime_seconds", base, round(time.time() - _started, 3)))
+    family("chat_parked_waiters", "gauge", "Parked long-poll/SSE/WebSocket waiters by channel")
+    for channel, count in sorted(parked.items()):
+        out.append(_line("chat_parked_waiters", dict(base, channel=channel), count))
+    family("chat_waiter_wakeups_total", "counter", "Waiter wakeups by outcome")
+    for outcome, count in sorted(wakeups.items()):
+        out.append(_line("chat_waiter_wakeups_total", dict(base, outcome=outcome), count))
+    family("chat_event_log_events", "gauge", "Events retained per channel")
+    for channel, size in sorted(log_sizes.items()):
+        out.append(_line("chat_event_log_events", dict(base, channel=channel), size))
+
+    if admission is not None:
+        stats = admission.snapshot()
+        family("chat_connections", "gauge", "Open client connections")
+        out.append(_line("chat_connections", base, stats["connections"]))
+        family("chat_long_polls", "gauge", "Requests currently waiting on /events, /sync, /unread, /stream or /ws")
+        out.append(_line("chat_long_polls", base, stats["long_polls"]))
+        if "queue_depth" in stats:
+            family("chat_worker_queue_depth", "gauge", "Accepted connections waiting for a worker thread")
+            out.append(_line("chat_worker_queue_depth", base, stats["queue_depth"]))
+            family("chat_worker_threads", "gauge", "Worker threads by state")
+            out.append(_line("chat_worker_threads", dict(base, state="busy"), stats["busy_workers"]))
+            out.append(_line("chat_worker_threads", dict(base, state="idle"),
+                             stats["workers"] - stats["busy_workers"]))
+        family("chat_shed_total", "counter", "Connections or requests refused with 503 by reason")
+        for reason, count in sorted(stats["shed"].items()):
+            out.append(_line("chat_shed_total", dict(base, reason=reason), count))
+        family("chat_requests_rejected_total", "counter", "Requests refused while reading (408/431) by reason")
+        for reason, count in sorted(stats["rejected"].items()):
+            out.append(_line("chat_requests_rejected_total", dict(base, reason=reason), count))
+
+    lock = manager.lock
+    if isinstance(lock, InstrumentedRLock):
+        with manager.cond:
+            samples = lock.families("chat_manager_lock", base)
+        for name, kind, help_text in (
+                ("chat_manager_lock_acquisitions_total", "counter", "ChannelManager lock acquisitions"),
+                ("chat_manager_lock_contended_total", "counter", "Acquisitions that had to wait"),
+                ("chat_manager_lock_wait_seconds", "histogram", "Time spent waiting for the lock"),
+                ("chat_manager_lock_hold_seconds", "histogram", "Time the lock was held")):
+            family(name, kind, help_text)
+            out.extend(samples[name])
+    return ("\n".join(out) + "\n").encode("utf-8")
+
+
+def _line(name, labels, value):
+    if labels:
+        inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{inner}}} {value}"
+    return f"{name} {value}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,172 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+메시지 전문 검색용 역색인 (GET /search)
+
+한국어는 띄어쓰기 단위(어절)에 조사가 붙어 단어 단위 색인으로는 "회의"로 "회의는"을 찾을 수 없으므로
+어절 안의 글자 2-gram을 색인합니다. ("안녕하세요" -> 안녕, 녕하, 하세, 세요)
+검색어의 모든 2-gram이 들어 있는 이벤트를 후보로 고른 뒤 실제 본문에 검색어가 있는지 다시 확인하므로
+결과는 부분 문자열 검색과 같습니다. 한 글자 검색어는 색인 없이 최근 이벤트부터 훑습니다.
+
+채널마다 TextIndex 하나: 2-gram -> 이벤트 id 배열(오름차순, array 'I'로 id당 4바이트).
+이벤트 id는 채널 안에서 단조 증가하므로 추가는 append 한 번이고, 보관 범위에서 밀려난 id는
+검색 시 건너뛰다가 버려진 수가 남은 수보다 많아지면 한 번에 잘라냅니다.
+"""
+
+import array
+import bisect
+import itertools
+import re
+import unicodedata
+
+# 한 번에 돌려줄 최대 검색 결과 수 / 검색어 최대 길이
+SEARCH_LIMIT = 50
+MAX_QUERY_LENGTH = 200
+# 버려진 id가 이보다 적으면 정리하지 않음 (작은 채널에서 매번 정리하지 않도록)
+_COMPACT_MIN_DEAD = 1024
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """전각/반각, 대소문자 차이를 없앰"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def query_terms(query):
+    """검색어 -> 정규화된 어절 목록 (중복 제거, 순서 유지)"""
+    return list(dict.fromkeys(_WORD_RE.findall(normalize(query or ""))))
+
+
+def searchable_text(event):
+    """검색 대상 문자열: 일반 메시지는 본문, 이미지/파일 메시지는 파일 이름 (URL은 제외)"""
+    if event.type != "message":
+        return ""
+    return _message_text(event.msg_type, event.text, event.file_name)
+
+
+def _message_text(msg_type, text, file_name):
+    return (text if msg_type == "text" else file_name) or ""
+
+
+def message_grams(msg_type, text, file_name=None):
+    """
+    post_message가 매니저 락을 잡기 전에 미리 계산해 TextIndex.add(event, grams)로 넘기는 2-gram 집합.
+    검색 대상 문자열이 없으면 None
+    """
+    text = _message_text(msg_type, text, file_name)
+    return text_grams(text) if text else None
+
+
+def text_grams(text):
+    grams = set()
+    for word in _WORD_RE.findall(normalize(text)):
+        grams |= _grams(word)
+    return grams
+
+
+def _grams(word):
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def matches(event, terms):
+    text = normalize(searchable_text(event))
+    return all(term in text for term in terms)
+
+
+class TextIndex:
+    """채널 하나의 2-gram 역색인"""
+
+    def __init__(self):
+        self.postings = {}  # 2-gram -> array('I') of event id
+        self.live = 0  # 색인된 이벤트 중 아직 보관 중인 수
+        self.dead = 0  # 보관 범위에서 밀려났지만 배열에 남아 있는 수
+
+    def add(self, event, grams=None):
+        """grams: message_grams()로 미리 계산한 2-gram (없으면 여기서 계산)"""
+        if grams is None:
+            text = searchable_text(event)
+            if not text:
+                return
+            grams = text_grams(text)
+        event_id = event.id
+        postings = self.postings
+        for gram in grams:
+            ids = postings.get(gram)
+            if ids is None:
+                ids = postings[gram] = array.array("I")
+            ids.append(event_id)
+        self.live += 1
+
+    def evicted(self, event, first_live_id):
+        """이벤트가 보관 범위에서 밀려남. first_live_id 미만의 id는 더 이상 찾지 않음"""
+        if not searchable_text(event):
+            return
+        self.live -= 1
+        self.dead += 1
+        if self.dead >= _COMPACT_MIN_DEAD and self.dead > self.live:
+            self.compact(first_live_id)
+
+    def compact(self, first_live_id):
+        postings = self.postings
+        for gram in list(postings):
+            ids = postings[gram]
+            cut = bisect.bisect_left(ids, first_live_id)
+            if cut == len(ids):
+                del postings[gram]
+            elif cut:
+                postings[gram] = ids[cut:]
+        self.dead = 0
+
+    def search(self, terms, log, before_id=None, limit=SEARCH_LIMIT):
+        """terms를 모두 포함하는 이벤트를 최신순으로 최대 limit개 (before_id가 있으면 그보다 이전 것만)"""
+        return list(itertools.islice(self.iter_matches(terms, log, before_id), limit))
+
+    def iter_matches(self, terms, log, before_id=None):
+        """
+        search()의 지연 버전: 찾는 대로 최신순으로 내보냅니다. (여러 채널 결과를 heapq.merge로 합칠 때 사용)
+        가장 짧은 posting부터 뒤에서 훑으며 나머지 posting은 이진 탐색으로 확인합니다.
+        """
+        first_id = log.first_id()
+        if first_id is None:
+            return
+        grams = set()
+        for term in terms:
+            grams |= _grams(term)
+        if not grams:
+            # 한 글자 검색어: 2-gram이 없으므로 보관 중인 이벤트를 최신순으로 확인
+            for event in log.iter_back(before_id):
+                if matches(event, terms):
+                    yield event
+            return
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return
+            lists.append(ids)
+        lists.sort(key=len)
+        base, others = lists[0], lists[1:]
+
+        i = bisect.bisect_left(base, before_id) if before_id is not None else len(base)
+        while i > 0:
+            i -= 1
+            event_id = base[i]
+            if event_id < first_id:
+                break
+            if all(_contains(ids, event_id) for ids in others):
+                event = log.get(event_id)
+                if event is not None and matches(event, terms):
+                    yield event
+
+
+def _contains(ids, event_id):
+    i = bisect.bisect_left(ids, event_id)
+    return i < len(ids) and ids[i] == event_id
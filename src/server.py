@@ -7,7 +7,8 @@
 # 21011650 이규민 (QA & Documentation Specialist)
 # ==============================================================================
 
-import json
+import argparse
+import mimetypes
 import socket
 import threading
 import os
@@ -16,144 +17,468 @@ import traceback
 import urllib.parse
 
 try:
+    from src.admission import (LONG_POLL_ROUTES, LONG_POLL_SHARE, MAX_QUEUE, MAX_WORKERS, SHED_LINGER, Admission,
+                               WorkerPool, send_overloaded)
     from src.channel_manager import ChannelManager
-    from src.http_utils import parse_http_request, parse_query, parse_multipart_data, send_json, send_response, send_file
+    from src.journal import EventJournal
+    from src.static_assets import AssetCache, send_asset
+    from src.metrics import (BASE_LABELS, METRICS_CONTENT_TYPE, observe_error, observe_request, observe_upload,
+                             render_metrics, route_label)
+    from src.upload_store import UploadStore, is_digest
+    from src.websocket import (OP_PING, WS_IDLE_TIMEOUT, WS_PING_INTERVAL, ChatSession, FrameParser,
+                               ProtocolError, ThreadSignal, close_frame, encode_frame, handshake_response,
+                               is_upgrade_request)
+    from src.http_utils import (HttpConnection, KEEPALIVE_MAX_REQUESTS, KEEPALIVE_TIMEOUT, MAX_BODY_SIZE,
+                                MultipartParser, RequestRejected, content_length, parse_query, send_json, send_json_bytes,
+                                send_response, SSE_HEARTBEAT_INTERVAL, UPLOAD_CACHE_CONTROL, events_json,
+                                grouped_events_json, history_json, parse_cursors, parse_history, parse_json_object,
+                                parse_search, parse_sync, parse_unread, schedule_gzip_sidecar, search_json, send_file, sse_cursor,
+                                sse_event_frames, sse_head, negotiate_encoding, sync_json, unread_json, wants_keep_alive)
 except ImportError:
+    from admission import (LONG_POLL_ROUTES, LONG_POLL_SHARE, MAX_QUEUE, MAX_WORKERS, SHED_LINGER, Admission,
+                           WorkerPool, send_overloaded)
     from channel_manager import ChannelManager
-    from http_utils import parse_http_request, parse_query, parse_multipart_data, send_json, send_response, send_file
+    from journal import EventJournal
+    from static_assets import AssetCache, send_asset
+    from metrics import (BASE_LABELS, METRICS_CONTENT_TYPE, observe_error, observe_request, observe_upload,
+                         render_metrics, route_label)
+    from upload_store import UploadStore, is_digest
+    from websocket import (OP_PING, WS_IDLE_TIMEOUT, WS_PING_INTERVAL, ChatSession, FrameParser,
+                           ProtocolError, ThreadSignal, close_frame, encode_frame, handshake_response,
+                           is_upgrade_request)
+    from http_utils import (HttpConnection, KEEPALIVE_MAX_REQUESTS, KEEPALIVE_TIMEOUT, MAX_BODY_SIZE,
+                            MultipartParser, RequestRejected, content_length, parse_query, send_json, send_json_bytes,
+                            send_response, SSE_HEARTBEAT_INTERVAL, UPLOAD_CACHE_CONTROL, events_json,
+                            grouped_events_json, history_json, parse_cursors, parse_history, parse_json_object,
+                            parse_search, parse_sync, parse_unread, schedule_gzip_sidecar, search_json, send_file, sse_cursor,
+                            sse_event_frames, sse_head, negotiate_encoding, sync_json, unread_json, wants_keep_alive)
 
 HOST = "::"  # IPv6/IPv4 모두 수용 (dual-stack 시도)
 PORT = 8080
+LISTEN_BACKLOG = 1024
 # 업로드 경로는 프로젝트 루트 기준으로 고정해 CWD에 영향을 받지 않도록 함
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(os.path.dirname(BASE_DIR), "uploads")
+# React 빌드 결과 (`npm run build`). 있으면 API 외의 GET 요청을 메모리 캐시에서 서비스 (--static-dir로 변경)
+STATIC_DIR = os.path.join(os.path.dirname(BASE_DIR), "my-chat-app", "build")
+# 업로드 최대 크기 (스트리밍 저장이므로 메모리와 무관, --max-upload-mb로 변경)
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+# 스레드 모드 워커 풀 크기 / 대기열 길이 (--max-workers, --max-queue로 변경)
+WORKER_THREADS = MAX_WORKERS
+WORKER_QUEUE = MAX_QUEUE
 
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
 channel_manager = ChannelManager()
+# 동시 연결/long-poll 제한과 거절 통계 (한도는 main에서 인자로 설정)
+admission = Admission()
+# 업로드 blob 저장소: uploads/blobs/ab/cd/<sha256> + uploads/index.sqlite3
+upload_store = UploadStore(UPLOAD_DIR)
+# 프론트엔드 정적 파일 캐시 (serve()에서 읽고 변경 감시 시작)
+static_assets = AssetCache(STATIC_DIR)
 
 def handle_client(conn, addr):
+    conn = HttpConnection(conn)
+    conn.settimeout(KEEPALIVE_TIMEOUT)
     try:
-        parsed = parse_http_request(conn)
-        if not parsed or parsed[0] is None:
-            return
-
-        method, path, version, headers, body = parsed
-        path_only, query = parse_query(path)
-
-        # print(f"[REQ] {method} {path_only}") # 디버깅용
-
-        if method == "OPTIONS":
-            send_response(conn, 200, "OK", "")
-            return
-
-        if method == "GET" and path_only.startswith("/uploads/"):
-            raw_name = path_only.replace("/uploads/", "")
-            filename = urllib.parse.unquote(raw_name)
-            filepath = os.path.join(UPLOAD_DIR, filename)
-            # 경로 조작 방지
-            if ".." in filename or filename.startswith("/"):
-                send_response(conn, 403, "Forbidden", "Invalid path")
-            else:
-                send_file(conn, filepath)
-            return
-
-        if method == "GET" and path_only == "/channels":
-            channels = channel_manager.list_channels(query.get("nick"))
-            send_json(conn, 200, {"channels": channels})
-
-        elif method == "GET" and path_only == "/users":
-            users = channel_manager.get_all_users()
-            send_json(conn, 200, {"users": users})
-
-        elif method == "POST" and path_only == "/join":
-            data = json.loads(body.decode("utf-8"))
-            members, event = channel_manager.join_channel(data.get("channel"), data.get("nick"))
-            send_json(conn, 200, {"status": "joined", "members": members, "event_id": event["id"]})
-
-        elif method == "POST" and path_only == "/leave":
-            data = json.loads(body.decode("utf-8"))
-            nick = data.get("nick")
-            channel = data.get("channel")
-            if channel:
-                ok = channel_manager.part_channel(channel, nick, reason="leaving")
+        # Keep-Alive: 한 연결에서 여러 요청을 순서대로 처리 (파이프라이닝 포함)
+        for served in range(1, KEEPALIVE_MAX_REQUESTS + 1):
+            bytes_in, bytes_out = conn.bytes_in, conn.bytes_out
+            method, path, version, headers = conn.read_request_head()
+            if method is None:
+                return
+
+            path_only, query = parse_query(path)
+            # 워커를 기다리는 연결이 있으면 이 요청까지만 처리하고 닫아 워커를 양보
+            conn.keep_alive = (served < KEEPALIVE_MAX_REQUESTS and wants_keep_alive(version, headers)
+                               and not admission.saturated())
+            conn.accept_encoding = negotiate_encoding(headers)
+            started = time.perf_counter()
+
+            # print(f"[REQ] {method} {path_only}") # 디버깅용
+
+            if method == "POST" and path_only == "/upload":
+                # 업로드 바디는 메모리에 모으지 않고 청크 단위로 디스크에 기록
+                sink = begin_upload(conn, headers)
+                if sink is not None:
+                    try:
+                        for chunk in conn.iter_body(content_length(headers)):
+                            sink.feed(chunk)
+                    except BaseException:
+                        sink.abort()
+                        raise
+                    sink.finish(conn)
             else:
-                ok = channel_manager.leave_all(nick, reason="leaving")
-            if ok:
-                send_json(conn, 200, {"status": "left"})
-            else:
-                send_response(conn, 400, "Bad Request", "Not in channel")
-
-        elif method == "POST" and path_only == "/message":
-            data = json.loads(body.decode("utf-8"))
-            event = channel_manager.post_message(
-                data.get("channel"),
-                data.get("nick"),
-                data.get("text"),
-                data.get("msg_type", "text"),
-                data.get("file_name")
-            )
-            if event:
-                send_json(conn, 200, {"status": "sent", "event_id": event["id"]})
-            else:
-                send_response(conn, 400, "Bad Request", "Join channel first")
-
-        elif method == "POST" and path_only == "/presence":
-            data = json.loads(body.decode("utf-8"))
-            channel_manager.set_focus(data.get("nick"), data.get("active", False))
-            send_json(conn, 200, {"status": "ok"})
-
-        elif method == "GET" and path_only == "/events":
-            events, latest = channel_manager.wait_events(
-                query.get("channel"), int(query.get("since", 0)), query.get("nick")
-            )
-            send_json(conn, 200, {"events": events, "latest": latest})
-
-        elif method == "POST" and path_only == "/upload":
-            ctype = headers.get("content-type", "")
-            if "boundary=" in ctype:
-                # [중요 수정] boundary 파싱 시 뒤에 붙은 ; charset 등 제거
-                boundary = ctype.split("boundary=")[1].split(";")[0].strip()
-
-                parts = parse_multipart_data(body, boundary)
-
-                if 'file' in parts:
-                    fname, fcontent = parts['file']
-                    fname = os.path.basename(fname)
-                    # 파일명 안전하게 변경 (timestamp_prefix_originalname)
-                    safe_name = f"{int(time.time() * 1000)}_{fname.replace(' ', '_')}"
-                    filepath = os.path.join(UPLOAD_DIR, safe_name)
-
-                    with open(filepath, "wb") as f:
-                        f.write(fcontent)
-
-                    # 업로드 성공 로그
-                    print(f"[UPLOAD] Saved {len(fcontent)} bytes to {filepath}")
-
-                    req_host = headers.get("host", f"localhost:{PORT}")
-                    url = f"http://{req_host}/uploads/{safe_name}"
-                    send_json(conn, 200, {"url": url, "filename": fname, "saved_as": safe_name})
+                length = content_length(headers)
+                if length > MAX_BODY_SIZE:
+                    conn.keep_alive = False
+                    send_response(conn, 413, "Payload Too Large", f"Body exceeds {MAX_BODY_SIZE} bytes")
+                    return
+                body = conn.read_body(length)
+
+                waiting = path_only in LONG_POLL_ROUTES
+                if waiting and not admission.begin_long_poll():
+                    send_overloaded(conn)
                 else:
-                    print("[UPLOAD FAIL] No file part found")
-                    send_response(conn, 400, "Bad Request", "No file found")
-            else:
-                send_response(conn, 400, "Bad Request", "Not multipart")
-
-        else:
-            send_response(conn, 404, "Not Found", "Unknown Endpoint")
-
+                    try:
+                        if method == "GET" and path_only == "/events":
+                            events, latest, expired = channel_manager.wait_events(
+                                query.get("channel"), int(query.get("since", 0)), query.get("nick")
+                            )
+                            send_json_bytes(conn, 200, events_json(events, latest, expired))
+                        elif method == "POST" and path_only == "/events":
+                            # 여러 채널을 한 번의 long-poll로 대기: {"nick", "cursors": {channel: since}, "read"?}
+                            try:
+                                cursors, nick, read = parse_cursors(body)
+                            except ValueError as e:
+                                send_response(conn, 400, "Bad Request", str(e))
+                            else:
+                                results, latest = channel_manager.wait_channels(cursors, nick, read=read)
+                                send_json_bytes(conn, 200, grouped_events_json(results, latest, cursors))
+                        elif method == "POST" and path_only == "/sync":
+                            # 채널 목록/접속자/이벤트 델타를 한 번의 long-poll로: 브라우저의 폴링 루프 세 개를 대체
+                            try:
+                                nick, epoch, versions, cursors, read, active = parse_sync(body)
+                            except ValueError as e:
+                                send_response(conn, 400, "Bad Request", str(e))
+                            else:
+                                state, results, latest = channel_manager.sync(
+                                    nick, epoch, versions, cursors, read=read, active=active)
+                                send_json_bytes(conn, 200, sync_json(state, results, latest, cursors))
+                        elif method == "GET" and path_only == "/unread":
+                            # 채널별 안 읽은 수 (이벤트 없이), version을 주면 바뀔 때까지 대기
+                            try:
+                                nick, version = parse_unread(query)
+                            except ValueError as e:
+                                send_response(conn, 400, "Bad Request", str(e))
+                            else:
+                                counts, version = channel_manager.wait_unread(nick, version)
+                                send_json_bytes(conn, 200, unread_json(counts, version))
+                        elif method == "GET" and path_only == "/stream":
+                            stream_events(conn, query, headers)
+                        elif method == "GET" and path_only == "/ws":
+                            serve_websocket(conn, query, headers)
+                        else:
+                            route_request(conn, method, path_only, query, headers, body)
+                    finally:
+                        if waiting:
+                            admission.end_long_poll()
+
+            observe_request(route_label(method, path_only), conn.status, time.perf_counter() - started,
+                            conn.bytes_in - bytes_in, conn.bytes_out - bytes_out)
+            if not conn.keep_alive:
+                return
+
+    except RequestRejected as e:
+        # 읽기 기한 초과(408) / 헤더가 너무 큼(431)
+        admission.count_rejected(e.kind)
+        send_response(conn, e.status, e.reason, e.reason)
+    except (ConnectionError, socket.timeout):
+        pass
     except Exception as e:
         print(f"[ERROR] {e}")
         traceback.print_exc()
+        observe_error()
         try:
+            conn.keep_alive = False
             send_response(conn, 500, "Internal Error", str(e))
         except: pass
     finally:
+        admission.release(addr[0])
         try: conn.close()
         except: pass
 
-def start_server():
+def stream_events(conn, query, headers):
+    """
+    GET /stream: 연결을 열어 둔 채 채널 이벤트를 SSE 프레임으로 push 합니다.
+    클라이언트가 끊으면 sendall이 예외를 내며 종료됩니다.
+    """
+    channel = query.get("channel")
+    if not channel:
+        send_response(conn, 400, "Bad Request", "channel required")
+        return
+    since = sse_cursor(query, headers)
+    conn.keep_alive = False  # 스트림 끝은 연결 종료로 표시
+    conn.sendall(sse_head(conn))
+    while True:
+        events, latest, expired = channel_manager.wait_events(
+            channel, since, query.get("nick"), timeout=SSE_HEARTBEAT_INTERVAL
+        )
+        conn.sendall(sse_event_frames(events, latest, expired))
+        if events:
+            since = events[-1]["id"]
+
+def serve_websocket(conn, query, headers):
+    """
+    GET /ws: WebSocket으로 전환 후 이 스레드는 클라이언트 프레임을 읽고,
+    전달 스레드가 구독 채널의 새 이벤트를 모아 push 합니다.
+    """
+    nick = query.get("nick")
+    if not nick:
+        send_response(conn, 400, "Bad Request", "nick required")
+        return
+    if not is_upgrade_request(headers):
+        send_response(conn, 426, "Upgrade Required", "WebSocket upgrade required")
+        return
+    conn.keep_alive = False
+    conn.sendall(handshake_response(headers))
+    conn.status = 101
+    conn.settimeout(WS_IDLE_TIMEOUT)
+
+    signal = ThreadSignal()
+    session = ChatSession(channel_manager, nick, signal)
+    send_lock = threading.Lock()
+    closed = threading.Event()
+
+    def send(data):
+        if data:
+            with send_lock:
+                conn.sendall(data)
+
+    def deliver():
+        try:
+            while not closed.is_set():
+                woken = signal.event.wait(WS_PING_INTERVAL)
+                signal.event.clear()
+                if closed.is_set():
+                    return
+                send(session.pending_frames())
+                if not woken:
+                    send(encode_frame(OP_PING))
+                    channel_manager.touch(nick)
+        except OSError:
+            closed.set()
+
+    # 워커 풀 상한 밖의 스레드 (WebSocket 수는 max_long_polls로 제한됨)
+    deliverer = threading.Thread(target=deliver, daemon=True)
+    deliverer.start()
+    parser = FrameParser()
+    try:
+        while not session.closed and not closed.is_set():
+            data = conn.recv()
+            if not data:
+                return
+            for opcode, payload in parser.feed(data):
+                send(session.handle(opcode, payload))
+                if session.closed:
+                    return
+    except ProtocolError as e:
+        send(close_frame(e.code, e.reason))
+    finally:
+        closed.set()
+        signal.wake()
+        session.close()
+        deliverer.join(1)
+
+class UploadSink:
+    """/upload 바디 청크를 스트리밍 멀티파트 파서로 흘려보내고, 끝나면 파일을 확정/응답"""
+
+    def __init__(self, headers, boundary):
+        self.headers = headers
+        self.parser = MultipartParser(boundary, UPLOAD_DIR)
+        self.error = None
+
+    def feed(self, chunk):
+        # 파싱 오류가 나도 남은 바디는 계속 받아서 버림 (keep-alive 연결 유지)
+        if self.error:
+            return
+        try:
+            self.parser.feed(chunk)
+        except ValueError as e:
+            self.error = str(e)
+            self.parser.abort()
+
+    def abort(self):
+        self.parser.abort()
+
+    def finish(self, conn):
+        if not self.error:
+            try:
+                self.parser.close()
+            except ValueError as e:
+                self.error = str(e)
+        if self.error:
+            print(f"[UPLOAD FAIL] {self.error}")
+            send_response(conn, 400, "Bad Request", self.error)
+            return
+
+        files = self.parser.files
+        if not files:
+            print("[UPLOAD FAIL] No file part found")
+            send_response(conn, 400, "Bad Request", "No file found")
+            return
+        # 첫 번째 파일 파트만 사용하고 나머지 임시 파일은 정리
+        for _, extra_path, _, _ in files[1:]:
+            os.remove(extra_path)
+
+        fname, tmp_path, size, digest = files[0]
+        fname = os.path.basename(fname)
+        mime = mimetypes.guess_type(fname)[0] or "application/octet-stream"
+        # 같은 내용은 한 번만 저장 (임시 파일 -> blobs/ab/cd/<digest>)
+        deduplicated = upload_store.put(tmp_path, digest, size, fname, mime)
+        observe_upload(size, deduplicated)
+        if not deduplicated:
+            # 텍스트류면 응답 압축용 .gz 사본을 미리 만들어 둠 (백그라운드, 다운로드 요청을 기다리지 않음)
+            schedule_gzip_sidecar(upload_store.blob_path(digest), size, mime)
+
+        # 업로드 성공 로그
+        print(f"[UPLOAD] {'Deduplicated' if deduplicated else 'Stored'} {size} bytes as {digest[:12]} ({fname})")
+
+        # URL에 digest가 들어가므로 내용이 바뀌지 않음 (파일명은 다운로드 이름/확장자용)
+        saved_as = f"{digest}/{urllib.parse.quote(fname.replace(' ', '_'))}"
+        req_host = self.headers.get("host", f"localhost:{PORT}")
+        url = f"http://{req_host}/uploads/{saved_as}"
+        send_json(conn, 200, {"url": url, "filename": fname, "saved_as": saved_as, "digest": digest})
+
+def begin_upload(conn, headers):
+    """
+    /upload 요청 헤더를 검사해 UploadSink를 반환합니다.
+    거절할 경우 바디를 읽지 않은 채 응답하므로 연결을 닫도록 표시하고 None을 반환합니다.
+    """
+    ctype = headers.get("content-type", "")
+    error = None
+    if "boundary=" not in ctype:
+        error = (400, "Bad Request", "Not multipart")
+    elif "content-length" not in headers:
+        error = (411, "Length Required", "Content-Length required")
+    elif content_length(headers) > MAX_UPLOAD_SIZE:
+        error = (413, "Payload Too Large", f"Upload exceeds {MAX_UPLOAD_SIZE} bytes")
+    if error:
+        conn.keep_alive = False
+        send_response(conn, *error)
+        return None
+
+    # [중요 수정] boundary 파싱 시 뒤에 붙은 ; charset 등 제거
+    boundary = ctype.split("boundary=")[1].split(";")[0].strip().strip('"')
+    return UploadSink(headers, boundary)
+
+def route_request(conn, method, path_only, query, headers, body):
+    """
+    블로킹 대기가 없는 요청을 처리합니다. (/events long-poll은 서버 엔진별로 처리)
+    conn은 sendall()만 있으면 되므로 asyncio 엔진의 writer 어댑터도 그대로 사용 가능.
+    """
+    if method == "OPTIONS":
+        send_response(conn, 200, "OK", "")
+        return
+
+    if method == "GET" and path_only.startswith("/uploads/"):
+        raw_name = path_only.replace("/uploads/", "")
+        digest, _, name = raw_name.partition("/")
+        if is_digest(digest):
+            # /uploads/<digest>/<원본 이름>
+            meta = upload_store.get(digest)
+            if meta is None:
+                send_response(conn, 404, "Not Found", "File not found")
+            else:
+                send_file(conn, upload_store.blob_path(digest), headers, cache_control=UPLOAD_CACHE_CONTROL,
+                          content_type=meta[2], filename=urllib.parse.unquote(name) or meta[0])
+            return
+        # 이전 방식의 평면 파일 ({millis}_{name}). 하위 디렉터리(blobs)와 인덱스는 노출하지 않음
+        filename = urllib.parse.unquote(raw_name)
+        filepath = os.path.join(UPLOAD_DIR, filename)
+        # 경로 조작 방지
+        if ".." in filename or "/" in filename or filename.startswith((".", "index.sqlite3")):
+            send_response(conn, 403, "Forbidden", "Invalid path")
+        else:
+            send_file(conn, filepath, headers, cache_control=UPLOAD_CACHE_CONTROL)
+        return
+
+    if method == "GET" and path_only == "/channels":
+        send_json_bytes(conn, 200, channel_manager.channels_json(query.get("nick")), shared=True)
+
+    elif method == "GET" and path_only == "/users":
+        send_json_bytes(conn, 200, channel_manager.users_json(), shared=True)
+
+    elif method == "GET" and path_only == "/history":
+        try:
+            channel, nick, before, limit = parse_history(query)
+        except ValueError as e:
+            send_response(conn, 400, "Bad Request", str(e))
+            return
+        send_json_bytes(conn, 200, history_json(*channel_manager.history(channel, before, limit, nick)))
+
+    elif method == "GET" and path_only == "/search":
+        try:
+            terms, channel, nick, before, limit = parse_search(query)
+        except ValueError as e:
+            send_response(conn, 400, "Bad Request", str(e))
+            return
+        events = channel_manager.search(terms, channel, nick, before, limit)
+        send_json_bytes(conn, 200, search_json(events, limit))
+
+    elif method == "GET" and path_only == "/metrics":
+        send_response(conn, 200, "OK", render_metrics(channel_manager, admission), content_type=METRICS_CONTENT_TYPE)
+
+    elif method == "GET" and path_only == "/stats":
+        wakeups, parked = channel_manager.wakeup_counters()
+        send_json(conn, 200, {"wakeups": wakeups, "parked": parked})
+
+    elif method == "POST" and path_only in ("/join", "/leave", "/message", "/presence"):
+        route_command(conn, path_only, body)
+
+    elif method == "GET" and static_assets.enabled():
+        # 프론트엔드 자산, 없는 화면 경로는 index.html (SPA)
+        send_asset(conn, static_assets.lookup(path_only), headers)
+
+    else:
+        send_response(conn, 404, "Not Found", "Unknown Endpoint")
+
+# 변경 요청 바디에서 비어 있지 않은 문자열이어야 하는 필드 / 없거나 문자열이어야 하는 필드
+COMMAND_FIELDS = {
+    "/join": (("channel", "nick"), ()),
+    "/leave": (("nick",), ("channel",)),
+    "/message": (("channel", "nick"), ("text", "msg_type", "file_name")),
+    "/presence": (("nick",), ()),
+}
+
+def route_command(conn, path_only, body):
+    """POST /join, /leave, /message, /presence. 필드 형식이 잘못되면 매니저를 건드리지 않고 400"""
+    required, optional = COMMAND_FIELDS[path_only]
+    try:
+        data = parse_json_object(body, required, optional)
+    except ValueError as e:
+        send_response(conn, 400, "Bad Request", str(e))
+        return
+
+    if path_only == "/join":
+        members, event = channel_manager.join_channel(data.get("channel"), data.get("nick"))
+        send_json(conn, 200, {"status": "joined", "members": members, "event_id": event["id"]})
+
+    elif path_only == "/leave":
+        nick = data.get("nick")
+        channel = data.get("channel")
+        if channel:
+            ok = channel_manager.part_channel(channel, nick, reason="leaving")
+        else:
+            ok = channel_manager.leave_all(nick, reason="leaving")
+        if ok:
+            send_json(conn, 200, {"status": "left"})
+        else:
+            send_response(conn, 400, "Bad Request", "Not in channel")
+
+    elif path_only == "/message":
+        event = channel_manager.post_message(
+            data.get("channel"),
+            data.get("nick"),
+            data.get("text"),
+            data.get("msg_type", "text"),
+            data.get("file_name")
+        )
+        if event:
+            send_json(conn, 200, {"status": "sent", "event_id": event["id"]})
+        else:
+            send_response(conn, 400, "Bad Request", "Join channel first")
+
+    else:
+        channel_manager.set_focus(data.get("nick"), data.get("active", False))
+        send_json(conn, 200, {"status": "ok"})
+
+def create_listen_socket(reuse_port=False):
+    """
+    HOST:PORT에 바인딩된 리스닝 소켓을 만듭니다. 실패 시 None.
+    reuse_port=True면 SO_REUSEPORT로 여러 워커 프로세스가 같은 포트를 나눠 받음 (커널이 연결 분배)
+    """
     server_sock = None
     last_error = None
 
@@ -164,6 +489,8 @@ def start_server():
         try:
             s = socket.socket(family, socket.SOCK_STREAM)
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             if family == socket.AF_INET6:
                 try:
                     s.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)  # dual-stack 허용
@@ -182,19 +509,147 @@ def start_server():
 
     if server_sock is None:
         print(f"[ERROR] Failed to bind on {HOST}:{PORT} ({last_error})")
+        return None
+
+    server_sock.listen(LISTEN_BACKLOG)
+    return server_sock
+
+def start_server(reuse_port=False):
+    server_sock = create_listen_socket(reuse_port)
+    if server_sock is None:
         return
 
-    server_sock.listen(128)
-    print(f"[HTTP] Server running on {HOST}:{PORT} (family={server_sock.family})")
+    print(f"[HTTP] Server running on {HOST}:{PORT} (family={server_sock.family}, "
+          f"workers={WORKER_THREADS}, queue={WORKER_QUEUE})")
 
+    # 연결당 스레드 대신 상한이 있는 워커 풀: 한도를 넘는 연결은 accept 스레드에서 바로 503
+    pool = admission.pool = WorkerPool(handle_client, WORKER_THREADS, WORKER_QUEUE)
+    server_sock.settimeout(SHED_LINGER)  # 거절한 소켓을 제때 닫도록 주기적으로 깸
     try:
         while True:
-            conn, addr = server_sock.accept()
-            threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+            try:
+                conn, addr = server_sock.accept()
+            except socket.timeout:
+                admission.close_lingering()
+                continue
+            if admission.admit(addr[0]) is not None:
+                admission.shed_socket(conn)
+            elif not pool.submit(conn, addr):
+                admission.release(addr[0])
+                admission.count_shed("queue_full")
+                admission.shed_socket(conn)
     except KeyboardInterrupt:
         pass
     finally:
         server_sock.close()
 
+def open_journal(directory, manager, writer=True):
+    """저널을 재생해 manager 이력을 복구하고, writer면 이후 이벤트를 기록하도록 연결"""
+    journal = EventJournal(directory)
+    started = time.time()
+    count = manager.restore_events(journal.replay())
+    print(f"[JOURNAL] Replayed {count} events in {time.time() - started:.2f}s "
+          f"(last id {manager.last_event_id})")
+    if writer:
+        journal.start(snapshot_source=manager.snapshot_events)
+        manager.journal = journal
+
+def serve(mode, reuse_port=False):
+    static_assets.start()
+    if mode == "asyncio":
+        try:
+            from src.async_server import start_async_server
+        except ImportError:
+            from async_server import start_async_server
+        server_sock = create_listen_socket(reuse_port)
+        if server_sock is not None:
+            start_async_server(server_sock, channel_manager, route_request, begin_upload, admission)
+    else:
+        start_server(reuse_port)
+
+def run_workers(args):
+    """--workers N: 버스로 상태를 복제하는 워커 프로세스 N개가 SO_REUSEPORT로 같은 포트를 서비스"""
+    try:
+        from src.cluster import ReplicatedChannelManager, run_cluster
+    except ImportError:
+        from cluster import ReplicatedChannelManager, run_cluster
+
+    def serve_worker(index, bus_path):
+        global channel_manager
+        BASE_LABELS["worker"] = str(index)
+        channel_manager = ReplicatedChannelManager(
+            index, args.workers, max_events=args.history_max_events, max_age=args.history_max_age or None
+        )
+        if args.journal:
+            # 모든 워커가 같은 저널로 같은 상태에서 시작하고, 기록은 0번 워커만 (모든 op를 같은 순서로 받으므로)
+            open_journal(args.journal, channel_manager, writer=index == 0)
+        if index == 0:
+            # 업로드 참조 수도 저널처럼 0번 워커만 관리 (모든 워커가 같은 이벤트를 기록/삭제하므로)
+            upload_store.track(channel_manager)
+            upload_store.start_gc()
+        channel_manager.connect(bus_path)
+        serve(args.mode, reuse_port=True)
+
+    run_cluster(args.workers, serve_worker)
+
+def main():
+    global PORT, MAX_UPLOAD_SIZE, WORKER_THREADS, WORKER_QUEUE
+    parser = argparse.ArgumentParser(description="HTTP chat server (raw sockets)")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--mode", choices=["thread", "asyncio"], default="thread",
+                        help="thread: 연결당 스레드 (기본), asyncio: 단일 이벤트 루프")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="워커 프로세스 수 (2 이상이면 SO_REUSEPORT 클러스터)")
+    parser.add_argument("--history-max-events", type=int, default=channel_manager.max_events,
+                        help="채널별로 보관할 최대 이벤트 수")
+    parser.add_argument("--history-max-age", type=float, default=channel_manager.max_age,
+                        help="이벤트 보관 기간(초), 0이면 기간 제한 없음")
+    parser.add_argument("--journal", metavar="DIR",
+                        help="이벤트 저널 디렉터리 (지정 시 재시작해도 이력/이벤트 id 유지)")
+    parser.add_argument("--max-upload-mb", type=float, default=MAX_UPLOAD_SIZE / (1024 * 1024),
+                        help="업로드 파일 최대 크기(MB)")
+    parser.add_argument("--max-workers", type=int, default=WORKER_THREADS,
+                        help="스레드 모드 워커 스레드 수")
+    parser.add_argument("--max-queue", type=int, default=WORKER_QUEUE,
+                        help="워커를 기다릴 수 있는 연결 수 (넘으면 503)")
+    parser.add_argument("--max-connections", type=int, default=admission.max_connections,
+                        help="프로세스당 동시 연결 수 (넘으면 503, 0은 제한 없음)")
+    parser.add_argument("--max-connections-per-client", type=int, default=admission.max_per_client,
+                        help="같은 IP의 동시 연결 수 (넘으면 503, 0은 제한 없음)")
+    parser.add_argument("--max-long-polls", type=int,
+                        help="동시 long-poll(/events, /sync, /unread, /stream, /ws) 수, 0은 제한 없음 "
+                             f"(기본: 스레드 모드는 워커의 {LONG_POLL_SHARE * 100:.0f}%%, asyncio는 --max-connections)")
+    parser.add_argument("--static-dir", default=STATIC_DIR,
+                        help="서비스할 프론트엔드 빌드 디렉터리 (없으면 API만 서비스)")
+    args = parser.parse_args()
+    if args.history_max_events < 1:
+        parser.error("--history-max-events must be at least 1")
+    PORT = args.port
+    MAX_UPLOAD_SIZE = int(args.max_upload_mb * 1024 * 1024)
+    WORKER_THREADS = args.max_workers
+    WORKER_QUEUE = args.max_queue
+    static_assets.root = args.static_dir
+    # 0은 제한 없음 (같은 호스트에서 클라이언트를 많이 띄우는 벤치마크 등)
+    admission.max_connections = args.max_connections or float("inf")
+    admission.max_per_client = args.max_connections_per_client or float("inf")
+    if args.max_long_polls is not None:
+        admission.max_long_polls = args.max_long_polls or float("inf")
+    elif args.mode == "thread":
+        admission.max_long_polls = int(WORKER_THREADS * LONG_POLL_SHARE)
+    else:
+        admission.max_long_polls = admission.max_connections
+
+    if args.workers > 1:
+        run_workers(args)
+        return
+
+    channel_manager.max_events = args.history_max_events
+    channel_manager.max_age = args.history_max_age or None
+    if args.journal:
+        open_journal(args.journal, channel_manager)
+    upload_store.track(channel_manager)
+    upload_store.start_gc()
+    serve(args.mode)
+
 if __name__ == "__main__":
-    start_server()
+    main()
@@ -0,0 +1,175 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+React 빌드(my-chat-app/build) 정적 파일을 메모리에서 서비스
+
+시작할 때 빌드 디렉터리의 모든 파일을 읽어 gzip/deflate 사본과 함께 메모리에 올려 두므로
+요청 처리 중에는 디스크를 읽지 않습니다.
+- 파일 이름에 내용 해시가 들어간 자산(main.1a2b3c4d.js 등)은 1년 immutable 캐시,
+  index.html/manifest.json처럼 이름이 고정된 파일은 no-cache (ETag로 재검증)
+- 없는 경로 중 확장자가 없는 것은 index.html로 응답 (SPA 클라이언트 라우팅)
+- 빌드가 바뀌면 watcher 스레드(STATIC_WATCH_INTERVAL마다 파일 목록/mtime 비교) 또는 SIGHUP으로 다시 읽음
+다시 읽을 때는 새 dict를 만든 뒤 통째로 바꾸므로 요청 처리 쪽은 락 없이 읽습니다.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import signal
+import threading
+import time
+import urllib.parse
+import zlib
+
+try:
+    from src.http_utils import COMPRESS_MIN_SIZE, etag_list_matches, is_compressible, response_head, send_response
+except ImportError:
+    from http_utils import COMPRESS_MIN_SIZE, etag_list_matches, is_compressible, response_head, send_response
+
+# 빌드 변경 확인 주기(초)
+STATIC_WATCH_INTERVAL = 2.0
+# 시작/다시 읽을 때 한 번만 압축하므로 최대 레벨
+STATIC_COMPRESS_LEVEL = 9
+STATIC_IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+STATIC_REVALIDATE_CACHE = "no-cache"
+
+# CRA 빌드의 해시 붙은 파일 이름: main.1a2b3c4d.js, 453.8e2f9c1a.chunk.js, logo.6ce24c58023cc2f8fd88.svg
+_HASHED_RE = re.compile(r"\.[0-9a-f]{8,}\.")
+_INDEX = "/index.html"
+
+
+class Asset:
+    """메모리에 올린 파일 하나: 원본 바디와 인코딩별 (바디, ETag)"""
+
+    __slots__ = ("content_type", "cache_control", "variants", "compressible")
+
+    def __init__(self, path, body):
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/"):
+            self.content_type += "; charset=utf-8"
+        hashed = _HASHED_RE.search(os.path.basename(path)) is not None
+        self.cache_control = STATIC_IMMUTABLE_CACHE if hashed else STATIC_REVALIDATE_CACHE
+        self.compressible = is_compressible(self.content_type)
+        tag = hashlib.sha256(body).hexdigest()[:20]
+        self.variants = {None: (body, f'"{tag}"')}
+        if self.compressible and len(body) >= COMPRESS_MIN_SIZE:
+            for encoding, wbits in (("gzip", 31), ("deflate", 15)):
+                c = zlib.compressobj(STATIC_COMPRESS_LEVEL, zlib.DEFLATED, wbits)
+                data = c.compress(body) + c.flush()
+                if len(data) < len(body):
+                    self.variants[encoding] = (data, f'"{tag}-{encoding}"')
+
+    def size(self):
+        return sum(len(body) for body, _ in self.variants.values())
+
+
+class AssetCache:
+    """빌드 디렉터리 전체를 메모리에 캐시. root가 없으면 비활성 (API만 서비스)"""
+
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}  # URL 경로 -> Asset (다시 읽을 때 통째로 교체)
+        self.signature = None  # 마지막으로 읽은 빌드의 (경로, 크기, mtime) 목록
+        self.lock = threading.Lock()  # 다시 읽기끼리만 직렬화
+
+    def enabled(self):
+        return bool(self.assets)
+
+    def _scan(self):
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.startswith(".") or name.endswith(".gz"):
+                    continue
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                files.append((path, st.st_size, st.st_mtime_ns))
+        return files
+
+    def reload(self, force=False):
+        """빌드가 바뀌었으면 다시 읽습니다. 읽는 중 실패(빌드 중 등)하면 이전 캐시를 유지"""
+        with self.lock:
+            if not os.path.isdir(self.root):
+                return False
+            try:
+                files = self._scan()
+                if not force and files == self.signature:
+                    return False
+                started = time.time()
+                assets = {}
+                for path, _, _ in files:
+                    with open(path, "rb") as f:
+                        body = f.read()
+                    url = "/" + os.path.relpath(path, self.root).replace(os.sep, "/")
+                    assets[url] = Asset(path, body)
+            except OSError as e:
+                print(f"[STATIC ERROR] Reload failed, keeping previous build: {e}")
+                return False
+            self.assets = assets
+            self.signature = files
+        total = sum(asset.size() for asset in assets.values())
+        print(f"[STATIC] Loaded {len(assets)} files ({total / 1024:.0f} KiB with compressed copies) "
+              f"from {self.root} in {time.time() - started:.2f}s")
+        return True
+
+    def start(self, interval=STATIC_WATCH_INTERVAL):
+        """처음 읽기 + watcher 스레드 시작, 메인 스레드면 SIGHUP으로도 즉시 다시 읽음"""
+        if not os.path.isdir(self.root):
+            print(f"[STATIC] {self.root} not found, serving API only (run `npm run build` in my-chat-app)")
+        self.reload(force=True)
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"[STATIC ERROR] {e}")
+
+        threading.Thread(target=loop, name="static-watcher", daemon=True).start()
+        if threading.current_thread() is threading.main_thread() and hasattr(signal, "SIGHUP"):
+            # 핸들러는 메인 스레드에서 실행되므로 읽기는 별도 스레드로
+            signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+                target=self.reload, kwargs={"force": True}, daemon=True).start())
+
+    def lookup(self, path):
+        """URL 경로 -> Asset. 없는 경로는 확장자가 없으면 index.html (SPA), 있으면 None"""
+        assets = self.assets
+        path = urllib.parse.unquote(path)
+        asset = assets.get(_INDEX if path == "/" else path)
+        if asset is None and "." not in path.rsplit("/", 1)[-1]:
+            asset = assets.get(_INDEX)
+        return asset
+
+
+def send_asset(sock, asset, req_headers):
+    """메모리의 Asset 전송. 클라이언트가 받는 인코딩의 미리 압축한 사본을 고르고 ETag가 맞으면 304"""
+    if asset is None:
+        send_response(sock, 404, "Not Found", "File not found")
+        return
+    encoding = getattr(sock, "accept_encoding", None)
+    body, etag = asset.variants.get(encoding) or asset.variants[None]
+    headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+    if asset.compressible:
+        headers["Vary"] = "Accept-Encoding"
+    if body is not asset.variants[None][0]:
+        headers["Content-Encoding"] = encoding
+
+    if "if-none-match" in req_headers and etag_list_matches(req_headers["if-none-match"], etag):
+        status, reason, body = 304, "Not Modified", b""
+    else:
+        status, reason = 200, "OK"
+    # send_response는 바디를 다시 압축하므로 헤더를 직접 만들어 보냄
+    try:
+        sock.sendall(response_head(sock, status, reason, asset.content_type, len(body), headers) + body)
+    except OSError:
+        pass
@@ -0,0 +1,183 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+내용 주소 기반 업로드 저장소
+
+업로드 파일은 스트리밍 중에 계산한 SHA-256 digest로 한 번만 저장합니다.
+    uploads/blobs/ab/cd/abcd...(64자)      # digest 앞 2+2자로 두 단계 분산
+    uploads/index.sqlite3                   # digest -> 원본 이름, 크기, MIME, 참조 수
+URL은 /uploads/<digest>/<원본 이름> 이므로 내용이 바뀌지 않아 영구 캐시할 수 있습니다.
+
+참조 수는 업로드 URL을 담은 메시지 이벤트 수입니다. 이벤트가 기록되면 +1, 보관 범위에서
+밀려나면 -1 하며, 참조가 0이고 GRACE_PERIOD가 지난 blob은 collect()가 삭제합니다.
+(업로드 후 메시지를 보내기 전까지 지워지지 않도록 유예 기간을 둠)
+"""
+
+import collections
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# 참조 없는 blob을 지우기 전 유예 기간(초) / GC 주기(초)
+GRACE_PERIOD = 3600
+GC_INTERVAL = 600
+
+_DIGEST_RE = re.compile(r"/uploads/([0-9a-f]{64})/")
+
+
+def is_digest(value):
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def referenced_digest(event):
+    """이벤트가 참조하는 업로드 digest (이미지/파일 메시지가 아니면 None)"""
+    if event.get("msg_type") not in ("image", "file"):
+        return None
+    m = _DIGEST_RE.search(event.get("text") or "")
+    return m.group(1) if m else None
+
+
+class UploadStore:
+    def __init__(self, root, grace_period=GRACE_PERIOD):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.index_path = os.path.join(root, "index.sqlite3")
+        self.grace_period = grace_period
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = None
+        self.db_pid = None
+        # 이벤트 기록/삭제 시 쌓아 두었다가 collect()에서 한 번에 반영하는 참조 수 변화
+        self.ref_deltas = collections.Counter()
+
+    def _conn(self):
+        # fork된 워커 프로세스는 부모의 sqlite 연결을 공유하면 안 되므로 프로세스마다 새로 엶
+        if self.db is None or self.db_pid != os.getpid():
+            self.db = sqlite3.connect(self.index_path, timeout=10, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " digest TEXT PRIMARY KEY, name TEXT NOT NULL, size INTEGER NOT NULL,"
+                " mime TEXT NOT NULL, refcount INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self.db_pid = os.getpid()
+        return self.db
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest[2:4], digest)
+
+    def put(self, tmp_path, digest, size, name, mime):
+        """
+        스트리밍으로 받은 임시 파일을 digest 위치로 옮깁니다. 이미 있는 내용이면 임시 파일만 지웁니다.
+        tmp_path는 blob과 같은 파일시스템에 있어야 함 (os.replace가 원자적이도록)
+        """
+        path = self.blob_path(digest)
+        with self.lock:
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                deduplicated = True
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                deduplicated = False
+            db = self._conn()
+            with db:
+                # 같은 내용이 다시 올라오면 GC 유예 기간을 새로 시작
+                db.execute(
+                    "INSERT INTO blobs (digest, name, size, mime, created) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(digest) DO UPDATE SET created = excluded.created",
+                    (digest, name, size, mime, time.time()),
+                )
+        return deduplicated
+
+    def get(self, digest):
+        """(name, size, mime, refcount) 또는 None"""
+        with self.lock:
+            return self._conn().execute(
+                "SELECT name, size, mime, refcount FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+
+    # ------------------------------------------------------------------ 참조 수
+    def track(self, manager):
+        """manager의 현재 이력으로 참조 수를 다시 계산하고, 이후 이벤트 기록/삭제를 따라가도록 연결"""
+        counts = collections.Counter()
+        for event in manager.snapshot_events()[1]:
+            digest = referenced_digest(event)
+            if digest:
+                counts[digest] += 1
+        with self.lock:
+            db = self._conn()
+            with db:
+                db.execute("UPDATE blobs SET refcount = 0")
+                db.executemany("UPDATE blobs SET refcount = ? WHERE digest = ?",
+                               [(n, d) for d, n in counts.items()])
+        manager.on_record = self._event_recorded
+        manager.on_evict = self._event_evicted
+
+    def _event_recorded(self, event):
+        digest = referenced_digest(event)
+        if digest:
+            with self.lock:
+                self.ref_deltas[digest] += 1
+
+    def _event_evicted(self, event):
+        digest = referenced_digest(event)
+        if digest:
+            with self.lock:
+                self.ref_deltas[digest] -= 1
+
+    def collect(self, now=None):
+        """쌓인 참조 변화를 반영하고, 참조 없는 blob과 오래된 임시 파일을 삭제. 삭제한 blob 수를 반환"""
+        now = now if now is not None else time.time()
+        cutoff = now - self.grace_period
+        with self.lock:
+            deltas, self.ref_deltas = self.ref_deltas, collections.Counter()
+            db = self._conn()
+            with db:
+                db.executemany("UPDATE blobs SET refcount = refcount + ? WHERE digest = ?",
+                               [(n, d) for d, n in deltas.items() if n])
+                dead = [row[0] for row in db.execute(
+                    "SELECT digest FROM blobs WHERE refcount <= 0 AND created < ?", (cutoff,))]
+                db.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in dead])
+            for digest in dead:
+                # .gz는 응답 압축용으로 만들어 둔 사본 (http_utils.send_file)
+                for path in (self.blob_path(digest), self.blob_path(digest) + ".gz"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+        # 업로드 도중 끊겨 남은 임시 파일
+        for name in os.listdir(self.root):
+            if name.startswith(".upload-") and name.endswith(".part"):
+                path = os.path.join(self.root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+        return len(dead)
+
+    def start_gc(self, interval=GC_INTERVAL):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    removed = self.collect()
+                    if removed:
+                        print(f"[UPLOAD GC] Removed {removed} unreferenced blobs")
+                except Exception as e:
+                    print(f"[UPLOAD GC ERROR] {e}")
+
+        threading.Thread(target=loop, name="upload-gc", daemon=True).start()
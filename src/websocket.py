@@ -0,0 +1,344 @@
+# ==============================================================================
+# Team Information
+# ------------------------------------------------------------------------------
+# 21011659 김근호 (Backend Core Developer)
+# 21011582 한현준 (Data & Channel Manager)
+# 21011673 한상민 (Frontend & Integration Developer)
+# 21011650 이규민 (QA & Documentation Specialist)
+# ==============================================================================
+
+"""
+RFC 6455 WebSocket (GET /ws?nick=...)
+
+소켓 하나로 join/part/message/presence 명령을 보내고 여러 채널의 이벤트를 받습니다.
+프레임 코덱(FrameParser/encode_frame)과 채팅 세션(ChatSession)은 I/O와 분리되어 있어
+스레드 엔진(server.py)과 asyncio 엔진(async_server.py)이 같이 사용합니다.
+
+클라이언트 -> 서버 (텍스트 프레임, JSON):
+    {"op": "join", "channel": "# 일반", "since": 0, "id": 1}
+    {"op": "subscribe", "channel": "# 공지", "since": 120}   # 입장 없이 이벤트만 수신
+    {"op": "part", "channel": "# 일반"}
+    {"op": "message", "channel": "# 일반", "text": "안녕", "msg_type": "text"}
+    {"op": "presence", "active": true}
+서버 -> 클라이언트:
+    {"op": "event", "event": {...}}           # /events와 같은 이벤트 형식
+    {"op": "resync", "channel": ..., "latest": N}
+    {"op": "joined" | "parted" | "sent" | "ok" | "error", "id": 요청의 id, ...}
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# 이벤트가 없을 때 ping을 보내는 주기(초). STALE_TIMEOUT보다 짧아야 접속 상태가 유지됨
+WS_PING_INTERVAL = 10
+# 이 시간 동안 클라이언트에게서 아무 프레임도 오지 않으면 끊긴 것으로 봄
+WS_IDLE_TIMEOUT = 3 * WS_PING_INTERVAL
+WS_MAX_MESSAGE = 1024 * 1024
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_UNSUPPORTED_DATA = 1003
+CLOSE_INVALID_DATA = 1007
+CLOSE_TOO_BIG = 1009
+
+
+class ProtocolError(Exception):
+    def __init__(self, code, reason):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+def is_upgrade_request(headers):
+    return (headers.get("upgrade", "").lower() == "websocket"
+            and "upgrade" in headers.get("connection", "").lower()
+            and headers.get("sec-websocket-version") == "13"
+            and bool(headers.get("sec-websocket-key")))
+
+
+def handshake_response(headers):
+    digest = hashlib.sha1((headers["sec-websocket-key"].strip() + WS_GUID).encode("ascii")).digest()
+    accept = base64.b64encode(digest).decode("ascii")
+    return ("HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("ascii")
+
+
+def encode_frame(opcode, payload=b"", fin=True):
+    """서버 -> 클라이언트 프레임 (서버 프레임은 마스킹하지 않음)"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    first = (0x80 if fin else 0) | opcode
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", first, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", first, 126, n)
+    else:
+        header = struct.pack("!BBQ", first, 127, n)
+    return header + payload
+
+
+def close_frame(code=CLOSE_NORMAL, reason=""):
+    return encode_frame(OP_CLOSE, struct.pack("!H", code) + reason.encode("utf-8")[:120])
+
+
+def _unmask(payload, key):
+    # 바이트 단위 반복 대신 큰 정수 XOR 한 번으로 마스크 해제
+    n = len(payload)
+    if not n:
+        return b""
+    mask = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "little") ^ int.from_bytes(mask, "little")).to_bytes(n, "little")
+
+
+class FrameParser:
+    """
+    클라이언트 프레임 push 파서. feed()가 완성된 메시지 목록 [(opcode, payload)]를 반환합니다.
+    조각난(fragmented) 데이터 메시지는 이어 붙여 하나로 돌려주고, 제어 프레임은 중간에 끼어 와도 바로 반환합니다.
+    """
+
+    def __init__(self, max_message=WS_MAX_MESSAGE):
+        self.max_message = max_message
+        self.buffer = bytearray()
+        self.fragment_opcode = None
+        self.fragments = []
+        self.fragment_size = 0
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return messages
+            fin, opcode, payload = frame
+            if opcode >= OP_CLOSE:
+                messages.append((opcode, payload))
+            elif opcode == OP_CONTINUATION:
+                if self.fragment_opcode is None:
+                    raise ProtocolError(CLOSE_PROTOCOL_ERROR, "Unexpected continuation frame")
+                self._add_fragment(payload)
+                if fin:
+                    messages.append((self.fragment_opcode, b"".join(self.fragments)))
+                    self.fragment_opcode, self.fragments, self.fragment_size = None, [], 0
+            else:
+                if self.fragment_opcode is not None:
+                    raise ProtocolError(CLOSE_PROTOCOL_ERROR, "Expected continuation frame")
+                if fin:
+                    messages.append((opcode, payload))
+                else:
+                    self.fragment_opcode = opcode
+                    self._add_fragment(payload)
+
+    def _add_fragment(self, payload):
+        self.fragment_size += len(payload)
+        if self.fragment_size > self.max_message:
+            raise ProtocolError(CLOSE_TOO_BIG, "Message too big")
+        self.fragments.append(payload)
+
+    def _next_frame(self):
+        buf = self.buffer
+        if len(buf) < 2:
+            return None
+        first, second = buf[0], buf[1]
+        fin, opcode = bool(first & 0x80), first & 0x0F
+        if first & 0x70:
+            raise ProtocolError(CLOSE_PROTOCOL_ERROR, "Reserved bits set")
+        if opcode not in (OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG):
+            raise ProtocolError(CLOSE_PROTOCOL_ERROR, f"Unknown opcode {opcode}")
+        if not second & 0x80:
+            raise ProtocolError(CLOSE_PROTOCOL_ERROR, "Client frames must be masked")
+
+        length, pos = second & 0x7F, 2
+        if opcode >= OP_CLOSE and (length > 125 or not fin):
+            raise ProtocolError(CLOSE_PROTOCOL_ERROR, "Invalid control frame")
+        if length == 126:
+            if len(buf) < 4:
+                return None
+            length, pos = struct.unpack_from("!H", buf, 2)[0], 4
+        elif length == 127:
+            if len(buf) < 10:
+                return None
+            length, pos = struct.unpack_from("!Q", buf, 2)[0], 10
+        if length > self.max_message:
+            raise ProtocolError(CLOSE_TOO_BIG, "Message too big")
+
+        end = pos + 4 + length
+        if len(buf) < end:
+            return None
+        key = bytes(buf[pos:pos + 4])
+        payload = _unmask(bytes(buf[pos + 4:end]), key)
+        del buf[:end]
+        return fin, opcode, payload
+
+
+class ThreadSignal:
+    """스레드 엔진용 waiter: ChannelManager가 이벤트 기록 시 wake() 호출"""
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+
+class AsyncSignal:
+    """asyncio 엔진용 waiter: 다른 스레드에서 깨워도 안전하도록 loop에 위임"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def wake(self):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+def _since(command):
+    """명령의 since 필드 (없으면 0). 정수가 아니면 ValueError"""
+    since = command.get("since", 0)
+    if isinstance(since, bool) or not isinstance(since, (int, str)):
+        raise ValueError("since must be an integer")
+    try:
+        return int(since)
+    except ValueError:
+        raise ValueError("since must be an integer") from None
+
+
+class ChatSession:
+    """WebSocket 연결 하나의 채팅 상태. 받은 메시지를 처리하고 보낼 프레임(bytes)을 돌려줍니다."""
+
+    def __init__(self, manager, nick, signal):
+        self.manager = manager
+        self.nick = nick
+        self.signal = signal
+        self.cursors = {}  # 구독 중인 channel -> 마지막으로 보낸 이벤트 id
+        # cursors 보호: 스레드 엔진에서는 읽기 스레드(구독/해제)와 전달 스레드(커서 전진)가 함께 씀
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def handle(self, opcode, payload):
+        if opcode == OP_PING:
+            return encode_frame(OP_PONG, payload)
+        if opcode == OP_PONG:
+            self.manager.touch(self.nick)
+            return b""
+        if opcode == OP_CLOSE:
+            self.closed = True
+            code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else CLOSE_NORMAL
+            return close_frame(code)
+        if opcode == OP_BINARY:
+            raise ProtocolError(CLOSE_UNSUPPORTED_DATA, "Binary messages are not supported")
+
+        try:
+            command = json.loads(payload.decode("utf-8"))
+        except UnicodeDecodeError:
+            raise ProtocolError(CLOSE_INVALID_DATA, "Invalid UTF-8")
+        except ValueError:
+            return self._reply(None, "error", error="Invalid JSON")
+        if not isinstance(command, dict):
+            return self._reply(None, "error", error="Command must be an object")
+        try:
+            return self._dispatch(command)
+        except (TypeError, ValueError) as e:
+            # 잘못된 필드 값: 연결은 유지하고 그 명령만 거절
+            return self._reply(command.get("id"), "error", error=str(e))
+
+    def _dispatch(self, command):
+        op, req_id, channel = command.get("op"), command.get("id"), command.get("channel")
+        if channel is not None and not isinstance(channel, str):
+            raise ValueError("channel must be a string")
+
+        if op == "join" and channel:
+            since = _since(command)
+            members, event = self.manager.join_channel(channel, self.nick)
+            self._subscribe(channel, since)
+            return self._reply(req_id, "joined", channel=channel, members=members, event_id=event["id"])
+
+        if op == "subscribe" and channel:
+            self._subscribe(channel, _since(command))
+            return self._reply(req_id, "ok")
+
+        if op == "part" and channel:
+            ok = self.manager.part_channel(channel, self.nick, reason=command.get("reason", "leaving"))
+            self._unsubscribe(channel)
+            if ok:
+                return self._reply(req_id, "parted", channel=channel)
+            return self._reply(req_id, "error", error="Not in channel")
+
+        if op == "message" and channel:
+            event = self.manager.post_message(
+                channel, self.nick, command.get("text"), command.get("msg_type", "text"), command.get("file_name")
+            )
+            if event:
+                return self._reply(req_id, "sent", event_id=event["id"])
+            return self._reply(req_id, "error", error="Join channel first")
+
+        if op == "presence":
+            self.manager.set_focus(self.nick, command.get("active", False))
+            return self._reply(req_id, "ok")
+
+        return self._reply(req_id, "error", error=f"Unknown command: {op}")
+
+    def _reply(self, req_id, op, **fields):
+        reply = {"op": op, **fields}
+        if req_id is not None:
+            reply["id"] = req_id
+        return encode_frame(OP_TEXT, json.dumps(reply))
+
+    def _subscribe(self, channel, since):
+        with self.lock:
+            if channel not in self.cursors:
+                self.manager.subscribe([channel], self.signal)
+            self.cursors[channel] = since
+        self.signal.wake()  # 밀린 이력을 바로 보내도록 전달 루프를 깨움
+
+    def _unsubscribe(self, channel):
+        with self.lock:
+            if self.cursors.pop(channel, None) is not None:
+                self.manager.unsubscribe([channel], self.signal)
+
+    def pending_frames(self):
+        """구독 중인 모든 채널의 새 이벤트를 프레임으로 묶어 반환 (한 번의 send로 전송)"""
+        with self.lock:
+            cursors = list(self.cursors.items())
+        out = []
+        for channel, since in cursors:
+            events, latest, expired = self.manager.poll_events(channel, since, self.nick)
+            if expired:
+                out.append(encode_frame(OP_TEXT, json.dumps({"op": "resync", "channel": channel, "latest": latest})))
+            for event in events:
+                out.append(encode_frame(OP_TEXT, b'{"op": "event", "event": ' + event.encoded() + b"}"))
+            if events or expired:
+                with self.lock:
+                    # 그사이 해제됐거나 다른 since로 다시 구독했으면 건드리지 않음.
+                    # 만료만 됐으면 latest로 옮겨 같은 resync를 깰 때마다 다시 보내지 않음
+                    if self.cursors.get(channel) == since:
+                        self.cursors[channel] = events[-1]["id"] if events else latest
+        return b"".join(out)
+
+    def close(self):
+        with self.lock:
+            channels = list(self.cursors)
+            self.cursors.clear()
+        self.manager.unsubscribe(channels, self.signal)